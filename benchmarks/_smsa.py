@@ -0,0 +1,37 @@
+import time
+from typing import Callable, List, Tuple
+
+import torch
+from PIL import Image
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import IMAGE_SIZE, generate_vqa_sample
+from src.infrastructure.adapters.vqa.smsa.config import smsa_settings
+
+
+def load_model():
+    """
+    Load the SMSA model the same way `SMSA.initialize` does.
+    """
+    from unsloth import FastVisionModel
+    model, tokenizer = FastVisionModel.from_pretrained(
+        smsa_settings.model_path,
+        load_in_4bit=True,
+        use_gradient_checkpointing="unsloth"
+    )
+    FastVisionModel.for_inference(model)
+    return model.to(torch.bfloat16), tokenizer
+
+
+def load_samples(image_paths: List[str], question: str) -> List[dict]:
+    return [generate_vqa_sample(image=Image.open(path).convert("RGB").resize(IMAGE_SIZE), question=question)
+            for path in image_paths]
+
+
+def timed(fn: Callable[[], object]) -> Tuple[object, float]:
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    started_at = time.perf_counter()
+    result = fn()
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return result, time.perf_counter() - started_at
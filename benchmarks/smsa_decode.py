@@ -0,0 +1,74 @@
+"""
+Decode + resize time of SMSA image preprocessing, full decode versus
+reduced-scale JPEG decoding, per resampling filter.
+
+    python -m benchmarks.smsa_decode photo1.jpg photo2.jpg --repeats 5
+
+Without image paths, synthetic JPEGs at common phone camera resolutions
+are used.
+"""
+import argparse
+import statistics
+import time
+from io import BytesIO
+from typing import List, Tuple
+
+from PIL import Image
+
+from src.domain.models.input.image_input import ImageInput
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import IMAGE_SIZE
+
+# 12 MP (4:3), 12 MP (16:9), 8 MP, 1080p, 2 MP
+_PHOTO_SIZES = [(4032, 3024), (4000, 2252), (3264, 2448), (1920, 1080), (1600, 1200)]
+_FILTERS = ["nearest", "bilinear", "bicubic", "lanczos"]
+
+
+def _synthetic_jpeg(size: Tuple[int, int]) -> bytes:
+    # Noise over a gradient compresses roughly like a photo
+    image = Image.merge("RGB", [
+        Image.linear_gradient("L").resize(size),
+        Image.effect_noise(size, 40),
+        Image.linear_gradient("L").rotate(90).resize(size),
+    ])
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _corpus(paths: List[str]) -> List[Tuple[str, bytes]]:
+    if paths:
+        corpus = []
+        for path in paths:
+            with open(path, "rb") as f:
+                corpus.append((path, f.read()))
+        return corpus
+    return [(f"{width}x{height}", _synthetic_jpeg((width, height))) for width, height in _PHOTO_SIZES]
+
+
+def _time(data: bytes, resample: int, reduced_decode: bool) -> float:
+    # A fresh input per request, as the API builds them
+    image = ImageInput(bytes=data)
+    started_at = time.perf_counter()
+    image.resized(IMAGE_SIZE, resample=resample, reduced_decode=reduced_decode)
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = _corpus(args.images)
+    for name in _FILTERS:
+        resample = Image.Resampling[name.upper()]
+        print(f"resample={name}")
+        for label, data in corpus:
+            full = statistics.median(_time(data, resample, False) for _ in range(args.repeats))
+            reduced = statistics.median(_time(data, resample, True) for _ in range(args.repeats))
+            print(f"  {label:<20} full={full * 1000:8.1f} ms  reduced={reduced * 1000:8.1f} ms  "
+                  f"saved={(full - reduced) * 1000:8.1f} ms ({full / reduced:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Check the single-prefill SMSA embeddings against the three-pass reference.
+
+    python -m benchmarks.smsa_equivalence image1.jpg image2.jpg --question "What is this?"
+"""
+import argparse
+
+from torch.nn.functional import cosine_similarity
+
+from benchmarks._smsa import load_model, load_samples, timed
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import (
+    generate_output_embedding,
+    generate_output_embedding_three_pass,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--question", default="What is in the image?")
+    parser.add_argument("--min-cosine", type=float, default=0.999)
+    args = parser.parse_args()
+
+    model, tokenizer = load_model()
+    failures = 0
+    for path, sample in zip(args.images, load_samples(args.images, args.question)):
+        (ref_answer, ref_question, ref_text), ref_seconds = timed(
+            lambda: generate_output_embedding_three_pass(model, tokenizer, sample))
+        (answer, question, text), seconds = timed(
+            lambda: generate_output_embedding(model, tokenizer, sample))
+        answer_cos = cosine_similarity(answer.float(), ref_answer.float()).item()
+        question_cos = cosine_similarity(question.float(), ref_question.float()).item()
+        ok = text == ref_text and min(answer_cos, question_cos) >= args.min_cosine
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {path}: answer_cos={answer_cos:.5f} question_cos={question_cos:.5f} "
+              f"same_text={text == ref_text} three_pass={ref_seconds:.3f}s single_prefill={seconds:.3f}s")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
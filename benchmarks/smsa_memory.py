@@ -0,0 +1,43 @@
+"""
+Peak GPU memory of one SMSA embedding call, keeping every layer's hidden
+states versus capturing only the last layer.
+
+    python -m benchmarks.smsa_memory image1.jpg image2.jpg --batch-sizes 1 4 8
+"""
+import argparse
+
+import torch
+
+from benchmarks._smsa import load_model, load_samples, timed
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_output_embeddings_batch
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--question", default="What is in the image?")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+    if not torch.cuda.is_available():
+        raise SystemExit("CUDA is required to measure peak memory")
+
+    model, tokenizer = load_model()
+    samples = load_samples(args.images, args.question)
+    # Warm-up, so one-off allocations are not attributed to the first mode
+    generate_output_embeddings_batch(model, tokenizer, samples[:1])
+
+    for batch_size in args.batch_sizes:
+        batch = [samples[i % len(samples)] for i in range(batch_size)]
+        for last_layer_only in (False, True):
+            torch.cuda.empty_cache()
+            baseline = torch.cuda.memory_allocated()
+            torch.cuda.reset_peak_memory_stats()
+            _, seconds = timed(lambda: generate_output_embeddings_batch(
+                model, tokenizer, batch, last_layer_only=last_layer_only))
+            peak = torch.cuda.max_memory_allocated() - baseline
+            mode = "last layer" if last_layer_only else "all layers"
+            print(f"batch={batch_size:<3} {mode:<10} peak={peak / 2**20:9.1f} MiB  {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
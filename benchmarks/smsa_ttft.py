@@ -0,0 +1,61 @@
+"""
+Time to first token of SMSA generation, with and without the cached
+system-prompt prefix.
+
+    python -m benchmarks.smsa_ttft image1.jpg image2.jpg --repeats 5
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+from benchmarks._smsa import load_model, load_samples
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_output_embeddings_batch
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.prefix_cache import PrefixKVCache
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.stopping import SentenceEndStoppingCriteria
+
+
+class _FirstTokenTimer(SentenceEndStoppingCriteria):
+    # Stopping criteria run right after each token is produced
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_at is None:
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            self.first_token_at = time.perf_counter()
+        return super().__call__(input_ids, scores, **kwargs)
+
+    first_token_at = None
+
+
+def _ttft(model, tokenizer, sample, prefix_cache) -> float:
+    timer = _FirstTokenTimer(budgets=[1])
+    started_at = time.perf_counter()
+    generate_output_embeddings_batch(model, tokenizer, [sample], stopping_criteria=timer, prefix_cache=prefix_cache)
+    return timer.first_token_at - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--question", default="What is in the image?")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    model, tokenizer = load_model()
+    samples = load_samples(args.images, args.question)
+    prefix_cache = PrefixKVCache(model, tokenizer)
+    prefix_cache.warm([sample["messages"] for sample in samples])
+    # Warm-up
+    _ttft(model, tokenizer, samples[0], None)
+    _ttft(model, tokenizer, samples[0], prefix_cache)
+
+    for label, cache in (("full prefill", None), ("prefix cache", prefix_cache)):
+        timings = [_ttft(model, tokenizer, sample, cache) for _ in range(args.repeats) for sample in samples]
+        print(f"{label:<13} ttft median={statistics.median(timings) * 1000:8.1f} ms  "
+              f"min={min(timings) * 1000:8.1f} ms  max={max(timings) * 1000:8.1f} ms")
+    print(f"cached prefix tokens: {prefix_cache.stats()['prefix_tokens']}")
+
+
+if __name__ == "__main__":
+    main()
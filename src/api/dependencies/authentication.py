@@ -1,11 +1,29 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import APIKeyHeader
 
 from src.core.config import CONFIG
+from src.core.metrics import register_metrics_provider
+from src.core.request_context import current_api_key
+from src.core.startup import startup_phase
 from src.domain.authentication.api_key import ApiKey
+from src.domain.authentication.api_key_repository import ApiKeyRepository
+from src.infrastructure.authentication.api_key_repositories.cached_repository import CachedApiKeyRepository
 from src.infrastructure.authentication.api_key_repositories.registry import get_api_key_repository
+from src.infrastructure.authentication.utils.rate_limiter import TokenBucketRateLimiter, rate_limit_headers
+from src.infrastructure.authentication.utils.verified_key_cache import VerifiedApiKeyCache
 
-_api_key_repository = get_api_key_repository(CONFIG.api_key_repository)()
+_verified_key_cache = VerifiedApiKeyCache(
+    max_size=CONFIG.api_key_cache_size,
+    ttl_seconds=CONFIG.api_key_cache_ttl_seconds,
+)
+register_metrics_provider("api_key_cache", _verified_key_cache.stats)
+
+_rate_limiter = TokenBucketRateLimiter(max_keys=CONFIG.rate_limit_max_keys)
+register_metrics_provider("rate_limiter", _rate_limiter.stats)
+
+_ApiKeyRepositoryCls = get_api_key_repository(CONFIG.api_key_repository)
+with startup_phase(f"init API key repository {CONFIG.api_key_repository!r}"):
+    _api_key_repository = CachedApiKeyRepository(_ApiKeyRepositoryCls(), _verified_key_cache)
 api_key_header = APIKeyHeader(
     name="X-API-Key",
     auto_error=False,
@@ -17,9 +35,43 @@ def get_unauthorized_error (detail: str) -> HTTPException:
         headers={"WWW-Authenticate": "API key"}
     )
 
-async def authenticate_api_key(api_key: str = Depends(api_key_header)) -> ApiKey:
+def get_api_key_repository_instance() -> ApiKeyRepository:
+    """
+    Shared (cached) repository used by authentication.
     """
-    FastAPI dependency to authenticate via X-API-Key header.
+    return _api_key_repository
+
+async def initialize_api_key_repository() -> None:
+    with startup_phase(f"initialize API key repository {CONFIG.api_key_repository!r}"):
+        await _api_key_repository.initialize()
+
+async def close_api_key_repository() -> None:
+    await _api_key_repository.aclose()
+
+def enforce_rate_limit(request: Request, api_key: ApiKey) -> None:
+    """
+    Take a token from the key's bucket (in memory, no repository access).
+    The decision is left in `request.state.rate_limit` for the response headers.
+    """
+    rate = api_key.rate_limit_per_second
+    if rate is None:
+        rate = CONFIG.rate_limit_per_second
+    if rate <= 0:
+        return
+    burst = api_key.rate_limit_burst or CONFIG.rate_limit_burst
+    decision = _rate_limiter.check(api_key.id, rate, burst)
+    request.state.rate_limit = decision
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers=rate_limit_headers(decision),
+        )
+
+async def authenticate_api_key(request: Request, api_key: str = Depends(api_key_header)) -> ApiKey:
+    """
+    FastAPI dependency to authenticate via X-API-Key header, then apply
+    the key's rate limit.
     """
     if not api_key:
         raise get_unauthorized_error("Missing API Key")
@@ -28,7 +80,9 @@ async def authenticate_api_key(api_key: str = Depends(api_key_header)) -> ApiKey
 
     if not matching:
         raise get_unauthorized_error("Invalid API Key")
-    
+
+    enforce_rate_limit(request, matching)
     await _api_key_repository.update_usage(matching)
+    current_api_key.set(matching)
 
     return matching
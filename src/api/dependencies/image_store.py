@@ -0,0 +1,41 @@
+from typing import TypeVar
+
+from fastapi import HTTPException, status
+
+from src.core.config import CONFIG
+from src.core.metrics import register_metrics_provider
+from src.domain.authentication.api_key import ApiKey
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.infrastructure.image_store import ImageStore
+
+_InputT = TypeVar("_InputT", CaptioningInput, QuestionInput)
+
+_image_store = ImageStore(
+    max_bytes=CONFIG.image_store_max_bytes,
+    ttl_seconds=CONFIG.image_store_ttl_seconds,
+)
+register_metrics_provider("image_store", _image_store.stats)
+
+def get_image_store() -> ImageStore:
+    return _image_store
+
+def resolve_image_handle(vqa_input: _InputT, api_key: ApiKey) -> _InputT:
+    """
+    Replace an `image.id` reference with the stored image of the caller,
+    keeping the request's `metadata` (merged over the stored one). The
+    stored instance is shared by later requests and never modified: a
+    copy carries the metadata, sharing its memoised decodes.
+    """
+    image_id = vqa_input.image.id
+    if image_id is None:
+        return vqa_input
+    image = _image_store.get(api_key.id, image_id)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found or expired, upload it again",
+        )
+    if vqa_input.image.metadata is not None:
+        image = image.model_copy(update={"metadata": {**(image.metadata or {}), **vqa_input.image.metadata}})
+    return vqa_input.model_copy(update={"image": image})
@@ -1,13 +1,173 @@
-from src.domain.ports.vqa_port import VqaPort
+import asyncio
+import time
+from io import BytesIO
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from src.core.metrics import register_metrics_provider
+from src.core.startup import print_startup_report, startup_phase, startup_report
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.image_input import ImageInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.infrastructure.adapters.vqa.admission import LANES, AdmissionControlVqaAdapter
 from src.infrastructure.adapters.vqa.registry import get_adapter
+from src.infrastructure.adapters.vqa.scheduling import FairScheduler, KeyPolicy
+from src.infrastructure.adapters.vqa.singleflight import CoalescingVqaAdapter
+from src.infrastructure.adapters.vqa.threadpool import ThreadPoolVqaAdapter
+from src.infrastructure.response_cache.caching_adapter import CachingVqaAdapter
+from src.infrastructure.response_cache.perceptual import PerceptualIndex
+from src.infrastructure.response_cache.perceptual_adapter import PerceptualCaptionCacheAdapter
+from src.infrastructure.response_cache.registry import get_response_cache_backend
 from src.core.config import CONFIG
 
-# Instantiate once and reuse (like a singleton)
-_adapter_instance: VqaPort | None = None
+# Built once in the background at startup (see `warm_up_vqa_port`), then reused
+_adapter_instance: AsyncVqaPort | None = None
+_warmup_task: Optional[asyncio.Task] = None
+# pending -> loading -> warming_up -> ready, or failed
+_readiness: Dict[str, object] = {"stage": "pending", "started_at": None, "finished_at": None,
+                                 "error": None, "warmup_error": None}
+_RETRY_AFTER_SECONDS = 5
+
+def _create_adapter() -> AsyncVqaPort:
+    AdapterCls = get_adapter(CONFIG.vqa_adapter)
+    with startup_phase(f"init VQA adapter {CONFIG.vqa_adapter!r}"):
+        adapter = AdapterCls()
+    # Sync adapters are run in the threadpool to keep endpoints async
+    if not isinstance(adapter, AsyncVqaPort):
+        adapter = ThreadPoolVqaAdapter(adapter)
+    return adapter
+
+def _wrap_adapter(adapter: AsyncVqaPort) -> AsyncVqaPort:
+    # Innermost: cache hits and coalesced requests never take a slot
+    if CONFIG.admission_control_enabled:
+        adapter = AdmissionControlVqaAdapter(
+            adapter,
+            FairScheduler(
+                max_concurrency=CONFIG.admission_max_concurrency,
+                max_queue=CONFIG.admission_max_queue,
+                max_queue_wait=CONFIG.admission_max_queue_wait_seconds,
+                lanes=LANES,
+            ),
+            priority_tasks=CONFIG.scheduler_priority_tasks,
+            default_policy=KeyPolicy(
+                weight=CONFIG.scheduler_default_weight,
+                max_concurrency=CONFIG.scheduler_max_concurrency_per_key,
+                max_queue=CONFIG.scheduler_max_queue_per_key,
+            ),
+        )
+        register_metrics_provider("admission_control", adapter.stats)
+    if CONFIG.request_coalescing_enabled:
+        adapter = CoalescingVqaAdapter(adapter, adapter_name=CONFIG.vqa_adapter)
+        register_metrics_provider("request_coalescing", adapter.stats)
+    if CONFIG.perceptual_cache_enabled:
+        adapter = PerceptualCaptionCacheAdapter(
+            adapter,
+            PerceptualIndex(
+                max_distance=CONFIG.perceptual_cache_max_distance,
+                ttl_seconds=CONFIG.perceptual_cache_ttl_seconds,
+                entries_per_key=CONFIG.perceptual_cache_entries,
+                max_keys=CONFIG.perceptual_cache_max_keys,
+            ),
+        )
+        register_metrics_provider("perceptual_cache", adapter.stats)
+    # Exact-match cache goes outermost: a hit skips decoding for the dHash
+    if CONFIG.response_cache_backend:
+        BackendCls = get_response_cache_backend(CONFIG.response_cache_backend)
+        adapter = CachingVqaAdapter(
+            adapter,
+            BackendCls(
+                max_bytes=CONFIG.response_cache_max_bytes,
+                ttl_seconds=CONFIG.response_cache_ttl_seconds,
+            ),
+            adapter_name=CONFIG.vqa_adapter,
+        )
+        register_metrics_provider("response_cache", adapter.stats)
+    return adapter
+
+def _synthetic_image() -> ImageInput:
+    # A photo-sized JPEG, so decoding, resizing and the model's image path all run
+    from PIL import Image
+    image = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((1024, 768)),
+        Image.new("L", (1024, 768), 128),
+        Image.linear_gradient("L").rotate(90).resize((1024, 768)),
+    ])
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return ImageInput(bytes=buffer.getvalue())
 
-def get_vqa_port() -> VqaPort:
+async def _warm_up_inference(adapter: AsyncVqaPort) -> None:
+    """
+    One synthetic request per task, straight to the adapter (no caches):
+    triggers CUDA initialisation, kernel compilation and connection setup.
+    """
+    with startup_phase("warm-up captioning"):
+        await adapter.process_captioning(CaptioningInput(image=_synthetic_image()))
+    with startup_phase("warm-up question"):
+        await adapter.process_question(QuestionInput(image=_synthetic_image(), question="What is in the image?"))
+
+async def warm_up_vqa_port() -> None:
+    """
+    Build the configured adapter (off the event loop), warm it up and only
+    then publish it to `get_vqa_port`.
+    """
     global _adapter_instance
+    _readiness.update(stage="loading", started_at=time.perf_counter())
+    try:
+        adapter = await run_in_threadpool(_create_adapter)
+        if CONFIG.vqa_warmup_inference:
+            _readiness["stage"] = "warming_up"
+            try:
+                await _warm_up_inference(adapter)
+            except Exception as e:
+                # The adapter is usable, report the failure without blocking traffic
+                _readiness["warmup_error"] = str(e)
+                print(f"Warning: VQA adapter warm-up inference failed: {e}")
+        _adapter_instance = _wrap_adapter(adapter)
+        _readiness["stage"] = "ready"
+    except Exception as e:
+        _readiness.update(stage="failed", error=str(e))
+        print(f"Warning: Could not load VQA adapter {CONFIG.vqa_adapter!r}: {e}")
+    finally:
+        _readiness["finished_at"] = time.perf_counter()
+        print_startup_report()
+
+def start_vqa_port_warmup() -> None:
+    global _warmup_task
+    if _warmup_task is None:
+        _warmup_task = asyncio.create_task(warm_up_vqa_port())
+
+def vqa_port_readiness() -> Dict[str, object]:
+    started_at = _readiness["started_at"]
+    finished_at = _readiness["finished_at"] or time.perf_counter()
+    return {
+        "adapter": CONFIG.vqa_adapter,
+        "stage": _readiness["stage"],
+        "ready": _adapter_instance is not None,
+        "elapsed_seconds": round(finished_at - started_at, 4) if started_at is not None else 0.0,
+        "phases": startup_report()["phases"],
+        "error": _readiness["error"],
+        "warmup_error": _readiness["warmup_error"],
+    }
+
+def get_vqa_port() -> AsyncVqaPort:
     if _adapter_instance is None:
-        AdapterCls = get_adapter(CONFIG.vqa_adapter)
-        _adapter_instance = AdapterCls()
-    return _adapter_instance
\ No newline at end of file
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"VQA model is not ready ({_readiness['stage']})",
+            headers={"Retry-After": str(_RETRY_AFTER_SECONDS)},
+        )
+    return _adapter_instance
+
+async def close_vqa_port() -> None:
+    global _adapter_instance, _warmup_task
+    if _warmup_task is not None and not _warmup_task.done():
+        # A load running in a worker thread cannot be interrupted; stop waiting for it
+        _warmup_task.cancel()
+    _warmup_task = None
+    if _adapter_instance is not None:
+        await _adapter_instance.aclose()
+        _adapter_instance = None
@@ -0,0 +1,152 @@
+import json
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from fastapi import Depends, File, Form, Query, Request, UploadFile
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from src.api.dependencies.authentication import authenticate_api_key
+from src.api.dependencies.image_store import resolve_image_handle
+from src.domain.authentication.api_key import ApiKey
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+
+_InputT = TypeVar("_InputT", bound=BaseModel)
+
+# OpenAPI description of the raw binary request body
+OCTET_STREAM_BODY: Dict[str, Any] = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/octet-stream": {
+                "schema": {"type": "string", "format": "binary"}
+            }
+        },
+    }
+}
+
+
+def _parse_json_field(name: str, raw: Optional[str]) -> Any:
+    if raw is None or raw == "":
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", name),
+            "msg": f"Invalid JSON: {e.msg}",
+            "input": raw,
+        }])
+
+
+def parse_image_metadata(metadata: Optional[str]) -> Any:
+    return _parse_json_field("metadata", metadata)
+
+
+def _build_input(
+    model_cls: Type[_InputT],
+    image_bytes: Optional[bytes],
+    metadata: Optional[str],
+    history: Optional[str],
+    options: Optional[str],
+    image_id: Optional[str] = None,
+    **fields: Any,
+) -> _InputT:
+    """
+    Build the same domain input the JSON endpoints receive, from a raw
+    image buffer (or the id of an uploaded image) and JSON-encoded side
+    fields.
+    """
+    if not image_bytes and not image_id:
+        raise RequestValidationError([{
+            "type": "missing",
+            "loc": ("body", "image"),
+            "msg": "Empty image",
+            "input": None,
+        }])
+    image = {"bytes": image_bytes} if image_bytes else {"id": image_id}
+    try:
+        return model_cls.model_validate({
+            "image": {
+                **image,
+                "metadata": _parse_json_field("metadata", metadata),
+            },
+            "history": _parse_json_field("history", history),
+            "options": _parse_json_field("options", options),
+            **fields,
+        })
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])}
+            for error in e.errors(include_url=False)
+        ])
+
+
+async def captioning_input_from_json(
+    captioning_input: CaptioningInput,
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> CaptioningInput:
+    return resolve_image_handle(captioning_input, api_key)
+
+
+async def question_input_from_json(
+    question_input: QuestionInput,
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> QuestionInput:
+    return resolve_image_handle(question_input, api_key)
+
+
+async def captioning_input_from_form(
+    image: Optional[UploadFile] = File(None, description="Image file"),
+    image_id: Optional[str] = Form(None, description="Id of an uploaded image, instead of the file"),
+    metadata: Optional[str] = Form(None, description="JSON object"),
+    history: Optional[str] = Form(None, description="JSON list of {question, answer}"),
+    options: Optional[str] = Form(None, description="JSON object of generation overrides"),
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> CaptioningInput:
+    image_bytes = await image.read() if image is not None else None
+    return resolve_image_handle(
+        _build_input(CaptioningInput, image_bytes, metadata, history, options, image_id=image_id), api_key)
+
+
+async def question_input_from_form(
+    image: Optional[UploadFile] = File(None, description="Image file"),
+    question: str = Form(...),
+    image_id: Optional[str] = Form(None, description="Id of an uploaded image, instead of the file"),
+    metadata: Optional[str] = Form(None, description="JSON object"),
+    history: Optional[str] = Form(None, description="JSON list of {question, answer}"),
+    options: Optional[str] = Form(None, description="JSON object of generation overrides"),
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> QuestionInput:
+    image_bytes = await image.read() if image is not None else None
+    return resolve_image_handle(
+        _build_input(QuestionInput, image_bytes, metadata, history, options, image_id=image_id,
+                     question=question), api_key)
+
+
+async def captioning_input_from_octet_stream(
+    request: Request,
+    image_id: Optional[str] = Query(None, description="Id of an uploaded image, instead of a body"),
+    metadata: Optional[str] = Query(None, description="JSON object"),
+    history: Optional[str] = Query(None, description="JSON list of {question, answer}"),
+    options: Optional[str] = Query(None, description="JSON object of generation overrides"),
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> CaptioningInput:
+    return resolve_image_handle(
+        _build_input(CaptioningInput, await request.body(), metadata, history, options, image_id=image_id),
+        api_key)
+
+
+async def question_input_from_octet_stream(
+    request: Request,
+    question: str = Query(...),
+    image_id: Optional[str] = Query(None, description="Id of an uploaded image, instead of a body"),
+    metadata: Optional[str] = Query(None, description="JSON object"),
+    history: Optional[str] = Query(None, description="JSON list of {question, answer}"),
+    options: Optional[str] = Query(None, description="JSON object of generation overrides"),
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> QuestionInput:
+    return resolve_image_handle(
+        _build_input(QuestionInput, await request.body(), metadata, history, options, image_id=image_id,
+                     question=question), api_key)
@@ -1,50 +1,266 @@
-from fastapi import Depends, FastAPI
-from src.api.dependencies.authentication import authenticate_api_key
-from src.api.dependencies.vqa_adapter import get_vqa_port
-from src.core.config import CONFIG
+import math
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from src.api.dependencies.authentication import (
+    authenticate_api_key,
+    close_api_key_repository,
+    get_api_key_repository_instance,
+    initialize_api_key_repository,
+)
+from src.api.dependencies.image_store import get_image_store
+from src.api.dependencies.vqa_adapter import (
+    close_vqa_port,
+    get_vqa_port,
+    start_vqa_port_warmup,
+    vqa_port_readiness,
+)
+from src.api.dependencies.vqa_inputs import (
+    OCTET_STREAM_BODY,
+    captioning_input_from_form,
+    captioning_input_from_json,
+    captioning_input_from_octet_stream,
+    parse_image_metadata,
+    question_input_from_form,
+    question_input_from_json,
+    question_input_from_octet_stream,
+)
+from src.api.rate_limit import RateLimitHeadersMiddleware
+from src.api.streaming import SSE_RESPONSES, sse_response
+from src.core.metrics import collect_metrics
 from src.domain.authentication.api_key import ApiKey
+from src.domain.authentication.api_key_repository import ApiKeyRepository
+from src.domain.errors import OverloadedError, TooManyRequestsError
 from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.image_input import ImageInput
 from src.domain.models.input.question_input import QuestionInput
 from src.domain.models.output.response import Response
-from src.domain.ports.vqa_port import VqaPort
-from src.api.schemas import HealthResponse
-from src.infrastructure.authentication.api_key_repositories.registry import get_api_key_repository
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.api.schemas import HealthResponse, ImageHandleResponse, MetricsResponse, ReadinessResponse, RevokeResponse
+from src.infrastructure.image_store import ImageStore
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Indexes for constant-time API key lookup
+    await initialize_api_key_repository()
+    # Load and warm the model in the background: liveness is immediate,
+    # readiness (and /vqa/*) waits for it
+    start_vqa_port_warmup()
+    yield
+    # Release pooled upstream connections
+    await close_vqa_port()
+    # Persist buffered API key usage
+    await close_api_key_repository()
 
-app = FastAPI(title="VQA Service")
+app = FastAPI(title="VQA Service", lifespan=lifespan)
+app.add_middleware(RateLimitHeadersMiddleware)
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(_: Request, exc: OverloadedError) -> JSONResponse:
+    # 429 when only the caller's own share is exhausted
+    too_many = isinstance(exc, TooManyRequestsError)
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS if too_many else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check() -> HealthResponse:
     return HealthResponse()
 
+@app.get("/health/live", response_model=HealthResponse, summary="Liveness: the process is serving requests")
+async def liveness() -> HealthResponse:
+    return HealthResponse()
+
+@app.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "VQA model still loading, or failed to load"}},
+    summary="Readiness: the VQA model is loaded and warmed up"
+)
+async def readiness() -> JSONResponse:
+    report = ReadinessResponse(**vqa_port_readiness())
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if report.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=report.model_dump(),
+    )
+
+@app.get("/metrics", response_model=MetricsResponse)
+async def metrics(
+    _ = Depends(authenticate_api_key),
+) -> MetricsResponse:
+    return MetricsResponse(metrics=collect_metrics())
+
 @app.post(
     "/vqa/captioning",
     response_model=Response,
     summary="Run IC on an uploaded image",
     description="Accepts an image file, performs IC, and returns image caption"
 )
-def predict(
-    captioning_input: CaptioningInput,
-    vqa_port: VqaPort = Depends(get_vqa_port),
+async def predict(
+    captioning_input: CaptioningInput = Depends(captioning_input_from_json),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
     _ = Depends(authenticate_api_key),
 ) -> Response:
-    response = vqa_port.process_captioning(captioning_input)
+    response = await vqa_port.process_captioning(captioning_input)
     return response
 
+@app.post(
+    "/vqa/captioning/multipart",
+    response_model=Response,
+    summary="Run IC on an image uploaded as multipart/form-data",
+    description="Same as /vqa/captioning, with the image sent as a file field"
+)
+async def predict_multipart(
+    captioning_input: CaptioningInput = Depends(captioning_input_from_form),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
+    _ = Depends(authenticate_api_key),
+) -> Response:
+    return await vqa_port.process_captioning(captioning_input)
+
+@app.post(
+    "/vqa/captioning/binary",
+    response_model=Response,
+    summary="Run IC on an image sent as application/octet-stream",
+    description="Same as /vqa/captioning, with the raw image as request body",
+    openapi_extra=OCTET_STREAM_BODY
+)
+async def predict_binary(
+    captioning_input: CaptioningInput = Depends(captioning_input_from_octet_stream),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
+    _ = Depends(authenticate_api_key),
+) -> Response:
+    return await vqa_port.process_captioning(captioning_input)
+
+@app.post(
+    "/vqa/captioning/stream",
+    response_class=StreamingResponse,
+    responses=SSE_RESPONSES,
+    summary="Stream IC on an uploaded image",
+    description="Same as /vqa/captioning, with the caption streamed as Server-Sent Events"
+)
+async def predict_stream(
+    captioning_input: CaptioningInput = Depends(captioning_input_from_json),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
+    _ = Depends(authenticate_api_key),
+) -> StreamingResponse:
+    return await sse_response(vqa_port.stream_captioning(captioning_input))
+
+async def _store_image(image_store: ImageStore, api_key: ApiKey, image_bytes: bytes,
+                       metadata: Optional[str]) -> ImageHandleResponse:
+    try:
+        image = ImageInput(bytes=image_bytes, metadata=parse_image_metadata(metadata))
+        # Only checked here: the adapter decodes what it needs on first use,
+        # possibly at reduced scale, and follow-up turns reuse it
+        await run_in_threadpool(image.verify)
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid image: {str(e)}")
+    image_id = image_store.put(api_key.id, image)
+    if image_id is None:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image too large")
+    return ImageHandleResponse(id=image_id, expires_in_seconds=image_store.ttl_seconds)
+
+@app.post(
+    "/images",
+    response_model=ImageHandleResponse,
+    summary="Upload an image once for several requests",
+    description="Stores the image and returns an id to send as `image.id` (or `image_id`) in /vqa requests"
+)
+async def upload_image(
+    image: UploadFile = File(..., description="Image file"),
+    metadata: Optional[str] = Form(None, description="JSON object"),
+    image_store: ImageStore = Depends(get_image_store),
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> ImageHandleResponse:
+    return await _store_image(image_store, api_key, await image.read(), metadata)
+
+@app.post(
+    "/images/binary",
+    response_model=ImageHandleResponse,
+    summary="Upload an image sent as application/octet-stream",
+    description="Same as /images, with the raw image as request body",
+    openapi_extra=OCTET_STREAM_BODY
+)
+async def upload_image_binary(
+    request: Request,
+    metadata: Optional[str] = Query(None, description="JSON object"),
+    image_store: ImageStore = Depends(get_image_store),
+    api_key: ApiKey = Depends(authenticate_api_key),
+) -> ImageHandleResponse:
+    return await _store_image(image_store, api_key, await request.body(), metadata)
+
 @app.get("/create_key", response_model=ApiKey)
-async def create_api_key() -> ApiKey:
-    api_key_repo = get_api_key_repository(CONFIG.api_key_repository)()
+async def create_api_key(
+    api_key_repo: ApiKeyRepository = Depends(get_api_key_repository_instance),
+) -> ApiKey:
     return await api_key_repo.create()
 
+@app.delete("/revoke_key", response_model=RevokeResponse)
+async def revoke_api_key(
+    api_key: ApiKey = Depends(authenticate_api_key),
+    api_key_repo: ApiKeyRepository = Depends(get_api_key_repository_instance),
+) -> RevokeResponse:
+    """
+    Revoke the API key used to authenticate this request.
+    """
+    if not await api_key_repo.revoke(api_key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="API Key not found")
+    return RevokeResponse(id=api_key.id)
+
 @app.post(
     "/vqa/question",
     response_model=Response,
     summary="Answer question about uploaded image.",
     description="Accepts an image file, performs QA, and returns anwer"
 )
-def answer(
-    question_input: QuestionInput,
-    vqa_port: VqaPort = Depends(get_vqa_port),
+async def answer(
+    question_input: QuestionInput = Depends(question_input_from_json),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
+    _ = Depends(authenticate_api_key),
+) -> Response:
+    response = await vqa_port.process_question(question_input)
+    return response
+
+@app.post(
+    "/vqa/question/multipart",
+    response_model=Response,
+    summary="Answer question about an image uploaded as multipart/form-data",
+    description="Same as /vqa/question, with the image sent as a file field"
+)
+async def answer_multipart(
+    question_input: QuestionInput = Depends(question_input_from_form),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
     _ = Depends(authenticate_api_key),
 ) -> Response:
-    response = vqa_port.process_question(question_input)
-    return response
\ No newline at end of file
+    return await vqa_port.process_question(question_input)
+
+@app.post(
+    "/vqa/question/binary",
+    response_model=Response,
+    summary="Answer question about an image sent as application/octet-stream",
+    description="Same as /vqa/question, with the raw image as request body",
+    openapi_extra=OCTET_STREAM_BODY
+)
+async def answer_binary(
+    question_input: QuestionInput = Depends(question_input_from_octet_stream),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
+    _ = Depends(authenticate_api_key),
+) -> Response:
+    return await vqa_port.process_question(question_input)
+
+@app.post(
+    "/vqa/question/stream",
+    response_class=StreamingResponse,
+    responses=SSE_RESPONSES,
+    summary="Stream the answer to a question about an uploaded image",
+    description="Same as /vqa/question, with the answer streamed as Server-Sent Events"
+)
+async def answer_stream(
+    question_input: QuestionInput = Depends(question_input_from_json),
+    vqa_port: AsyncVqaPort = Depends(get_vqa_port),
+    _ = Depends(authenticate_api_key),
+) -> StreamingResponse:
+    return await sse_response(vqa_port.stream_question(question_input))
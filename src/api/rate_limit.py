@@ -0,0 +1,32 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.infrastructure.authentication.utils.rate_limiter import rate_limit_headers
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Adds the `RateLimit-*` headers of the decision left in
+    `request.state.rate_limit` by authentication to every response,
+    including streamed ones.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                decision = scope.get("state", {}).get("rate_limit")
+                if decision is not None:
+                    present = {name.lower() for name, _ in message.get("headers", [])}
+                    extra = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                             for name, value in rate_limit_headers(decision).items()
+                             if name.lower().encode("latin-1") not in present]
+                    message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
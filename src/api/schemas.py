@@ -1,4 +1,25 @@
+from typing import Dict, Optional
 from pydantic import BaseModel
 
 class HealthResponse(BaseModel):
-    status: str = 'Ok'
\ No newline at end of file
+    status: str = 'Ok'
+
+class ReadinessResponse(BaseModel):
+    adapter: str
+    stage: str
+    ready: bool
+    elapsed_seconds: float
+    phases: Dict[str, float]
+    error: Optional[str] = None
+    warmup_error: Optional[str] = None
+
+class MetricsResponse(BaseModel):
+    metrics: Dict[str, Dict[str, object]]
+
+class RevokeResponse(BaseModel):
+    id: str
+    status: str = 'Revoked'
+
+class ImageHandleResponse(BaseModel):
+    id: str
+    expires_in_seconds: float
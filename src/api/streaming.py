@@ -0,0 +1,86 @@
+import json
+from typing import AsyncIterator, Optional
+
+import anyio
+from fastapi.responses import StreamingResponse
+
+from src.domain.errors import OverloadedError
+from src.domain.models.output.response_chunk import ResponseChunk
+
+# OpenAPI description of the Server-Sent Events response
+SSE_RESPONSES = {
+    200: {
+        "description": "Server-Sent Events: `data` events with `{\"delta\"}`, "
+                       "`reset` (discard what was received), then `done` with the full `{\"output\"}` "
+                       "or `error` with `{\"detail\"}`",
+        "content": {"text/event-stream": {}},
+    }
+}
+
+
+def _event(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _aclose(chunks: AsyncIterator) -> None:
+    # A disconnect leaves `chunks` suspended; close it now so the model stops,
+    # rather than whenever it is garbage collected
+    aclose = getattr(chunks, "aclose", None)
+    if aclose is not None:
+        with anyio.CancelScope(shield=True):
+            await aclose()
+
+
+async def _sse_events(chunks: AsyncIterator[ResponseChunk]) -> AsyncIterator[str]:
+    output = []
+    try:
+        async for chunk in chunks:
+            if chunk.reset:
+                output.clear()
+                yield _event({}, "reset")
+            if chunk.delta:
+                output.append(chunk.delta)
+                yield _event({"delta": chunk.delta})
+    except Exception as e:
+        # Headers are already sent, the error can only be reported in-stream
+        yield _event({"detail": str(e)}, "error")
+        return
+    finally:
+        await _aclose(chunks)
+    yield _event({"output": "".join(output)}, "done")
+
+
+async def _resume(first: ResponseChunk | Exception, chunks: AsyncIterator[ResponseChunk]) -> AsyncIterator[ResponseChunk]:
+    # Replay the outcome of the chunk awaited by `sse_response`, then continue
+    if isinstance(first, StopAsyncIteration):
+        return
+    if isinstance(first, Exception):
+        raise first
+    try:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await _aclose(chunks)
+
+
+async def sse_response(chunks: AsyncIterator[ResponseChunk]) -> StreamingResponse:
+    """
+    Stream `chunks` as SSE. The first chunk is awaited before responding,
+    so a request shed by admission control gets a proper status code
+    instead of an in-stream error.
+    """
+    chunks = chunks.__aiter__()
+    try:
+        first: ResponseChunk | Exception = await chunks.__anext__()
+    except OverloadedError:
+        raise
+    except Exception as e:
+        first = e
+    return StreamingResponse(
+        _sse_events(_resume(first, chunks)),
+        media_type="text/event-stream",
+        # Disable proxy buffering, clients need each event as it comes
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,6 @@
 import os
 from enum import Enum
-from typing import Dict
+from typing import Dict, List
 from dotenv import dotenv_values
 
 # Load .env but allow override by real environment
@@ -15,6 +15,38 @@ class ConfigField(Enum):
     MONGODB_URI                    = "MONGODB_URI"
     MONGO_DATABASE                 = "MONGO_DATABASE"
     API_KEY_REPOSITORY             = "API_KEY_REPOSITORY"
+    API_KEY_PEPPER                 = "API_KEY_PEPPER"
+    API_KEY_ALLOW_UNPEPPERED       = "API_KEY_ALLOW_UNPEPPERED"
+    API_KEY_LEGACY_LOOKUP          = "API_KEY_LEGACY_LOOKUP"
+    API_KEY_CACHE_SIZE             = "API_KEY_CACHE_SIZE"
+    API_KEY_CACHE_TTL_SECONDS      = "API_KEY_CACHE_TTL_SECONDS"
+    HASH_EXECUTOR_WORKERS          = "HASH_EXECUTOR_WORKERS"
+    USAGE_FLUSH_INTERVAL_SECONDS   = "USAGE_FLUSH_INTERVAL_SECONDS"
+    USAGE_FLUSH_BATCH_SIZE         = "USAGE_FLUSH_BATCH_SIZE"
+    RESPONSE_CACHE_BACKEND         = "RESPONSE_CACHE_BACKEND"
+    RESPONSE_CACHE_MAX_BYTES       = "RESPONSE_CACHE_MAX_BYTES"
+    RESPONSE_CACHE_TTL_SECONDS     = "RESPONSE_CACHE_TTL_SECONDS"
+    RESPONSE_CACHE_DIR             = "RESPONSE_CACHE_DIR"
+    PERCEPTUAL_CACHE_ENABLED       = "PERCEPTUAL_CACHE_ENABLED"
+    PERCEPTUAL_CACHE_MAX_DISTANCE  = "PERCEPTUAL_CACHE_MAX_DISTANCE"
+    PERCEPTUAL_CACHE_TTL_SECONDS   = "PERCEPTUAL_CACHE_TTL_SECONDS"
+    PERCEPTUAL_CACHE_ENTRIES       = "PERCEPTUAL_CACHE_ENTRIES"
+    PERCEPTUAL_CACHE_MAX_KEYS      = "PERCEPTUAL_CACHE_MAX_KEYS"
+    REQUEST_COALESCING_ENABLED     = "REQUEST_COALESCING_ENABLED"
+    IMAGE_STORE_MAX_BYTES          = "IMAGE_STORE_MAX_BYTES"
+    IMAGE_STORE_TTL_SECONDS        = "IMAGE_STORE_TTL_SECONDS"
+    VQA_WARMUP_INFERENCE           = "VQA_WARMUP_INFERENCE"
+    ADMISSION_CONTROL_ENABLED      = "ADMISSION_CONTROL_ENABLED"
+    ADMISSION_MAX_CONCURRENCY      = "ADMISSION_MAX_CONCURRENCY"
+    ADMISSION_MAX_QUEUE            = "ADMISSION_MAX_QUEUE"
+    ADMISSION_MAX_QUEUE_WAIT       = "ADMISSION_MAX_QUEUE_WAIT_SECONDS"
+    SCHEDULER_PRIORITY_TASKS       = "SCHEDULER_PRIORITY_TASKS"
+    SCHEDULER_DEFAULT_WEIGHT       = "SCHEDULER_DEFAULT_WEIGHT"
+    SCHEDULER_MAX_CONCURRENCY_KEY  = "SCHEDULER_MAX_CONCURRENCY_PER_KEY"
+    SCHEDULER_MAX_QUEUE_PER_KEY    = "SCHEDULER_MAX_QUEUE_PER_KEY"
+    RATE_LIMIT_PER_SECOND          = "RATE_LIMIT_PER_SECOND"
+    RATE_LIMIT_BURST               = "RATE_LIMIT_BURST"
+    RATE_LIMIT_MAX_KEYS            = "RATE_LIMIT_MAX_KEYS"
 
 
 class AppConfig:
@@ -62,6 +94,159 @@ class AppConfig:
     def api_key_repository(self) -> str:
         return self._get(ConfigField.API_KEY_REPOSITORY, "")    
 
+    @property
+    def api_key_cache_size(self) -> int:
+        # Max number of verified keys kept in memory (0 disables the cache)
+        return int(self._get(ConfigField.API_KEY_CACHE_SIZE, "10000"))
+
+    @property
+    def api_key_cache_ttl_seconds(self) -> float:
+        # How long a verified key is trusted before hitting the repository again
+        return float(self._get(ConfigField.API_KEY_CACHE_TTL_SECONDS, "60"))
+
+    @property
+    def hash_executor_workers(self) -> int:
+        # Threads dedicated to bcrypt hashing/verification (bcrypt releases the GIL)
+        default = min(4, os.cpu_count() or 1)
+        return int(self._get(ConfigField.HASH_EXECUTOR_WORKERS, str(default)))
+
+    @property
+    def api_key_pepper(self) -> str:
+        # Server-side secret for the indexed API key digest (HMAC-SHA256)
+        return self._get(ConfigField.API_KEY_PEPPER, "")
+
+    @property
+    def api_key_allow_unpeppered(self) -> bool:
+        # Legacy / development only: accept an empty API_KEY_PEPPER
+        return self._get(ConfigField.API_KEY_ALLOW_UNPEPPERED, "false").lower() in ("1", "true", "yes")
+
+    @property
+    def api_key_legacy_lookup(self) -> bool:
+        # Fall back to prefix + bcrypt lookup for keys created before digests
+        return self._get(ConfigField.API_KEY_LEGACY_LOOKUP, "true").lower() in ("1", "true", "yes")
+
+    @property
+    def usage_flush_interval_seconds(self) -> float:
+        # How often buffered API key usage is written to the repository
+        return float(self._get(ConfigField.USAGE_FLUSH_INTERVAL_SECONDS, "5"))
+
+    @property
+    def usage_flush_batch_size(self) -> int:
+        # Max keys per bulk write; reaching it also triggers an early flush
+        return int(self._get(ConfigField.USAGE_FLUSH_BATCH_SIZE, "500"))
+
+    @property
+    def response_cache_backend(self) -> str:
+        # "memory", "disk", or empty to disable the response cache
+        return self._get(ConfigField.RESPONSE_CACHE_BACKEND, "")
+
+    @property
+    def response_cache_max_bytes(self) -> int:
+        return int(self._get(ConfigField.RESPONSE_CACHE_MAX_BYTES, str(64 * 1024 * 1024)))
+
+    @property
+    def response_cache_ttl_seconds(self) -> float:
+        return float(self._get(ConfigField.RESPONSE_CACHE_TTL_SECONDS, "3600"))
+
+    @property
+    def response_cache_dir(self) -> str:
+        return self._get(ConfigField.RESPONSE_CACHE_DIR, "cache/responses")
+
+    @property
+    def perceptual_cache_enabled(self) -> bool:
+        # Reuse recent captions for near-identical images from the same API key
+        return self._get(ConfigField.PERCEPTUAL_CACHE_ENABLED, "false").lower() in ("1", "true", "yes")
+
+    @property
+    def perceptual_cache_max_distance(self) -> int:
+        # Max Hamming distance (out of 64 bits) between dHashes to count as the same image
+        return int(self._get(ConfigField.PERCEPTUAL_CACHE_MAX_DISTANCE, "5"))
+
+    @property
+    def perceptual_cache_ttl_seconds(self) -> float:
+        return float(self._get(ConfigField.PERCEPTUAL_CACHE_TTL_SECONDS, "60"))
+
+    @property
+    def perceptual_cache_entries(self) -> int:
+        # Recent images remembered per API key
+        return int(self._get(ConfigField.PERCEPTUAL_CACHE_ENTRIES, "16"))
+
+    @property
+    def perceptual_cache_max_keys(self) -> int:
+        return int(self._get(ConfigField.PERCEPTUAL_CACHE_MAX_KEYS, "10000"))
+
+    @property
+    def image_store_max_bytes(self) -> int:
+        # Uploaded images, including their memoised decoded forms
+        return int(self._get(ConfigField.IMAGE_STORE_MAX_BYTES, str(256 * 1024 * 1024)))
+
+    @property
+    def image_store_ttl_seconds(self) -> float:
+        # Counted from the last request that used the image
+        return float(self._get(ConfigField.IMAGE_STORE_TTL_SECONDS, "600"))
+
+    @property
+    def request_coalescing_enabled(self) -> bool:
+        # Share one model call between concurrent identical requests
+        return self._get(ConfigField.REQUEST_COALESCING_ENABLED, "true").lower() in ("1", "true", "yes")
+
+    @property
+    def admission_control_enabled(self) -> bool:
+        # Bound concurrent model calls and shed requests that cannot start in time
+        return self._get(ConfigField.ADMISSION_CONTROL_ENABLED, "true").lower() in ("1", "true", "yes")
+
+    @property
+    def admission_max_concurrency(self) -> int:
+        return int(self._get(ConfigField.ADMISSION_MAX_CONCURRENCY, "16"))
+
+    @property
+    def admission_max_queue(self) -> int:
+        return int(self._get(ConfigField.ADMISSION_MAX_QUEUE, "64"))
+
+    @property
+    def admission_max_queue_wait_seconds(self) -> float:
+        return float(self._get(ConfigField.ADMISSION_MAX_QUEUE_WAIT, "10"))
+
+    @property
+    def scheduler_priority_tasks(self) -> List[str]:
+        # Tasks served before the others ("captioning", "question")
+        raw = self._get(ConfigField.SCHEDULER_PRIORITY_TASKS, "captioning")
+        return [task.strip() for task in raw.split(",") if task.strip()]
+
+    @property
+    def scheduler_default_weight(self) -> float:
+        # For keys without their own `scheduling_weight`
+        return float(self._get(ConfigField.SCHEDULER_DEFAULT_WEIGHT, "1"))
+
+    @property
+    def scheduler_max_concurrency_per_key(self) -> int:
+        # For keys without their own `max_concurrency`; 0 disables the cap
+        return int(self._get(ConfigField.SCHEDULER_MAX_CONCURRENCY_KEY, "0"))
+
+    @property
+    def scheduler_max_queue_per_key(self) -> int:
+        # Beyond this, a key's requests get 429; 0 disables the cap
+        return int(self._get(ConfigField.SCHEDULER_MAX_QUEUE_PER_KEY, "0"))
+
+    @property
+    def rate_limit_per_second(self) -> float:
+        # Sustained requests per second per API key (without its own limit); 0 disables
+        return float(self._get(ConfigField.RATE_LIMIT_PER_SECOND, "5"))
+
+    @property
+    def rate_limit_burst(self) -> int:
+        return int(self._get(ConfigField.RATE_LIMIT_BURST, "20"))
+
+    @property
+    def rate_limit_max_keys(self) -> int:
+        # Buckets kept in memory (per worker)
+        return int(self._get(ConfigField.RATE_LIMIT_MAX_KEYS, "100000"))
+
+    @property
+    def vqa_warmup_inference(self) -> bool:
+        # Run synthetic requests through the adapter before reporting ready
+        return self._get(ConfigField.VQA_WARMUP_INFERENCE, "true").lower() in ("1", "true", "yes")
+
 
 # Single, module‐level instance
 CONFIG = AppConfig()
\ No newline at end of file
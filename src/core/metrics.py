@@ -0,0 +1,18 @@
+from typing import Callable, Dict
+
+MetricsProvider = Callable[[], Dict[str, object]]
+
+_PROVIDERS: dict[str, MetricsProvider] = {}
+
+def register_metrics_provider(name: str, provider: MetricsProvider) -> None:
+    """
+    Register a callable returning a snapshot of a component's counters.
+    Registering again under the same name replaces the previous provider.
+    """
+    _PROVIDERS[name] = provider
+
+def collect_metrics() -> Dict[str, Dict[str, object]]:
+    """
+    Snapshot of every registered component's metrics, keyed by name.
+    """
+    return {name: provider() for name, provider in _PROVIDERS.items()}
@@ -0,0 +1,19 @@
+import importlib
+
+from src.core.startup import startup_phase
+
+
+def import_plugin(module_name: str, phase: str) -> bool:
+    """
+    Import the module of a lazily registered implementation, timed as a
+    startup phase. Returns False if the module itself does not exist;
+    missing dependencies of an existing module are raised.
+    """
+    try:
+        with startup_phase(phase):
+            importlib.import_module(module_name)
+    except ModuleNotFoundError as e:
+        if e.name is not None and (module_name == e.name or module_name.startswith(f"{e.name}.")):
+            return False
+        raise
+    return True
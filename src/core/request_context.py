@@ -0,0 +1,9 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from src.domain.authentication.api_key import ApiKey
+
+# API key that authenticated the current request, set by `authenticate_api_key`.
+# Lets layers behind the VQA port scope state per tenant without changing
+# the port's signature.
+current_api_key: ContextVar[Optional[ApiKey]] = ContextVar("current_api_key", default=None)
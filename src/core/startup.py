@@ -0,0 +1,38 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from src.core.metrics import register_metrics_provider
+
+# Set when the `src` package is first imported
+_started_at = time.perf_counter()
+_phases: List[Tuple[str, float]] = []
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """
+    Time an import or initialisation step for the startup report.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - started_at))
+
+
+def startup_report() -> Dict[str, object]:
+    return {
+        "phases": {name: round(seconds, 4) for name, seconds in _phases},
+        "seconds_since_import": round(time.perf_counter() - _started_at, 4),
+    }
+
+
+def print_startup_report() -> None:
+    total = time.perf_counter() - _started_at
+    print(f"Startup: ready {total:.2f}s after import")
+    for name, seconds in _phases:
+        print(f"  {seconds:8.3f}s  {name}")
+
+
+register_metrics_provider("startup", startup_report)
@@ -7,11 +7,18 @@ class ApiKey(BaseModel):
     API Key domain model
     """
     id: Optional[str] = None
-    hashed_key: str
-    key_prefix: str # For effecient search
+    key_digest: Optional[str] = None # Keyed digest (HMAC-SHA256 + pepper), unique indexed lookup
+    hashed_key: Optional[str] = None # Legacy bcrypt hash, only for keys created before digests
+    key_prefix: Optional[str] = None # Legacy, narrows the bcrypt search
     initialized_in: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     last_use_in: Optional[datetime] = None
     number_of_requests: int = 0
+    # Fair scheduling overrides (None: service defaults)
+    scheduling_weight: Optional[float] = None # Share of the model relative to other keys
+    max_concurrency: Optional[int] = None # Calls of this key running at once
+    # Token-bucket rate limit overrides (None: service defaults, rate 0: unlimited)
+    rate_limit_per_second: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
 
     def update_usage(self,
                      last_use_in: Optional[datetime] = None,
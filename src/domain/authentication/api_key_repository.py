@@ -5,6 +5,12 @@ from typing import Optional
 from src.domain.authentication.api_key import ApiKey
 
 class ApiKeyRepository(ABC):
+    async def initialize(self) -> None:
+        """
+        Prepare persistence (indexes, migrations, ...) once at startup.
+        """
+        pass
+
     @abstractmethod
     async def get_by_key(self, key: str) -> Optional[ApiKey]:
         """
@@ -33,4 +39,17 @@ class ApiKeyRepository(ABC):
         """
         Update the last_use timestamp and increment number_of_requests.
         """
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def revoke(self, entity: ApiKey) -> bool:
+        """
+        Permanently invalidate an ApiKey. Return False if it did not exist.
+        """
+        pass
+
+    async def aclose(self) -> None:
+        """
+        Release resources and persist any buffered state (e.g. on shutdown).
+        """
+        pass
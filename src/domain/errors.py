@@ -0,0 +1,17 @@
+class OverloadedError(RuntimeError):
+    """
+    A request was rejected before reaching the model because the service
+    is saturated. Retrying after `retry_after` seconds may succeed.
+    """
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TooManyRequestsError(OverloadedError):
+    """
+    A request was rejected because its API key exceeded its own share
+    (queue, concurrency or rate limit), while other keys may still be served.
+    """
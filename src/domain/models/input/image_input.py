@@ -1,6 +1,149 @@
-from typing import Dict, List, Optional
+from binascii import Error as Base64Error
+from base64 import b64decode
+from hashlib import blake2b
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
 import pydantic
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+# `bytes` is shadowed by the field name inside the model body
+_RawBytes = bytes
+_T = TypeVar("_T")
+
 class ImageInput(pydantic.BaseModel):
-    bytes: List[int]
-    metadata: Optional[Dict[str, object]] = None
\ No newline at end of file
+    """
+    Image payload. Accepts either the legacy `bytes` list of ints, raw bytes
+    (multipart / octet-stream uploads), a `base64` encoded string, or the
+    `id` of an image uploaded earlier (resolved by the API layer).
+    Internally the image is always kept as a single immutable `bytes` buffer,
+    decoded and resized at most once per request (see `to_pil`, `resized`,
+    `derived`).
+    """
+    bytes: Optional[_RawBytes] = None
+    base64: Optional[str] = pydantic.Field(default=None, exclude=True)
+    id: Optional[str] = None
+    metadata: Optional[Dict[str, object]] = None
+
+    _content_hash: Optional[str] = pydantic.PrivateAttr(default=None)
+    _decoded: Optional["Image.Image"] = pydantic.PrivateAttr(default=None)
+    _resized: Dict[Tuple[Tuple[int, int], Optional[int], bool], "Image.Image"] = pydantic.PrivateAttr(default_factory=dict)
+    _derived: Dict[Hashable, Any] = pydantic.PrivateAttr(default_factory=dict)
+
+    @pydantic.model_validator(mode="before")
+    @classmethod
+    def _decode_base64(cls, data: Any) -> Any:
+        if not isinstance(data, dict) or data.get("base64") is None:
+            return data
+        if data.get("bytes") is not None or data.get("id") is not None:
+            raise ValueError("Provide only one of 'bytes', 'base64' or 'id'")
+        try:
+            decoded = b64decode(data["base64"], validate=True)
+        except (Base64Error, ValueError) as e:
+            raise ValueError(f"Invalid base64 image: {str(e)}")
+        return {**data, "bytes": decoded, "base64": None}
+
+    @pydantic.field_validator("bytes", mode="before")
+    @classmethod
+    def _coerce_int_list(cls, value: Any) -> Any:
+        # Legacy JSON clients send the image as a list of ints
+        if isinstance(value, list):
+            try:
+                return _RawBytes(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid image bytes: {str(e)}")
+        if isinstance(value, (bytearray, memoryview)):
+            return _RawBytes(value)
+        if isinstance(value, str):
+            raise ValueError("String images must be sent in the 'base64' field")
+        return value
+
+    @pydantic.model_validator(mode="after")
+    def _require_image(self) -> "ImageInput":
+        if (self.bytes is None) == (self.id is None):
+            raise ValueError("Provide exactly one of 'bytes', 'base64' or 'id'")
+        return self
+
+    def content_hash(self) -> str:
+        """
+        Hex digest of the encoded image bytes, memoised.
+        """
+        if self._content_hash is None:
+            self._content_hash = blake2b(self.bytes, digest_size=32).hexdigest()
+        return self._content_hash
+
+    def verify(self) -> None:
+        """
+        Check that PIL can identify and parse the image, without decoding
+        its pixels or memoising anything (e.g. on upload, so only the forms
+        an adapter asks for are kept). Raises `ValueError` or `OSError`.
+        """
+        from PIL import Image
+        try:
+            with Image.open(BytesIO(self.bytes)) as image:
+                image.verify()
+        except SyntaxError as e:
+            # PIL reports some corrupt files this way
+            raise ValueError(str(e))
+
+    def to_pil(self) -> "Image.Image":
+        """
+        Decode the image with PIL, memoised for the lifetime of this input.
+        """
+        if self._decoded is None:
+            from PIL import Image
+            image = Image.open(BytesIO(self.bytes))
+            image.load()
+            self._decoded = image
+        return self._decoded
+
+    def resized(self, size: Tuple[int, int], resample: Optional[int] = None,
+                reduced_decode: bool = True) -> "Image.Image":
+        """
+        Return the decoded image resized to `size`, memoised per size and
+        options. Callers must treat the returned image as read-only.
+
+        With `reduced_decode`, when nothing has decoded the full image yet,
+        JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale (libjpeg DCT
+        scaling, PIL's draft mode), the smallest scale still at least `size`.
+        `resample` is a `PIL.Image.Resampling` filter (PIL's default if None).
+        """
+        size = tuple(size)
+        key = (size, resample, reduced_decode)
+        if key not in self._resized:
+            if self._decoded is None and reduced_decode:
+                source = self._draft(size)
+            else:
+                source = self.to_pil()
+            self._resized[key] = source.resize(size, resample)
+        return self._resized[key]
+
+    def _draft(self, size: Tuple[int, int]) -> "Image.Image":
+        from PIL import Image
+        image = Image.open(BytesIO(self.bytes))
+        # No-op for formats without reduced decoding and for small sources
+        image.draft(None, size)
+        image.load()
+        return image
+
+    def derived(self, key: Hashable, compute: Callable[["ImageInput"], _T]) -> _T:
+        """
+        `compute(self)`, memoised under `key` for the lifetime of this input:
+        an adapter's own preprocessed form (e.g. a re-encoding), keyed by
+        the settings it depends on. Values with an `nbytes` attribute count
+        towards `cached_nbytes`.
+        """
+        if key not in self._derived:
+            self._derived[key] = compute(self)
+        return self._derived[key]
+
+    def cached_nbytes(self) -> int:
+        """
+        Approximate memory held: encoded bytes plus memoised decoded images
+        and derived forms.
+        """
+        images = [self._decoded, *self._resized.values()]
+        return len(self.bytes or b"") + sum(
+            image.width * image.height * len(image.getbands()) for image in images if image is not None) \
+            + sum(getattr(value, "nbytes", 0) for value in self._derived.values())
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class ResponseChunk(BaseModel):
+    """
+    One piece of a streamed response.
+    """
+    delta: str = ""
+    # Discard everything streamed so far (e.g. a rejected answer is replaced)
+    reset: bool = False
@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional
+
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+
+class AsyncVqaPort(ABC):
+    """
+    Awaitable variant of `VqaPort`, for adapters that wait on I/O
+    (e.g. a remote model server) instead of local compute.
+    """
+
+    @abstractmethod
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        pass
+
+    @abstractmethod
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        pass
+
+    async def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        """
+        Stream the caption as it is generated. Adapters that cannot stream
+        yield the whole `process_captioning` output as a single chunk.
+        """
+        response = await self.process_captioning(captioning_input)
+        yield ResponseChunk(delta=response.output)
+
+    async def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        """
+        Stream the answer as it is generated. Adapters that cannot stream
+        yield the whole `process_question` output as a single chunk.
+        """
+        response = await self.process_question(question_input)
+        yield ResponseChunk(delta=response.output)
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Generation parameters a request actually runs with (defaults merged
+        with `options`). Used to key cached responses.
+        """
+        return dict(options or {})
+
+    async def aclose(self) -> None:
+        """
+        Release any resources held by the adapter (connection pools, ...).
+        """
+        pass
@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional
 
 from src.domain.models.input.captioning_input import CaptioningInput
 from src.domain.models.input.question_input import QuestionInput
 from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
 
 class VqaPort(ABC):
 
@@ -13,3 +15,24 @@ class VqaPort(ABC):
     @abstractmethod
     def process_question(self, question_input: QuestionInput) -> Response:
         pass
+
+    def stream_captioning(self, captioning_input: CaptioningInput) -> Iterator[ResponseChunk]:
+        """
+        Stream the caption as it is generated. Adapters that cannot stream
+        yield the whole `process_captioning` output as a single chunk.
+        """
+        yield ResponseChunk(delta=self.process_captioning(captioning_input).output)
+
+    def stream_question(self, question_input: QuestionInput) -> Iterator[ResponseChunk]:
+        """
+        Stream the answer as it is generated. Adapters that cannot stream
+        yield the whole `process_question` output as a single chunk.
+        """
+        yield ResponseChunk(delta=self.process_question(question_input).output)
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Generation parameters a request actually runs with (defaults merged
+        with `options`). Used to key cached responses.
+        """
+        return dict(options or {})
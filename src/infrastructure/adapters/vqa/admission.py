@@ -0,0 +1,105 @@
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Dict, Optional, TypeVar
+
+import anyio
+
+from src.core.request_context import current_api_key
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.infrastructure.adapters.vqa.scheduling import FairScheduler, KeyPolicy
+
+_T = TypeVar("_T")
+# Scheduler lanes, highest priority first
+PRIORITY_LANE = "interactive"
+DEFAULT_LANE = "bulk"
+LANES = (PRIORITY_LANE, DEFAULT_LANE)
+# Requests without an authenticated key share one scheduling identity
+_ANONYMOUS = "anonymous"
+
+
+class AdmissionControlVqaAdapter(AsyncVqaPort):
+    """
+    Bounds the work in flight on an adapter through a `FairScheduler`:
+    a limited number of calls run at once, the others wait in a bounded
+    queue shared fairly between API keys (`ApiKey.id`), with the tasks in
+    `priority_tasks` (e.g. captioning) served before the others. A key's
+    weight and concurrency cap come from its `ApiKey` record, falling back
+    to `default_policy`. Requests
+    that cannot start in time raise `OverloadedError` right away, with a
+    `retry_after` estimated from the recent service time, instead of
+    timing out later after having used the model.
+
+    A stream holds its slot until it is exhausted or closed.
+    """
+
+    def __init__(self, wrapped: AsyncVqaPort, scheduler: FairScheduler, priority_tasks: Collection[str] = (),
+                 default_policy: KeyPolicy = KeyPolicy()):
+        self.wrapped = wrapped
+        self._scheduler = scheduler
+        self._priority_tasks = frozenset(priority_tasks)
+        self._default_policy = default_policy
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.wrapped.get_effective_params(options)
+
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        return await self._run("captioning", lambda: self.wrapped.process_captioning(captioning_input))
+
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        return await self._run("question", lambda: self.wrapped.process_question(question_input))
+
+    def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        # Returned as is, so that closing it reaches `_stream`
+        return self._stream("captioning", lambda: self.wrapped.stream_captioning(captioning_input))
+
+    def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        return self._stream("question", lambda: self.wrapped.stream_question(question_input))
+
+    def _slot(self, task: str) -> tuple[str, str, KeyPolicy]:
+        lane = PRIORITY_LANE if task in self._priority_tasks else DEFAULT_LANE
+        api_key = current_api_key.get()
+        if api_key is None or not api_key.id:
+            return _ANONYMOUS, lane, self._default_policy
+        weight = api_key.scheduling_weight
+        policy = KeyPolicy(
+            weight=weight if weight is not None and weight > 0 else self._default_policy.weight,
+            max_concurrency=api_key.max_concurrency or self._default_policy.max_concurrency,
+            max_queue=self._default_policy.max_queue,
+        )
+        return api_key.id, lane, policy
+
+    async def _run(self, task: str, call: Callable[[], Awaitable[_T]]) -> _T:
+        key, lane, policy = self._slot(task)
+        await self._scheduler.acquire(key, lane, policy)
+        started_at = time.perf_counter()
+        try:
+            return await call()
+        finally:
+            self._scheduler.release(key, time.perf_counter() - started_at)
+
+    async def _stream(self, task: str, open_stream: Callable[[], AsyncIterator[ResponseChunk]]) -> AsyncIterator[ResponseChunk]:
+        key, lane, policy = self._slot(task)
+        await self._scheduler.acquire(key, lane, policy)
+        started_at = time.perf_counter()
+        stream = open_stream()
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            try:
+                # Stop the model work before freeing the slot, also when the client left
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None:
+                    with anyio.CancelScope(shield=True):
+                        await aclose()
+            finally:
+                self._scheduler.release(key, time.perf_counter() - started_at)
+
+    def stats(self) -> Dict[str, object]:
+        return {"priority_tasks": sorted(self._priority_tasks), **self._scheduler.stats()}
+
+    async def aclose(self) -> None:
+        await self.wrapped.aclose()
@@ -1,13 +1,26 @@
+import pkgutil
+from pathlib import Path
 from typing import Type
 
+from src.core.plugins import import_plugin
+from src.domain.ports.async_vqa_port import AsyncVqaPort
 from src.domain.ports.vqa_port import VqaPort
 
 
-_ADAPTERS: dict[str, Type[VqaPort]] = {}
+_ADAPTERS: dict[str, Type[VqaPort] | Type[AsyncVqaPort]] = {}
+
+# Name -> module registering it, imported only when the name is requested.
+# Unlisted names are looked up in `<name>/adapter.py` of this package.
+_ADAPTER_MODULES: dict[str, str] = {
+    "smsa": "src.infrastructure.adapters.vqa.smsa.adapter",
+    "vlm": "src.infrastructure.adapters.vqa.vlm.adapter",
+    "vlm_sync": "src.infrastructure.adapters.vqa.vlm.adapter",
+}
 
 def register_adapter(name: str):
     """
-    Decorator to register an VQA adapter implementation.
+    Decorator to register an VQA adapter implementation
+    (either a `VqaPort` or an `AsyncVqaPort`).
     
     Args:
         name: Unique identifier for the adapter
@@ -15,14 +28,21 @@ def register_adapter(name: str):
     Returns:
         Decorator function that registers the adapter class
     """
-    def decorator(cls: Type[VqaPort]):
+    def decorator(cls: Type[VqaPort] | Type[AsyncVqaPort]):
         _ADAPTERS[name] = cls
         return cls
     return decorator
 
-def get_adapter(name: str) -> Type[VqaPort]:
+def register_adapter_module(name: str, module: str) -> None:
+    """
+    Register an adapter lazily: `module` (which registers `name` with
+    `register_adapter`) is imported on the first `get_adapter(name)`.
+    """
+    _ADAPTER_MODULES[name] = module
+
+def get_adapter(name: str) -> Type[VqaPort] | Type[AsyncVqaPort]:
     """
-    Get an VQA adapter class by name.
+    Get an VQA adapter class by name, importing its module if needed.
     
     Args:
         name: Name of the registered adapter
@@ -33,6 +53,9 @@ def get_adapter(name: str) -> Type[VqaPort]:
     Raises:
         ValueError: If no adapter is registered with the given name
     """
+    if name not in _ADAPTERS:
+        module = _ADAPTER_MODULES.get(name, f"{__package__}.{name}.adapter")
+        import_plugin(module, phase=f"import VQA adapter {name!r}")
     try:
         return _ADAPTERS[name]
     except KeyError:
@@ -40,9 +63,12 @@ def get_adapter(name: str) -> Type[VqaPort]:
 
 def list_available_adapters() -> list[str]:
     """
-    Get a list of all registered adapter names.
+    Get a list of all adapter names, without importing them.
     
     Returns:
         List of registered adapter names
     """
-    return list(_ADAPTERS.keys()) 
\ No newline at end of file
+    package_dir = Path(__file__).parent
+    packages = {name for _, name, is_pkg in pkgutil.iter_modules([str(package_dir)])
+                if is_pkg and (package_dir / name / "adapter.py").exists()}
+    return sorted(set(_ADAPTERS) | set(_ADAPTER_MODULES) | packages)
@@ -0,0 +1,34 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from src.domain.models.input.history_item import HistoryItem
+from src.domain.models.input.image_input import ImageInput
+
+
+def build_request_key(
+    adapter_name: str,
+    task: str,
+    image: ImageInput,
+    params: Dict[str, Any],
+    question: Optional[str] = None,
+    history: Optional[List[HistoryItem]] = None,
+) -> str:
+    """
+    Canonical key of a VQA request: two requests with the same key are
+    expected to produce the same response.
+    """
+    canonical = json.dumps(
+        {
+            "adapter": adapter_name,
+            "task": task,
+            "image": image.content_hash(),
+            "question": question,
+            "history": [[item.question, item.answer] for item in history or []],
+            "params": params,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,282 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from src.domain.errors import OverloadedError, TooManyRequestsError
+
+# Weight of the latest call in the service time average
+_SERVICE_TIME_ALPHA = 0.2
+# Cumulative per-key counters kept for /metrics
+_MAX_TRACKED_KEYS = 1000
+
+
+@dataclass(frozen=True)
+class KeyPolicy:
+    weight: float = 1.0
+    # 0: no limit beyond the global ones
+    max_concurrency: int = 0
+    max_queue: int = 0
+
+
+@dataclass(eq=False)
+class _Waiter:
+    key: str
+    lane: str
+    start: float
+    finish: float
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass(eq=False)
+class _KeyState:
+    policy: KeyPolicy
+    running: int = 0
+    queues: Dict[str, Deque[_Waiter]] = field(default_factory=dict)
+    last_finish: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def eligible(self) -> bool:
+        return not self.policy.max_concurrency or self.running < self.policy.max_concurrency
+
+
+class FairScheduler:
+    """
+    Hands out `max_concurrency` slots across API keys with weighted fair
+    queuing (start-time fair queuing per lane): a key with weight 2 gets
+    twice the slots of a key with weight 1 while both have requests
+    waiting, and a key that floods the queue only delays itself.
+
+    Lanes are served in strict priority order (`lanes`, first is highest),
+    e.g. interactive captioning before bulk questions. Keys at their own
+    concurrency cap are skipped until one of their calls completes. When
+    the shared queue is full, the newest waiter of the key with the most
+    waiting requests is shed instead of a newcomer from a lighter key.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_queue_wait: float, lanes: Iterable[str]):
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_queue = max(0, max_queue)
+        self._max_queue_wait = max_queue_wait
+        self._lanes = list(lanes)
+        self._running = 0
+        self._queued = 0
+        self._keys: Dict[str, _KeyState] = {}
+        # Per lane: virtual time and heap of (finish tag, seq, waiter) for key queue heads
+        self._virtual_time: Dict[str, float] = {lane: 0.0 for lane in self._lanes}
+        self._heaps: Dict[str, List[Tuple[float, int, _Waiter]]] = {lane: [] for lane in self._lanes}
+        self._seq = itertools.count()
+        self._avg_service_seconds = 0.0
+        self._stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_pushed_out": 0,
+                       "shed_key_queue_full": 0, "shed_timeout": 0}
+        self._max_queue_depth = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._key_stats: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    def _key_state(self, key: str, policy: KeyPolicy) -> _KeyState:
+        state = self._keys.get(key)
+        if state is None:
+            state = _KeyState(policy=policy)
+            self._keys[key] = state
+        # The latest policy of a key applies to its next decisions
+        state.policy = policy
+        return state
+
+    def _count(self, key: str, counter: str, value: float = 1) -> None:
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = {"admitted": 0, "shed": 0, "wait_seconds": 0.0}
+            self._key_stats[key] = stats
+            if len(self._key_stats) > _MAX_TRACKED_KEYS:
+                self._key_stats.popitem(last=False)
+        self._key_stats.move_to_end(key)
+        stats[counter] += value
+
+    def _push_head(self, state: _KeyState, lane: str) -> None:
+        queue = state.queues.get(lane)
+        if queue and state.eligible:
+            waiter = queue[0]
+            heapq.heappush(self._heaps[lane], (waiter.finish, next(self._seq), waiter))
+
+    def _pop_next(self) -> Optional[_Waiter]:
+        for lane in self._lanes:
+            heap = self._heaps[lane]
+            while heap:
+                _, _, waiter = heapq.heappop(heap)
+                state = self._keys.get(waiter.key)
+                queue = state.queues.get(lane) if state is not None else None
+                # Stale entry (served, removed or no longer the head), or key at its cap:
+                # the key's head is pushed again when it becomes eligible
+                if not queue or queue[0] is not waiter or not state.eligible:
+                    continue
+                queue.popleft()
+                self._virtual_time[lane] = max(self._virtual_time[lane], waiter.start)
+                self._push_head(state, lane)
+                return waiter
+        return None
+
+    def _dispatch(self) -> None:
+        while self._running < self._max_concurrency:
+            waiter = self._pop_next()
+            if waiter is None:
+                return
+            self._queued -= 1
+            self._grant(self._keys[waiter.key])
+            waiter.future.set_result(None)
+
+    def _grant(self, state: _KeyState) -> None:
+        state.running += 1
+        self._running += 1
+
+    def _remove(self, waiter: _Waiter) -> None:
+        state = self._keys[waiter.key]
+        queue = state.queues[waiter.lane]
+        was_head = queue[0] is waiter
+        queue.remove(waiter)
+        self._queued -= 1
+        if was_head:
+            self._push_head(state, waiter.lane)
+        self._forget_if_idle(waiter.key, state)
+
+    def _forget_if_idle(self, key: str, state: _KeyState) -> None:
+        if not state.running and not state.queued:
+            del self._keys[key]
+
+    def _retry_after(self) -> float:
+        # Time for the current queue to drain, at least one second
+        return max(1.0, math.ceil(self._avg_service_seconds * (self._queued + 1) / self._max_concurrency))
+
+    def _enqueue(self, key: str, lane: str, state: _KeyState) -> _Waiter:
+        virtual_time = self._virtual_time[lane]
+        start = max(virtual_time, state.last_finish.get(lane, virtual_time))
+        waiter = _Waiter(key=key, lane=lane, start=start, finish=start + 1 / state.policy.weight,
+                         future=asyncio.get_running_loop().create_future())
+        state.last_finish[lane] = waiter.finish
+        queue = state.queues.setdefault(lane, deque())
+        queue.append(waiter)
+        self._queued += 1
+        if len(queue) == 1:
+            self._push_head(state, lane)
+        return waiter
+
+    def _shed(self, waiter: _Waiter, counter: str, error: OverloadedError) -> None:
+        # The waiter's own `acquire` raises `error`
+        self._remove(waiter)
+        self._stats[counter] += 1
+        self._count(waiter.key, "shed")
+        waiter.future.set_exception(error)
+
+    def _enforce_limits(self, waiter: _Waiter, state: _KeyState) -> None:
+        if state.policy.max_queue and state.queued > state.policy.max_queue:
+            self._shed(waiter, "shed_key_queue_full", TooManyRequestsError(
+                "Too many queued requests for this API key", retry_after=self._retry_after()))
+            return
+        if self._queued <= self._max_queue:
+            return
+        heaviest = max(self._keys.values(), key=lambda candidate: candidate.queued)
+        if heaviest is not state and heaviest.queued > state.queued + 1:
+            # Push out the newest waiter of the key hogging the queue
+            victim = max((queue[-1] for queue in heaviest.queues.values() if queue), key=lambda w: w.enqueued_at)
+            self._shed(victim, "shed_pushed_out", TooManyRequestsError(
+                "Server is busy, this API key has too many queued requests", retry_after=self._retry_after()))
+        else:
+            self._shed(waiter, "shed_queue_full", OverloadedError(
+                "Server is busy, queue is full", retry_after=self._retry_after()))
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        future = waiter.future
+        if not future.done():
+            future.cancel()
+            self._remove(waiter)
+        elif not future.cancelled() and future.exception() is None:
+            # The slot was handed over as we gave up: pass it on
+            self.release(waiter.key)
+
+    async def acquire(self, key: str, lane: str, policy: KeyPolicy = KeyPolicy()) -> None:
+        """
+        Wait for a slot for `key` in `lane`. Raises `OverloadedError`
+        (`TooManyRequestsError` when the key's own share is exhausted).
+        """
+        state = self._key_state(key, policy)
+        waiter = self._enqueue(key, lane, state)
+        self._dispatch()
+        if waiter.future.done():
+            self._admitted(key, 0.0)
+            return
+        self._stats["queued"] += 1
+        self._enforce_limits(waiter, state)
+        self._max_queue_depth = max(self._max_queue_depth, self._queued)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self._max_queue_wait)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            if not waiter.future.cancelled() and waiter.future.exception() is not None:
+                raise waiter.future.exception()
+            self._stats["shed_timeout"] += 1
+            self._count(key, "shed")
+            raise OverloadedError(
+                f"Server is busy, request could not start within {self._max_queue_wait:g}s",
+                retry_after=self._retry_after())
+        finally:
+            waited = time.perf_counter() - waiter.enqueued_at
+            self._total_wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        self._admitted(key, time.perf_counter() - waiter.enqueued_at)
+
+    def _admitted(self, key: str, waited: float) -> None:
+        self._stats["admitted"] += 1
+        self._count(key, "admitted")
+        self._count(key, "wait_seconds", waited)
+
+    def release(self, key: str, service_seconds: Optional[float] = None) -> None:
+        if service_seconds is not None:
+            self._avg_service_seconds += _SERVICE_TIME_ALPHA * (service_seconds - self._avg_service_seconds)
+        state = self._keys[key]
+        state.running -= 1
+        self._running -= 1
+        if state.eligible:
+            for lane in state.queues:
+                self._push_head(state, lane)
+        self._forget_if_idle(key, state)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, object]:
+        waits = self._stats["queued"] or 1
+        keys = {}
+        for key, counters in self._key_stats.items():
+            state = self._keys.get(key)
+            admitted = counters["admitted"] or 1
+            keys[key] = {
+                "running": state.running if state else 0,
+                "queued": state.queued if state else 0,
+                "admitted": counters["admitted"],
+                "shed": counters["shed"],
+                "avg_queue_wait_seconds": counters["wait_seconds"] / admitted,
+            }
+        return {
+            "max_concurrency": self._max_concurrency,
+            "running": self._running,
+            "queue_depth": self._queued,
+            "max_queue_depth": self._max_queue_depth,
+            **self._stats,
+            "avg_queue_wait_seconds": self._total_wait_seconds / waits,
+            "max_queue_wait_seconds": self._max_wait_seconds,
+            "avg_service_seconds": self._avg_service_seconds,
+            "lanes": {lane: sum(len(state.queues.get(lane, ())) for state in self._keys.values())
+                      for lane in self._lanes},
+            "keys": keys,
+        }
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from src.core.request_context import current_api_key
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.infrastructure.adapters.vqa.request_key import build_request_key
+
+
+class CoalescingVqaAdapter(AsyncVqaPort):
+    """
+    Singleflight in front of an adapter: concurrent requests with the same
+    canonical key wait on one shared computation and share its Response.
+
+    The computation runs in its own task and every caller awaits it through
+    `asyncio.shield`, so a caller that disconnects (is cancelled) only stops
+    waiting; the other callers still get the result.
+
+    Only requests of the same API key are coalesced: the layers behind
+    (admission control, fair scheduling) run in the shared task under the
+    first caller's key, so each key must be queued and charged for its own.
+    """
+
+    def __init__(self, wrapped: AsyncVqaPort, adapter_name: str):
+        self.wrapped = wrapped
+        self._adapter_name = adapter_name
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        self._abandoned = 0
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.wrapped.get_effective_params(options)
+
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        key = build_request_key(
+            self._adapter_name,
+            "captioning",
+            captioning_input.image,
+            self.wrapped.get_effective_params(captioning_input.options),
+            history=captioning_input.history,
+        )
+        return await self._do(key, lambda: self.wrapped.process_captioning(captioning_input))
+
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        key = build_request_key(
+            self._adapter_name,
+            "question",
+            question_input.image,
+            self.wrapped.get_effective_params(question_input.options),
+            question=question_input.question,
+            history=question_input.history,
+        )
+        return await self._do(key, lambda: self.wrapped.process_question(question_input))
+
+    def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        # Streams are per caller, they are not shared
+        return self.wrapped.stream_captioning(captioning_input)
+
+    def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        return self.wrapped.stream_question(question_input)
+
+    async def _do(self, key: str, compute: Callable[[], Awaitable[Response]]) -> Response:
+        api_key = current_api_key.get()
+        key = f"{api_key.id if api_key is not None else ''}:{key}"
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self._coalesced += 1
+        else:
+            self._leaders += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+
+        try:
+            response = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                self._abandoned += 1
+            raise
+
+        if not coalesced:
+            return response
+        details = dict(response.details or {})
+        details["coalesced"] = True
+        return response.model_copy(update={"details": details})
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "in_flight": len(self._in_flight),
+            "computations": self._leaders,
+            "coalesced": self._coalesced,
+            "abandoned_waits": self._abandoned,
+        }
+
+    async def aclose(self) -> None:
+        await self.wrapped.aclose()
@@ -1,15 +1,75 @@
-from unsloth import FastVisionModel
+import threading
+from concurrent.futures import CancelledError, Future
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+try:
+    # Imported before transformers, so that its patches apply
+    from unsloth import FastVisionModel
+except (ImportError, NotImplementedError):
+    # No GPU: only `initialize_with` (e.g. a stand-in model, see tests/smsa)
+    FastVisionModel = None
+from PIL import Image
 import torch
 import torch.nn as nn
-from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_output_embedding
-from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import generate_vqa_sample, generate_instructions_sample, generate_captioning_sample
+from src.core.startup import startup_phase
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_input_embeddings_batch, generate_output_embeddings_batch, model_lock
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.prefix_cache import PrefixKVCache
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.stopping import SentenceEndStoppingCriteria, SentenceEndTextStreamer, sentence_end_tokens
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import IMAGE_SIZE, generate_vqa_sample, generate_instructions_sample, generate_captioning_sample
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+_DEFAULT_MAX_NEW_TOKENS = {"captioning": 128, "question": 128, "instructions": 128}
+# Yielded by the stream methods: discard what was streamed so far
+STREAM_RESET = None
+_UNANSWERABLE = ['unanswerable', 'unsuitable', 'unsuitable image', 'unreadable']
+
+def _needs_instructions(answer_text: str, selector_output: float, threshold: float) -> bool:
+    return answer_text.strip('\'"').lower() in _UNANSWERABLE or selector_output < threshold
+
+def _strip_quotes(texts: Iterable[str]) -> Iterator[str]:
+    """
+    Stream `texts` so that they join to `"".join(texts).strip('\'"')`, as
+    `process_vqa_batch` returns: leading quotes are dropped, trailing
+    ones are held back until more text follows them.
+    """
+    started = False
+    held = ""
+    for text in texts:
+        if not started:
+            text = text.lstrip('\'"')
+            started = bool(text)
+        if not text:
+            continue
+        stripped = text.rstrip('\'"')
+        if stripped:
+            yield held + stripped
+            held = text[len(stripped):]
+        else:
+            held += text
 
 class SMSA:
-    def __init__(self, model_path: str, selector_path: str):
+    def __init__(self, model_path: str, selector_path: str, last_layer_only: bool = True,
+                 speculative_fallback: str = "disabled", pre_score_threshold: float = 0.67,
+                 max_new_tokens: Optional[Dict[str, int]] = None, stop_at_sentence_end: bool = True,
+                 prefix_cache: bool = False):
         self.__model_path = model_path
         self.__selector_path = selector_path
+        # Capture only the final layer's hidden states (lower peak memory)
+        self.__last_layer_only = last_layer_only
+        # "disabled", "always" or "adaptive" (only when the pre-score is below pre_score_threshold)
+        self.__speculative_fallback = speculative_fallback
+        self.__pre_score_threshold = pre_score_threshold
+        # Per-task token budgets ("captioning", "question", "instructions")
+        self.__max_new_tokens = {**_DEFAULT_MAX_NEW_TOKENS, **(max_new_tokens or {})}
+        self.__stop_at_sentence_end = stop_at_sentence_end
+        # Reuse the KV state of each task's system prompt
+        self.__use_prefix_cache = prefix_cache
+        self.__prefix_cache: Optional[PrefixKVCache] = None
+        self.__stats_lock = threading.Lock()
+        self.__decoding_stats = {"generations": 0, "decode_steps": 0, "decode_steps_saved": 0, "sentence_end_stops": 0}
+        self.__speculation_stats = {"speculated": 0, "speculation_used": 0, "speculation_wasted": 0, "sequential_fallbacks": 0}
+        # Adaptive mode: pre-scores of the samples whose answer was then accepted / rejected
+        self.__pre_scores = {"accepted": [0, 0.0], "rejected": [0, 0.0]}
         self.__initialized = False
 
     class __SMSASelector(nn.Module):
@@ -25,55 +85,241 @@ class SMSA:
         def forward(self, x): return self.net(x).squeeze(-1)             
 
     def initialize(self):
+        if FastVisionModel is None:
+            raise RuntimeError("SMSA needs unsloth and a CUDA GPU to load its model")
         # First, load model
-        self.__model, self.__tokenizer = FastVisionModel.from_pretrained(
-            self.__model_path,
-            load_in_4bit=True,
-            use_gradient_checkpointing="unsloth"
-        )
-        FastVisionModel.for_inference(self.__model)
-        self.__model = self.__model.to(torch.bfloat16)
+        with startup_phase("SMSA model load"):
+            model, tokenizer = FastVisionModel.from_pretrained(
+                self.__model_path,
+                load_in_4bit=True,
+                use_gradient_checkpointing="unsloth"
+            )
+            FastVisionModel.for_inference(model)
+            model = model.to(torch.bfloat16)
         # Second, load selector
-        self.__selector = self.__SMSASelector()
-        self.__selector.load_state_dict(torch.load(self.__selector_path))
-        self.__selector.to(DEVICE, dtype=torch.bfloat16)
-        self.__selector.eval()
+        with startup_phase("SMSA selector load"):
+            selector = self.__SMSASelector()
+            selector.load_state_dict(torch.load(self.__selector_path))
+            selector.to(DEVICE, dtype=torch.bfloat16)
+            selector.eval()
+        self.initialize_with(model, tokenizer, selector)
+
+    def initialize_with(self, model, tokenizer, selector: nn.Module):
+        """
+        Finish initialisation with an already loaded model, processor and
+        selector (any module mapping `[B, D]` vectors to `[B]` scores), e.g.
+        the tiny CPU stand-in model of the tests.
+        """
+        self.__model, self.__tokenizer, self.__selector = model, tokenizer, selector
+        # Vocabulary scan, done once
+        self.__sentence_end = sentence_end_tokens(self.__tokenizer) if self.__stop_at_sentence_end else None
+        # Third, prefill the constant system prompts once
+        if self.__use_prefix_cache:
+            with startup_phase("SMSA prefix cache warm-up"):
+                self.__prefix_cache = PrefixKVCache(self.__model, self.__tokenizer)
+                self.__prefix_cache.warm([
+                    generate_vqa_sample(image=None, question="")["messages"],
+                    generate_instructions_sample(image=None, question="")["messages"],
+                    generate_captioning_sample(image=None)["messages"]])
         
         self.__initialized = True
 
-    
-    def process_vqa(self, image_bytes: list[int], question: str, TAU: float = 0.65, threshold: float = 0.67):
+
+    def __criteria(self, tasks: List[str]) -> SentenceEndStoppingCriteria:
+        return SentenceEndStoppingCriteria(
+            budgets=[self.__max_new_tokens[task] for task in tasks],
+            sentence_end=self.__sentence_end)
+
+    def __generate(self, samples, tasks: List[str], streamer: Optional[SentenceEndTextStreamer] = None,
+                   criteria: Optional[SentenceEndStoppingCriteria] = None):
+        """
+        Batched generation + embeddings, each sample with its task's token budget.
+        """
+        criteria = criteria or self.__criteria(tasks)
+        result = generate_output_embeddings_batch(
+            model=self.__model, tokenizer=self.__tokenizer, samples=samples,
+            last_layer_only=self.__last_layer_only, stopping_criteria=criteria, prefix_cache=self.__prefix_cache,
+            streamer=streamer)
+        with self.__stats_lock:
+            self.__decoding_stats["generations"] += 1
+            self.__decoding_stats["decode_steps"] += criteria.steps
+            self.__decoding_stats["decode_steps_saved"] += criteria.steps_saved
+            self.__decoding_stats["sentence_end_stops"] += criteria.sentence_end_stops
+        return result
+
+    def __score(self, question_vecs, answer_vecs, TAU: float) -> List[float]:
+        with torch.no_grad():
+            return self.__selector(TAU * question_vecs + (1 - TAU) * answer_vecs).float().tolist()
+
+    def __pre_score(self, vqa_samples, TAU: float) -> Optional[List[float]]:
+        """
+        Adaptive mode: the selector on a text-only prefill of the questions
+        (no image, no decoding), standing in for both of its inputs. It is
+        not calibrated like the answer-based score: `pre_score_threshold`
+        is tuned from the per-verdict pre-score means in `speculation_stats`.
+        """
+        if self.__speculative_fallback != "adaptive":
+            return None
+        question_vecs = generate_input_embeddings_batch(
+            model=self.__model, tokenizer=self.__tokenizer, last_layer_only=self.__last_layer_only,
+            samples=vqa_samples, text_only=True)
+        return self.__score(question_vecs, question_vecs, TAU)
+
+    def __speculate(self, count: int, pre_scores: Optional[List[float]]) -> List[bool]:
+        """
+        Which samples get their fallback instructions generated alongside the answer.
+        """
+        if self.__speculative_fallback == "always":
+            return [True] * count
+        if pre_scores is None:
+            return [False] * count
+        return [pre_score < self.__pre_score_threshold for pre_score in pre_scores]
+
+    def process_vqa(self, image: Image.Image, question: str, TAU: float = 0.65, threshold: float = 0.67):
+        return self.process_vqa_batch(images=[image], questions=[question], TAU=TAU, threshold=threshold)[0]
+
+    def process_ic(self, image: Image.Image, TAU: float = 0.65, threshold: float = 0.67):
+        return self.process_ic_batch(images=[image], TAU=TAU, threshold=threshold)[0]
+
+    def process_vqa_batch(self, images: List[Image.Image], questions: List[str], TAU: float = 0.65, threshold: float = 0.67) -> List[str]:
+        """
+        `process_vqa` for several requests at once: one padded batch per
+        stage. Speculated fallback prompts (see `speculative_fallback`)
+        join the answer batch, sharing its decoded images; the remaining
+        samples that need the fallback get one more batch.
+        """
         if not self.__initialized:
             self.initialize()
-        vqa_sample = generate_vqa_sample(image_bytes=image_bytes, question=question)
-        answer_vec, question_vec, answer_text = generate_output_embedding(
-            model=self.__model, tokenizer=self.__tokenizer, sample=vqa_sample)
-        
-        selector_input = TAU * question_vec + (1 - TAU) * answer_vec
-        selector_input.to(DEVICE, torch.bfloat16)
-        selector_output = 0.0
-        with torch.no_grad():
-            out = self.__selector(selector_input)
-            selector_output = out.item()
-
-        answer_text_cleaned = answer_text.strip('\'"').lower()
-        if answer_text_cleaned in ['unanswerable', 'unsuitable', 'unsuitable image', 'unreadable'] \
-            or selector_output < threshold:
-
-            instructions_sample = generate_instructions_sample(image_bytes=image_bytes, question=question)
-            _, _, instructions_text = generate_output_embedding(
-                model=self.__model, tokenizer=self.__tokenizer, sample=instructions_sample)
-            
-            return instructions_text.strip('\'"')
-        
-        return answer_text.strip('\'"')
+        vqa_samples = [generate_vqa_sample(image=image, question=question)
+                       for image, question in zip(images, questions)]
+        pre_scores = self.__pre_score(vqa_samples, TAU)
+        speculated = [i for i, speculate in enumerate(self.__speculate(len(vqa_samples), pre_scores)) if speculate]
+        instructions_samples = {i: generate_instructions_sample(image=images[i], question=questions[i])
+                                for i in range(len(vqa_samples))}
 
-    def process_ic(self, image_bytes: list[int], TAU: float = 0.65, threshold: float = 0.67):
+        answer_vecs, question_vecs, answer_texts = self.__generate(
+            vqa_samples + [instructions_samples[i] for i in speculated],
+            ["question"] * len(vqa_samples) + ["instructions"] * len(speculated))
+        count = len(vqa_samples)
+        speculated_texts = dict(zip(speculated, answer_texts[count:]))
+        selector_outputs = self.__score(question_vecs[:count], answer_vecs[:count], TAU)
+
+        results = [answer_text.strip('\'"') for answer_text in answer_texts[:count]]
+        fallback = [i for i, (answer_text, selector_output) in enumerate(zip(answer_texts[:count], selector_outputs))
+                    if _needs_instructions(answer_text, selector_output, threshold)]
+        sequential = [i for i in fallback if i not in speculated_texts]
+        if sequential:
+            _, _, sequential_texts = self.__generate(
+                [instructions_samples[i] for i in sequential], ["instructions"] * len(sequential))
+            speculated_texts.update(zip(sequential, sequential_texts))
+        for i in fallback:
+            results[i] = speculated_texts[i].strip('\'"')
+
+        with self.__stats_lock:
+            self.__speculation_stats["speculated"] += len(speculated)
+            self.__speculation_stats["speculation_used"] += len(set(speculated) & set(fallback))
+            self.__speculation_stats["speculation_wasted"] += len(set(speculated) - set(fallback))
+            self.__speculation_stats["sequential_fallbacks"] += len(sequential)
+            for i, pre_score in enumerate(pre_scores or []):
+                verdict = self.__pre_scores["rejected" if i in fallback else "accepted"]
+                verdict[0] += 1
+                verdict[1] += pre_score
+        return results
+
+    def process_ic_batch(self, images: List[Image.Image], TAU: float = 0.65, threshold: float = 0.67) -> List[str]:
+        if not self.__initialized:
+            self.initialize()
+        ic_samples = [generate_captioning_sample(image=image) for image in images]
+        _, _, answer_texts = self.__generate(ic_samples, ["captioning"] * len(ic_samples))
+        return answer_texts
+
+    @contextmanager
+    def __stream_generate(self, sample, task: str):
+        """
+        Generate `sample` on a background thread, through the same
+        serialised model path as batches (`model_lock`). Yields the text
+        streamer to iterate and a future with the `__generate` result.
+        On exit (stream finished, or closed because the client left),
+        decoding stops at the next step and the thread is joined, so the
+        caller's admission slot is only released once the model is free.
+        """
+        criteria = self.__criteria([task])
+        streamer = SentenceEndTextStreamer(
+            getattr(self.__tokenizer, "tokenizer", self.__tokenizer), criteria, skip_prompt=True, skip_special_tokens=True)
+        result: Future = Future()
+
+        def run():
+            try:
+                with model_lock(self.__model):
+                    # Closed while waiting for the model
+                    if criteria.cancelled:
+                        raise CancelledError()
+                    result.set_result(self.__generate([sample], [task], streamer=streamer, criteria=criteria))
+            except BaseException as e:
+                result.set_exception(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, name="smsa_stream", daemon=True)
+        thread.start()
+        try:
+            yield streamer, result
+        finally:
+            criteria.cancel()
+            thread.join()
+
+    def stream_ic(self, image: Image.Image, TAU: float = 0.65, threshold: float = 0.67) -> Iterator[str]:
         if not self.__initialized:
             self.initialize()
-        ic_sample = generate_captioning_sample(image_bytes=image_bytes)
-        _, _, answer_text = generate_output_embedding(
-            model=self.__model, tokenizer=self.__tokenizer, sample=ic_sample)
-        return answer_text
+        with self.__stream_generate(generate_captioning_sample(image=image), "captioning") as (streamer, result):
+            for text in streamer:
+                if text:
+                    yield text
+            result.result()
+
+    def stream_vqa(self, image: Image.Image, question: str, TAU: float = 0.65, threshold: float = 0.67,
+                   verify_answer: bool = True) -> Iterator[Optional[str]]:
+        """
+        Stream `process_vqa`. With `verify_answer`, the answer is held back
+        until the selector accepts it (only fallback instructions are
+        streamed token by token); otherwise it is streamed immediately and
+        `STREAM_RESET` is yielded before the instructions if it is rejected.
+        """
+        if not self.__initialized:
+            self.initialize()
+        with self.__stream_generate(generate_vqa_sample(image=image, question=question), "question") as (streamer, result):
+            for text in _strip_quotes(streamer):
+                if not verify_answer:
+                    yield text
+            answer_vecs, question_vecs, answer_texts = result.result()
+        selector_output = self.__score(question_vecs, answer_vecs, TAU)[0]
+        if not _needs_instructions(answer_texts[0], selector_output, threshold):
+            if verify_answer:
+                yield answer_texts[0].strip('\'"')
+            return
+
+        if not verify_answer:
+            yield STREAM_RESET
+        with self.__stream_generate(
+                generate_instructions_sample(image=image, question=question), "instructions") as (streamer, result):
+            yield from _strip_quotes(streamer)
+            result.result()
+
+    def speculation_stats(self) -> Dict[str, object]:
+        with self.__stats_lock:
+            return {"mode": self.__speculative_fallback,
+                    "pre_score_threshold": self.__pre_score_threshold,
+                    # Set the threshold between these two (adaptive mode only)
+                    "mean_pre_score_accepted": self.__mean_pre_score("accepted"),
+                    "mean_pre_score_rejected": self.__mean_pre_score("rejected"),
+                    **self.__speculation_stats}
 
+    def __mean_pre_score(self, verdict: str) -> Optional[float]:
+        count, total = self.__pre_scores[verdict]
+        return total / count if count else None
 
+    def decoding_stats(self) -> Dict[str, object]:
+        with self.__stats_lock:
+            return {"stop_at_sentence_end": self.__stop_at_sentence_end,
+                    "max_new_tokens": dict(self.__max_new_tokens),
+                    "prefix_cache": self.__prefix_cache.stats() if self.__prefix_cache is not None else None,
+                    **self.__decoding_stats}
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+_ItemT = TypeVar("_ItemT")
+_ResultT = TypeVar("_ResultT")
+
+
+class MicroBatcher(Generic[_ItemT, _ResultT]):
+    """
+    Dynamic micro-batching scheduler.
+
+    Callers (threads) `submit` single items and block until their result is
+    ready. A worker thread waits for the first item, then keeps collecting
+    for up to `max_wait_seconds` or until `max_batch_size` items are queued,
+    runs `batch_fn` once on the whole batch and routes each result back.
+    `batch_fn` must return one result per item, in order.
+
+    The batcher knows nothing about models, so it can be driven by any
+    batch function (e.g. a tiny stand-in model on CPU).
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[_ItemT]], Sequence[_ResultT]],
+        max_batch_size: int,
+        max_wait_seconds: float,
+        name: str = "micro_batcher",
+    ) -> None:
+        self._batch_fn = batch_fn
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_seconds = max(0.0, max_wait_seconds)
+        self._queue: "queue.Queue[Optional[Tuple[_ItemT, Future, float]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._total_batch_seconds = 0.0
+        self._last_batch_seconds = 0.0
+        self._total_queue_wait_seconds = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: _ItemT) -> _ResultT:
+        """
+        Queue `item` for the next batch and wait for its result.
+        """
+        return self.submit_async(item).result()
+
+    def submit_async(self, item: _ItemT) -> "Future[_ResultT]":
+        if self._closed:
+            raise RuntimeError("Batcher is closed")
+        future: "Future[_ResultT]" = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> Optional[List[Tuple[_ItemT, Future, float]]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self._max_wait_seconds
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Skip items whose caller already gave up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started_at = time.perf_counter()
+            try:
+                results = self._batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+            except BaseException as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._failed_batches += 1
+                continue
+            elapsed = time.perf_counter() - started_at
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                self._total_batch_seconds += elapsed
+                self._last_batch_seconds = elapsed
+                self._total_queue_wait_seconds += sum(started_at - queued_at for _, _, queued_at in batch)
+
+    def close(self) -> None:
+        """
+        Stop the worker after the queued items are processed.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self._max_batch_size,
+                "max_wait_seconds": self._max_wait_seconds,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "failed_batches": self._failed_batches,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_batch_seconds": self._total_batch_seconds / self._batches if self._batches else 0.0,
+                "last_batch_seconds": self._last_batch_seconds,
+                "avg_queue_wait_seconds": self._total_queue_wait_seconds / self._items if self._items else 0.0,
+            }
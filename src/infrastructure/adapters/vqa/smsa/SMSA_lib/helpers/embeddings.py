@@ -1,6 +1,26 @@
+import threading
+import weakref
 import torch
 from torch.nn.functional import normalize
+from transformers import StoppingCriteriaList
 DEVICE  = "cuda" if torch.cuda.is_available() else "cpu"
+
+_model_locks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_model_locks_guard = threading.Lock()
+
+def model_lock(model) -> threading.RLock:
+    """
+    The lock serialising the batch functions below (and prefix cache
+    prefills) on `model`: their forward hooks (`_LastLayerCapture`) and
+    Qwen-VL's cached rope deltas live on the shared modules, so concurrent
+    calls (micro-batcher workers, threadpool calls, streams) would see
+    each other's state. Reentrant, as a prefix may be computed mid-call.
+    """
+    with _model_locks_guard:
+        lock = _model_locks.get(model)
+        if lock is None:
+            lock = _model_locks[model] = threading.RLock()
+        return lock
 def generate_input_embedding(model, tokenizer, sample):
     
     messages = [sample["messages"][0], sample["messages"][1]]
@@ -29,7 +49,12 @@ def generate_input_embedding(model, tokenizer, sample):
     
     return question_vec, inputs, image, messages
 
-def generate_output_embedding(model, tokenizer, sample):
+def generate_output_embedding_three_pass(model, tokenizer, sample):
+    """
+    Reference implementation: question forward pass, generation, then a
+    forward pass over prompt + answer to pool the answer. Kept to check
+    `generate_output_embedding` against (see benchmarks/smsa_equivalence.py).
+    """
     question_vec, inputs, image, messages = generate_input_embedding(model, tokenizer, sample)    
     gen_ids = model.generate \
     (
@@ -74,3 +99,347 @@ def generate_output_embedding(model, tokenizer, sample):
     answer_vec = normalize(answer_vec, dim=-1)
 
     return answer_vec, question_vec, answer_txt
+
+def _use_left_padding(tokenizer):
+    # Decoder-only generation needs every prompt to end at the same position
+    inner = getattr(tokenizer, "tokenizer", tokenizer)
+    inner.padding_side = "left"
+
+def _masked_sum(hidden, mask):
+    return (hidden * mask.unsqueeze(-1)).sum(1)
+
+def _masked_mean(hidden, mask):
+    pooled = _masked_sum(hidden, mask) / mask.sum(1, keepdim=True) # Mean pooling
+    return normalize(pooled, dim=-1) # L2 norm
+
+_ANSWER_PLACEHOLDER = "\x00"
+
+def _assistant_suffix_ids(tokenizer, messages):
+    """
+    Token ids the chat template appends after an assistant answer
+    (e.g. `<|im_end|>` and a newline), which the reference answer pooling includes.
+    """
+    rendered = tokenizer.apply_chat_template(
+        messages + [{"role": "assistant", "content": [{"type": "text", "text": _ANSWER_PLACEHOLDER}]}],
+        tokenize=False)
+    suffix = rendered[rendered.rindex(_ANSWER_PLACEHOLDER) + len(_ANSWER_PLACEHOLDER):]
+    inner = getattr(tokenizer, "tokenizer", tokenizer)
+    return inner(suffix, add_special_tokens=False).input_ids
+
+def _stop_token_ids(model, tokenizer):
+    # Rows that stop early are padded until the whole batch is done
+    eos = model.generation_config.eos_token_id
+    ids = set(eos if isinstance(eos, (list, tuple)) else [eos])
+    ids.add(model.generation_config.pad_token_id)
+    inner = getattr(tokenizer, "tokenizer", tokenizer)
+    ids.update(i for i in (inner.eos_token_id, inner.pad_token_id) if i is not None)
+    return sorted(i for i in ids if i is not None)
+
+def _get_rope_index(model):
+    # 3D multimodal rotary positions (Qwen-VL); where it lives depends on the transformers version
+    return getattr(model, "get_rope_index", None) \
+        or getattr(getattr(model, "model", None), "get_rope_index", None)
+
+def _set_rope_deltas(model, rope_deltas):
+    # Qwen-VL derives decode positions from the cached deltas of the last prefill.
+    # Shared module state: only set under `model_lock`, and reset after the call
+    for module in model.modules():
+        if hasattr(module, "rope_deltas"):
+            module.rope_deltas = rope_deltas
+
+def _next_positions(model, inputs):
+    """
+    Position id that follows each (left padded) prompt, and whether the
+    model uses 3D multimodal rotary positions (Qwen-VL).
+    """
+    get_rope_index = _get_rope_index(model)
+    if get_rope_index is not None:
+        position_ids, _ = get_rope_index(
+            input_ids=inputs["input_ids"],
+            image_grid_thw=inputs.get("image_grid_thw"),
+            attention_mask=inputs["attention_mask"])
+        return position_ids.amax(dim=(0, 2)) + 1, True
+    return inputs["attention_mask"].sum(1), False
+
+def _messages(samples):
+    return [[sample["messages"][0], sample["messages"][1]] for sample in samples]
+
+def _without_images(messages):
+    return [messages[0], {**messages[1], "content": [part for part in messages[1]["content"] if part["type"] != "image"]}]
+
+def _tokenize(tokenizer, messages_list, prefix_len=0, text_only=False):
+    # Chat templates, minus the first `prefix_len` characters, left padded into one batch
+    _use_left_padding(tokenizer)
+    if text_only:
+        messages_list = [_without_images(messages) for messages in messages_list]
+        images = None
+    else:
+        images = [messages[1]["content"][len(messages[1]["content"]) - 1]['image'] for messages in messages_list]
+    templates = [tokenizer.apply_chat_template(messages, add_generation_prompt=True)[prefix_len:]
+                 for messages in messages_list]
+    return tokenizer \
+    (
+        images=images,
+        text  = templates,
+        add_special_tokens=False, # Template already contain those
+        padding=True,
+        return_tensors="pt",
+    ).to(DEVICE)
+
+class _LastLayerCapture:
+    """
+    Forward hook on the decoder's final norm, whose output is
+    `hidden_states[-1]`. A prompt call announced with `pool_next` is summed
+    into `question_sum` as soon as it runs; other calls (one `[B, 1, D]`
+    per decode step, then the tail pass) are kept. No other layer's
+    activations outlive their forward pass, unlike `output_hidden_states=True`.
+    The hook sees every call on the model: only use it under `model_lock`.
+    """
+
+    def __init__(self, model):
+        self.question_sum = 0
+        self.calls = []
+        self._pool_mask = None
+        self._handle = model.get_decoder().norm.register_forward_hook(self._hook)
+
+    def pool_next(self, mask):
+        self._pool_mask = mask
+
+    def _hook(self, module, args, output):
+        if self._pool_mask is not None:
+            self.question_sum = self.question_sum + _masked_sum(output, self._pool_mask)
+            self._pool_mask = None
+        else:
+            self.calls.append(output)
+
+    def remove(self):
+        self._handle.remove()
+
+class _Prompt:
+    """
+    A tokenized batch of prompts, ready for `generate`.
+    """
+
+    def __init__(self, generate_inputs, next_positions, multimodal_rope, question_sum, question_count, first_call_mask):
+        self.generate_inputs = generate_inputs
+        self.attention_mask = generate_inputs["attention_mask"]
+        self.next_positions = next_positions
+        self.multimodal_rope = multimodal_rope
+        # Question hidden-state sum over the tokens `generate` will not see itself
+        self.question_sum = question_sum
+        self.question_count = question_count
+        # Mask of the rows/positions of generate's first forward call
+        self.first_call_mask = first_call_mask
+
+def _full_prompt(model, tokenizer, messages_list):
+    inputs = _tokenize(tokenizer, messages_list)
+    next_positions, multimodal_rope = _next_positions(model, inputs)
+    mask = inputs['attention_mask']
+    return _Prompt(inputs, next_positions, multimodal_rope, 0, mask.sum(1, keepdim=True), mask)
+
+def _prefixed_prompt(model, tokenizer, messages_list, prefix, capture):
+    """
+    Continue from the cached system-prompt prefix: only the question and
+    image tokens are prefilled, with explicit 3D positions, since Qwen-VL
+    cannot derive image positions for a prefill that does not start at 0.
+    The suffixes are left padded, so the padding sits between the prefix
+    and the suffix and is masked out.
+    """
+    suffix = _tokenize(tokenizer, messages_list, prefix_len=len(prefix.text))
+    batch_size = suffix.input_ids.shape[0]
+    prefix_len = prefix.length
+    input_ids = torch.cat([prefix.input_ids.expand(batch_size, -1), suffix.input_ids], dim=1)
+    attention_mask = torch.cat([torch.ones_like(prefix.input_ids).expand(batch_size, -1), suffix.attention_mask], dim=1)
+    position_ids, rope_deltas = _get_rope_index(model)(
+        input_ids=input_ids,
+        image_grid_thw=suffix.get("image_grid_thw"),
+        attention_mask=attention_mask)
+    cache = prefix.cache_for_batch(batch_size)
+    vision_inputs = {name: value for name, value in suffix.items() if name not in ("input_ids", "attention_mask")}
+
+    # Prefill all but the last prompt token; generate feeds that one and goes on
+    suffix_mask = suffix.attention_mask[:, :-1]
+    if capture is not None:
+        capture.pool_next(suffix_mask)
+    with torch.no_grad():
+        out = model \
+        (
+            input_ids=suffix.input_ids[:, :-1],
+            attention_mask=attention_mask[:, :-1],
+            position_ids=position_ids[:, :, prefix_len:-1],
+            past_key_values=cache,
+            cache_position=torch.arange(prefix_len, input_ids.shape[1] - 1, device=input_ids.device),
+            use_cache=True,
+            output_hidden_states=capture is None,
+            return_dict=True,
+            **vision_inputs
+        )
+    question_sum = prefix.hidden_sum if capture is not None \
+        else prefix.hidden_sum + _masked_sum(out.hidden_states[-1], suffix_mask)
+    del out
+    _set_rope_deltas(model, rope_deltas)
+
+    return _Prompt(
+        {"input_ids": input_ids, "attention_mask": attention_mask, "past_key_values": cache},
+        position_ids.amax(dim=(0, 2)) + 1, True,
+        question_sum,
+        prefix_len + suffix.attention_mask.sum(1, keepdim=True),
+        torch.ones((batch_size, 1), dtype=torch.long, device=input_ids.device))
+
+def generate_input_embeddings_batch(model, tokenizer, samples, last_layer_only=True, text_only=False):
+    """
+    `[B, D]` question vectors from one prefill forward pass, without
+    generating. With `text_only`, the images are left out of the prompts,
+    so the vision encoder does not run (cheap pre-scoring).
+    """
+    with model_lock(model):
+        return _input_embeddings_batch(model, tokenizer, samples, last_layer_only, text_only)
+
+def _input_embeddings_batch(model, tokenizer, samples, last_layer_only, text_only):
+    inputs = _tokenize(tokenizer, _messages(samples), text_only=text_only)
+    if not last_layer_only:
+        with torch.no_grad():
+            outs = model(**inputs, output_hidden_states=True, return_dict=True)
+        return _masked_mean(outs.hidden_states[-1], inputs['attention_mask'])
+    capture = _LastLayerCapture(model)
+    capture.pool_next(inputs['attention_mask'])
+    try:
+        with torch.no_grad():
+            model(**inputs, return_dict=True)
+        return normalize(capture.question_sum / inputs['attention_mask'].sum(1, keepdim=True), dim=-1)
+    finally:
+        capture.remove()
+
+def generate_output_embeddings_batch(model, tokenizer, samples, last_layer_only=True, stopping_criteria=None,
+                                     prefix_cache=None, streamer=None):
+    """
+    Question and answer embeddings from a single generation run.
+
+    The question vector pools the prefill hidden states `generate` already
+    computes. The answer vector pools the hidden state of each generated
+    token (computed when it is fed back) plus the chat template's
+    end-of-turn tokens, which are run as one short forward pass on the
+    generation's KV cache with the positions they would have in the
+    reference prompt + answer pass. The image and the prompt are encoded
+    once instead of three times.
+
+    With `last_layer_only`, only the final layer's hidden states are
+    captured (see `_LastLayerCapture`) instead of every layer's.
+    `stopping_criteria` (a `SentenceEndStoppingCriteria`) sets per-sample
+    token budgets and early stopping; without it, up to 128 new tokens.
+    With a `prefix_cache` (`PrefixKVCache`), a batch whose samples share a
+    system prompt continues from its cached KV state and pooled hidden
+    states instead of prefilling it. A `streamer` (batch of one) receives
+    the answer tokens as they are generated.
+
+    Samples are left padded into one batch. Returns `[B, D]` answer and
+    question vectors and the list of answer texts, in sample order. Calls
+    on the same model run one at a time (see `model_lock`).
+    """
+    with model_lock(model):
+        return _output_embeddings_batch(model, tokenizer, samples, last_layer_only, stopping_criteria,
+                                        prefix_cache, streamer)
+
+def _output_embeddings_batch(model, tokenizer, samples, last_layer_only, stopping_criteria, prefix_cache, streamer):
+    messages_list = _messages(samples)
+    prefix = prefix_cache.lookup(messages_list) \
+        if prefix_cache is not None and _get_rope_index(model) is not None else None
+
+    capture = _LastLayerCapture(model) if last_layer_only else None
+    try:
+        prompt = _prefixed_prompt(model, tokenizer, messages_list, prefix, capture) if prefix is not None \
+            else _full_prompt(model, tokenizer, messages_list)
+        if capture is not None:
+            capture.pool_next(prompt.first_call_mask)
+        with torch.no_grad():
+            outs = model.generate \
+            (
+                **prompt.generate_inputs,
+                max_new_tokens=stopping_criteria.max_new_tokens if stopping_criteria is not None else 128,
+                stopping_criteria=StoppingCriteriaList([stopping_criteria]) if stopping_criteria is not None else None,
+                streamer=streamer,
+                do_sample=False,
+                output_hidden_states=not last_layer_only,
+                return_dict_in_generate=True
+            )
+        trimmed = stopping_criteria.trimmed if stopping_criteria is not None else None
+        return _pool_generation(model, tokenizer, messages_list, prompt, outs, capture, trimmed)
+    finally:
+        if capture is not None:
+            capture.remove()
+        if prefix is not None:
+            _set_rope_deltas(model, None)
+
+def _pool_generation(model, tokenizer, messages_list, prompt, outs, capture, trimmed=None):
+    prompt_mask = prompt.attention_mask
+    padded_q_len = prompt_mask.shape[1]
+    if capture is not None:
+        question_sum = prompt.question_sum + capture.question_sum
+        gen_hidden = list(capture.calls)
+    else:
+        # hidden_states[0] is generate's first call, hidden_states[t] the token fed at step t
+        question_sum = prompt.question_sum + _masked_sum(outs.hidden_states[0][-1], prompt.first_call_mask)
+        gen_hidden = [step[-1] for step in outs.hidden_states[1:]]
+    question_vecs = normalize(question_sum / prompt.question_count, dim=-1)
+
+    generated = outs.sequences[:, padded_q_len:]
+    batch_size, gen_len = generated.shape
+    is_stop = torch.isin(generated, torch.tensor(_stop_token_ids(model, tokenizer), device=generated.device))
+    answer_lens = torch.where(is_stop.any(1), is_stop.int().argmax(1), torch.full_like(is_stop[:, 0], gen_len, dtype=torch.long))
+    if trimmed is not None:
+        # Rows stopped on the token that follows their sentence end
+        answer_lens = answer_lens - trimmed.to(answer_lens.device).long()
+    answer_txts = [tokenizer.decode(generated[i, :answer_lens[i]], skip_special_tokens=True).strip()
+                   for i in range(batch_size)]
+
+    # The last generated token is never fed back, so the cache holds gen_len - 1 of them
+    fed_len = gen_len - 1
+    if len(gen_hidden) != fed_len:
+        raise RuntimeError(f"Captured {len(gen_hidden)} decode steps, expected {fed_len}: "
+                           "the model's generation bypasses its final norm module, disable last_layer_only")
+    cached_answer_lens = answer_lens.clamp(max=fed_len)
+    steps = torch.arange(fed_len, device=generated.device).unsqueeze(0)
+    gen_mask = (steps < cached_answer_lens.unsqueeze(1)).long()
+
+    # End-of-turn tokens, preceded by the last answer token when generation
+    # stopped without a stop token (budget or sentence end)
+    suffix_ids = _assistant_suffix_ids(tokenizer, messages_list[0])
+    tails = [([generated[i, -1].item()] if answer_lens[i] == gen_len else []) + suffix_ids
+             for i in range(batch_size)]
+    tail_len = max(len(tail) for tail in tails)
+    tail_ids = torch.zeros((batch_size, tail_len), dtype=torch.long, device=generated.device)
+    tail_mask = torch.zeros((batch_size, tail_len), dtype=torch.long, device=generated.device)
+    for i, tail in enumerate(tails):
+        tail_ids[i, :len(tail)] = torch.tensor(tail, device=generated.device)
+        tail_mask[i, :len(tail)] = 1
+    # Continue right after each sample's own answer, skipping its stop/pad tokens
+    tail_positions = (prompt.next_positions + cached_answer_lens).unsqueeze(1) \
+        + torch.arange(tail_len, device=generated.device).unsqueeze(0)
+    if prompt.multimodal_rope:
+        tail_positions = tail_positions.unsqueeze(0).expand(3, -1, -1)
+
+    with torch.no_grad():
+        tail_out = model \
+        (
+            input_ids=tail_ids,
+            attention_mask=torch.cat([prompt_mask, gen_mask, tail_mask], dim=1),
+            position_ids=tail_positions,
+            past_key_values=outs.past_key_values,
+            cache_position=torch.arange(padded_q_len + fed_len, padded_q_len + fed_len + tail_len, device=generated.device),
+            output_hidden_states=capture is None,
+            return_dict=True
+        )
+    tail_hidden = capture.calls[-1] if capture is not None else tail_out.hidden_states[-1]
+    del outs, tail_out
+
+    ans_last = torch.cat(gen_hidden + [tail_hidden], dim=1)
+    ans_mask = torch.cat([gen_mask, tail_mask], dim=1)
+    answer_vecs = _masked_mean(ans_last, ans_mask)
+
+    return answer_vecs, question_vecs, answer_txts
+
+def generate_output_embedding(model, tokenizer, sample, last_layer_only=True, stopping_criteria=None, prefix_cache=None):
+    answer_vecs, question_vecs, answer_txts = generate_output_embeddings_batch(
+        model, tokenizer, [sample], last_layer_only=last_layer_only, stopping_criteria=stopping_criteria,
+        prefix_cache=prefix_cache)
+    return answer_vecs, question_vecs, answer_txts[0]
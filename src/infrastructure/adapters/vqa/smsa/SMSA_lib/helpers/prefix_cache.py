@@ -0,0 +1,113 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from transformers import DynamicCache
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import model_lock
+
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+def system_prefix_text(tokenizer, messages) -> Optional[str]:
+    """
+    The rendered system turn that every prompt of a task starts with, or
+    None when the chat template does not render it as a plain prefix.
+    """
+    if not messages or messages[0]["role"] != "system":
+        return None
+    prefix = tokenizer.apply_chat_template([messages[0]], tokenize=False)
+    full = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    return prefix if full.startswith(prefix) else None
+
+@dataclass
+class PrefixEntry:
+    text: str
+    input_ids: torch.Tensor # [1, p]
+    # Per layer (key, value), [1, heads, p, head_dim]
+    key_values: Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+    # Sum of the last layer's hidden states over the prefix, [1, D]
+    hidden_sum: torch.Tensor
+
+    @property
+    def length(self) -> int:
+        return self.input_ids.shape[1]
+
+    def cache_for_batch(self, batch_size: int) -> DynamicCache:
+        """
+        A fresh cache holding the prefix for every row; the entry itself is never mutated.
+        """
+        return DynamicCache.from_legacy_cache(tuple(
+            (key.expand(batch_size, -1, -1, -1).contiguous(), value.expand(batch_size, -1, -1, -1).contiguous())
+            for key, value in self.key_values))
+
+class PrefixKVCache:
+    """
+    KV cache and pooled last-layer hidden states of constant prompt
+    prefixes (the SMSA system prompts), computed once per prefix text.
+    Requests continue from a copy, so their prefill only covers the
+    question and image tokens.
+    """
+
+    def __init__(self, model, tokenizer):
+        self._model = model
+        self._tokenizer = tokenizer
+        self._entries: Dict[str, PrefixEntry] = {}
+        self._lock = threading.Lock()
+
+    def warm(self, messages_list: List[list]) -> None:
+        for messages in messages_list:
+            text = system_prefix_text(self._tokenizer, messages)
+            if text is not None:
+                self.get(text)
+
+    def lookup(self, messages_list: List[list]) -> Optional[PrefixEntry]:
+        """
+        The shared prefix entry of a batch, or None when its samples do not
+        all start with the same system prompt.
+        """
+        texts = {system_prefix_text(self._tokenizer, messages) for messages in messages_list}
+        if len(texts) != 1 or None in texts:
+            return None
+        return self.get(texts.pop())
+
+    def get(self, text: str) -> PrefixEntry:
+        with self._lock:
+            entry = self._entries.get(text)
+        if entry is not None:
+            return entry
+        # `model_lock` before `self._lock`, as in a generation calling `lookup`
+        with model_lock(self._model):
+            with self._lock:
+                entry = self._entries.get(text)
+            if entry is None:
+                entry = self._compute(text)
+                with self._lock:
+                    self._entries[text] = entry
+            return entry
+
+    def _compute(self, text: str) -> PrefixEntry:
+        # Under `model_lock`
+        inner = getattr(self._tokenizer, "tokenizer", self._tokenizer)
+        input_ids = inner(text, add_special_tokens=False, return_tensors="pt").input_ids.to(DEVICE)
+        with torch.no_grad():
+            out = self._model \
+            (
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                use_cache=True,
+                output_hidden_states=True,
+                return_dict=True
+            )
+        cache = out.past_key_values
+        key_values = cache.to_legacy_cache() if hasattr(cache, "to_legacy_cache") else tuple(cache)
+        return PrefixEntry(
+            text=text,
+            input_ids=input_ids,
+            key_values=key_values,
+            hidden_sum=out.hidden_states[-1].sum(1))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"prefixes": len(self._entries),
+                    "prefix_tokens": sorted(entry.length for entry in self._entries.values())}
@@ -0,0 +1,164 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria, TextIteratorStreamer
+
+# ".", "!" or "?", possibly followed by closing quotes / brackets
+_TERMINATOR = re.compile(r"[.!?][\"'”’)\]]*$")
+_CLOSED_SENTENCE = re.compile(r"[.!?][\"'”’)\]]*\s+$")
+# Words whose "." does not end a sentence: common titles and initials ("J.", "U.S.", "e.g.")
+_ABBREVIATION = re.compile(r"[\"'“‘(\[]*(?:Mr|Mrs|Ms|Dr|Prof|St|Sr|Jr|Mt|vs|(?:[A-Za-z]\.)*[A-Za-z])\.")
+# Tokens decoded back to find the word before a sentence end
+_MAX_WORD_TOKENS = 8
+_sentence_end_tokens_cache = {}
+
+@dataclass(frozen=True)
+class SentenceEndTokens:
+    """
+    Token ids involved in sentence ends. A terminator alone is not one:
+    "$3.50" or a URL tokenise into pieces ending with ".", so the sentence
+    only ends when the next token is a boundary. Titles and initials
+    ("Dr. Smith", "St. Louis", "U.S. Army", "e.g. The") are followed by a
+    boundary too, so the word before it is also checked (`texts`).
+    """
+    # End a sentence by themselves (".\n")
+    closing: List[int]
+    # End with a terminator ("." "3." "Dr.")
+    terminators: List[int]
+    # Start with whitespace not followed by a lowercase letter (" The", "\n")
+    boundaries: List[int]
+    # Decoded text of every token id
+    texts: List[str]
+
+def sentence_end_tokens(tokenizer) -> SentenceEndTokens:
+    """
+    Scan the vocabulary for `SentenceEndTokens`, memoised per tokenizer.
+    """
+    inner = getattr(tokenizer, "tokenizer", tokenizer)
+    key = id(inner)
+    if key not in _sentence_end_tokens_cache:
+        texts = inner.batch_decode([[i] for i in range(len(inner))])
+        _sentence_end_tokens_cache[key] = SentenceEndTokens(
+            closing=[i for i, text in enumerate(texts) if _CLOSED_SENTENCE.search(text)],
+            terminators=[i for i, text in enumerate(texts) if _TERMINATOR.search(text)],
+            boundaries=[i for i, text in enumerate(texts)
+                        if text[:1].isspace() and not text.lstrip()[:1].islower()],
+            texts=texts)
+    return _sentence_end_tokens_cache[key]
+
+def _ids(ids: Sequence[int]) -> torch.Tensor:
+    return torch.tensor(list(ids), dtype=torch.long)
+
+class SentenceEndStoppingCriteria(StoppingCriteria):
+    """
+    Stops each row of a batch on its own token budget, or (optionally) at
+    the end of its first sentence: on a closing token, or on a boundary
+    token right after a terminator, unless the word ending there is a
+    title or initials (`_ABBREVIATION`; a sentence ending with a single
+    letter, such as "vitamin C.", continues too). In the boundary case the
+    boundary token is not part of the answer (see `trimmed`). Rows that
+    stop early are padded by `generate` until the whole batch is done.
+
+    `cancel` stops every row at the next step (e.g. the client left).
+    Counts decode steps and sentence-end stops, for metrics.
+    """
+
+    def __init__(self, budgets: Sequence[int], sentence_end: Optional[SentenceEndTokens] = None):
+        self.budgets = list(budgets)
+        self.max_new_tokens = max(self.budgets)
+        self._budgets = torch.tensor(self.budgets)
+        self._sentence_end = sentence_end
+        if sentence_end is not None:
+            self._closing = _ids(sentence_end.closing)
+            self._terminators = _ids(sentence_end.terminators)
+            self._boundaries = _ids(sentence_end.boundaries)
+            self._texts = sentence_end.texts
+        self._prompt_len = None
+        self._done = None
+        # Rows whose last generated token is the boundary after their sentence end
+        self.trimmed: Optional[torch.Tensor] = None
+        self.steps = 0
+        self.sentence_end_stops = 0
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        # Read by the generating thread at its next step
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        # Called once per generated token
+        if self._prompt_len is None:
+            self._prompt_len = input_ids.shape[1] - 1
+            self._budgets = self._budgets.to(input_ids.device)
+            self._done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+            self.trimmed = torch.zeros_like(self._done)
+            if self._sentence_end is not None:
+                self._closing = self._closing.to(input_ids.device)
+                self._terminators = self._terminators.to(input_ids.device)
+                self._boundaries = self._boundaries.to(input_ids.device)
+        self.steps = input_ids.shape[1] - self._prompt_len
+        done = self._budgets <= self.steps
+        if self._sentence_end is not None:
+            closing = torch.isin(input_ids[:, -1], self._closing)
+            closing &= ~self._after_abbreviation(input_ids, closing & ~self._done)
+            boundary = torch.zeros_like(closing)
+            if self.steps >= 2:
+                boundary = torch.isin(input_ids[:, -1], self._boundaries) \
+                    & torch.isin(input_ids[:, -2], self._terminators)
+                boundary &= ~self._after_abbreviation(input_ids[:, :-1], boundary & ~self._done)
+            sentence_end = (closing | boundary) & ~self._done
+            self.trimmed |= boundary & ~self._done
+            self.sentence_end_stops += int(sentence_end.sum())
+            done |= sentence_end
+        self._done |= done
+        if self._cancelled:
+            self._done[:] = True
+        return self._done.clone()
+
+    def _after_abbreviation(self, input_ids: torch.LongTensor, rows: torch.BoolTensor) -> torch.BoolTensor:
+        # Only decodes the last word of `rows` (those about to stop)
+        result = torch.zeros_like(rows)
+        for row in rows.nonzero().flatten().tolist():
+            text = ""
+            start = max(self._prompt_len, input_ids.shape[1] - _MAX_WORD_TOKENS)
+            for token in reversed(input_ids[row, start:].tolist()):
+                text = self._texts[token] + text
+                if any(char.isspace() for char in text.rstrip()):
+                    break
+            words = text.split()
+            result[row] = bool(words) and _ABBREVIATION.fullmatch(words[-1]) is not None
+        return result
+
+    @property
+    def steps_saved(self) -> int:
+        """
+        Decode steps the batch did not run, out of its largest budget.
+        """
+        return self.max_new_tokens - self.steps
+
+class SentenceEndTextStreamer(TextIteratorStreamer):
+    """
+    `TextIteratorStreamer` (batch of one) that does not emit the boundary
+    token `criteria` stopped on. Tokens reach the streamer before the
+    stopping criteria see them, but text is only released up to its last
+    space, so at most the boundary's leading whitespace has gone out.
+    """
+
+    def __init__(self, tokenizer, criteria: SentenceEndStoppingCriteria, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self._criteria = criteria
+
+    def end(self):
+        trimmed = self._criteria.trimmed
+        if trimmed is not None and bool(trimmed[0]) and self.token_cache:
+            self.token_cache = self.token_cache[:-1]
+            text = self.tokenizer.decode(self.token_cache, **self.decode_kwargs)
+            # Whatever is beyond `print_len` was withheld; the boundary's whitespace may already be out
+            self.print_len = min(self.print_len, len(text))
+        super().end()
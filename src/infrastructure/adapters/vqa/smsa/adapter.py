@@ -1,32 +1,113 @@
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from src.core.metrics import register_metrics_provider
 from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.image_input import ImageInput
 from src.domain.models.input.question_input import QuestionInput
 from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
 from src.domain.ports.vqa_port import VqaPort
 from src.infrastructure.adapters.vqa.registry import register_adapter
-from src.infrastructure.adapters.vqa.smsa.SMSA_lib import SMSA
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib import IMAGE_SIZE, SMSA, STREAM_RESET
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.batching import MicroBatcher
 from src.infrastructure.adapters.vqa.smsa.config import smsa_settings
 
 @register_adapter("smsa")
 class SMSAVqaAdapter(VqaPort):
     def __init__(self):
-        self.__smsa = SMSA(model_path=smsa_settings.model_path, selector_path=smsa_settings.selector_path)
+        self.__smsa = SMSA(
+            model_path=smsa_settings.model_path,
+            selector_path=smsa_settings.selector_path,
+            last_layer_only=smsa_settings.last_layer_only,
+            speculative_fallback=smsa_settings.speculative_fallback.mode,
+            pre_score_threshold=smsa_settings.speculative_fallback.pre_score_threshold,
+            max_new_tokens=smsa_settings.decoding.max_new_tokens,
+            stop_at_sentence_end=smsa_settings.decoding.stop_at_sentence_end,
+            prefix_cache=smsa_settings.decoding.prefix_cache)
         self.__smsa.initialize()
+        resample = smsa_settings.preprocessing.resample
+        self.__resample = Image.Resampling[resample.upper()] if resample else None
+        register_metrics_provider("smsa_speculative_fallback", self.__smsa.speculation_stats)
+        register_metrics_provider("smsa_decoding", self.__smsa.decoding_stats)
+        # Requests arriving on different threadpool threads are grouped into
+        # one padded batch per model call
+        self.__ic_batcher: Optional[MicroBatcher[Image.Image, str]] = None
+        self.__vqa_batcher: Optional[MicroBatcher[Tuple[Image.Image, str], str]] = None
+        batching = smsa_settings.batching
+        if batching.enabled:
+            self.__ic_batcher = MicroBatcher(
+                self.__run_ic_batch, batching.max_batch_size, batching.max_wait_ms / 1000, name="smsa_ic_batcher")
+            self.__vqa_batcher = MicroBatcher(
+                self.__run_vqa_batch, batching.max_batch_size, batching.max_wait_ms / 1000, name="smsa_vqa_batcher")
+            register_metrics_provider("smsa_ic_batching", self.__ic_batcher.stats)
+            register_metrics_provider("smsa_vqa_batching", self.__vqa_batcher.stats)
+
+    def __preprocess(self, image: ImageInput) -> Image.Image:
+        # Decoded and resized once, memoised on the input
+        return image.resized(
+            IMAGE_SIZE, resample=self.__resample, reduced_decode=smsa_settings.preprocessing.reduced_decode)
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # SMSA ignores request options
+        return {"TAU": smsa_settings.TAU, "threshold": smsa_settings.threshold}
+
+    def __run_ic_batch(self, images: List[Image.Image]) -> List[str]:
+        return self.__smsa.process_ic_batch(
+            images=images,
+            TAU=smsa_settings.TAU,
+            threshold=smsa_settings.threshold)
+
+    def __run_vqa_batch(self, items: List[Tuple[Image.Image, str]]) -> List[str]:
+        return self.__smsa.process_vqa_batch(
+            images=[image for image, _ in items],
+            questions=[question for _, question in items],
+            TAU=smsa_settings.TAU,
+            threshold=smsa_settings.threshold)
 
     def process_captioning(self, captioning_input: CaptioningInput) -> Response:
-        image_bytes = captioning_input.image.bytes
+        image = self.__preprocess(captioning_input.image)
+        if self.__ic_batcher is not None:
+            return Response(output=self.__ic_batcher.submit(image))
         answer = self.__smsa.process_ic(
-            image_bytes= image_bytes,
+            image=image,
             TAU=smsa_settings.TAU,
             threshold=smsa_settings.threshold)
         
         return Response(output=answer)
     
     def process_question(self, question_input: QuestionInput) -> Response:
-        image_bytes = question_input.image.bytes
+        image = self.__preprocess(question_input.image)
         question = question_input.question
+        if self.__vqa_batcher is not None:
+            return Response(output=self.__vqa_batcher.submit((image, question)))
         answer = self.__smsa.process_vqa(
-            image_bytes= image_bytes,
+            image=image,
             question=question,
             TAU=smsa_settings.TAU,
             threshold=smsa_settings.threshold)
-        return Response(output=answer)
\ No newline at end of file
+        return Response(output=answer)
+
+    # Streams run one request per generate call, outside the micro-batcher but
+    # under the same model lock; closing them early stops generation
+    def stream_captioning(self, captioning_input: CaptioningInput) -> Iterator[ResponseChunk]:
+        image = self.__preprocess(captioning_input.image)
+        with closing(self.__smsa.stream_ic(
+                image=image,
+                TAU=smsa_settings.TAU,
+                threshold=smsa_settings.threshold)) as deltas:
+            for delta in deltas:
+                yield ResponseChunk(delta=delta)
+
+    def stream_question(self, question_input: QuestionInput) -> Iterator[ResponseChunk]:
+        image = self.__preprocess(question_input.image)
+        with closing(self.__smsa.stream_vqa(
+                image=image,
+                question=question_input.question,
+                TAU=smsa_settings.TAU,
+                threshold=smsa_settings.threshold,
+                verify_answer=smsa_settings.streaming.verify_answer)) as deltas:
+            for delta in deltas:
+                yield ResponseChunk(reset=True) if delta is STREAM_RESET else ResponseChunk(delta=delta)
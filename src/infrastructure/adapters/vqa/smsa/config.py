@@ -1,13 +1,60 @@
 import os
 import yaml
-from typing import Dict
+from typing import Dict, Literal, Optional
 from pydantic import BaseModel
 
+class BatchingSettings(BaseModel):
+    enabled: bool = True
+    max_batch_size: int = 8
+    # How long the first request of a batch waits for others to join
+    max_wait_ms: float = 10.0
+
+class SpeculativeFallbackSettings(BaseModel):
+    # disabled: fallback instructions are generated after the answer, when needed
+    # always: generated together with every answer, as one batch
+    # adaptive: only when the pre-score (selector on a text-only prefill of
+    # the question, no image) is below pre_score_threshold
+    mode: Literal["disabled", "always", "adaptive"] = "disabled"
+    # Not on the scale of `threshold`: tune it between the
+    # mean_pre_score_accepted / _rejected of smsa_speculative_fallback in /metrics
+    pre_score_threshold: float = 0.67
+
+class DecodingSettings(BaseModel):
+    # Stop a sample at the end of its first sentence: ".", "!" or "?"
+    # followed by whitespace (not "$3.50" or a URL), except after titles
+    # and initials ("Dr. Smith", "U.S. Army", "e.g. The")
+    stop_at_sentence_end: bool = True
+    # New-token budget per task
+    max_new_tokens: Dict[Literal["captioning", "question", "instructions"], int] = {
+        "captioning": 64, "question": 64, "instructions": 96}
+    # Prefill each task's system prompt once and continue requests from its KV cache
+    prefix_cache: bool = True
+
+class StreamingSettings(BaseModel):
+    # Hold streamed answers back until the selector accepts them, so a
+    # rejected answer is never spoken before the retake instructions
+    verify_answer: bool = True
+
+class PreprocessingSettings(BaseModel):
+    # Decode JPEGs directly at a reduced scale (libjpeg DCT scaling) when
+    # the image is much larger than the model input
+    reduced_decode: bool = True
+    # Filter of the final resize; empty keeps PIL's default (bicubic), whose
+    # resize is shared with the perceptual cache
+    resample: Optional[Literal["nearest", "box", "bilinear", "hamming", "bicubic", "lanczos"]] = None
+
 class SMSASettings(BaseModel):
     model_path: str
     selector_path: str
     TAU: float
     threshold: float
+    # Hook the final layer instead of keeping every layer's hidden states
+    last_layer_only: bool = True
+    batching: BatchingSettings = BatchingSettings()
+    speculative_fallback: SpeculativeFallbackSettings = SpeculativeFallbackSettings()
+    decoding: DecodingSettings = DecodingSettings()
+    streaming: StreamingSettings = StreamingSettings()
+    preprocessing: PreprocessingSettings = PreprocessingSettings()
 
     @classmethod
     def from_yaml(cls, yaml_path: str) -> "SMSASettings":
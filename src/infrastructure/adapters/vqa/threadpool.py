@@ -0,0 +1,67 @@
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, TypeVar
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.domain.ports.vqa_port import VqaPort
+
+_T = TypeVar("_T")
+_END = object()
+
+
+async def _iterate_and_close(iterator: Iterator[_T]) -> AsyncIterator[_T]:
+    """
+    Like `iterate_in_threadpool`, but closes `iterator` (in the threadpool,
+    as it may block) when the consumer stops early, e.g. a client
+    disconnect, so the wrapped adapter can stop its work.
+    """
+    # A cancelled next() keeps running in its thread, close() waits for it
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            return next(iterator, _END)
+
+    def close():
+        with lock:
+            getattr(iterator, "close", lambda: None)()
+
+    try:
+        while (item := await run_in_threadpool(step)) is not _END:
+            yield item
+    finally:
+        # Runs even if the consumer was cancelled
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(close)
+
+
+class ThreadPoolVqaAdapter(AsyncVqaPort):
+    """
+    Exposes a synchronous `VqaPort` as an `AsyncVqaPort` by running each
+    call in Starlette's threadpool, so the event loop is never blocked.
+    """
+
+    def __init__(self, vqa_port: VqaPort):
+        self.wrapped = vqa_port
+
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        return await run_in_threadpool(self.wrapped.process_captioning, captioning_input)
+
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        return await run_in_threadpool(self.wrapped.process_question, question_input)
+
+    def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        # Each next() of the blocking iterator runs in the threadpool
+        return _iterate_and_close(self.wrapped.stream_captioning(captioning_input))
+
+    def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        return _iterate_and_close(self.wrapped.stream_question(question_input))
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.wrapped.get_effective_params(options)
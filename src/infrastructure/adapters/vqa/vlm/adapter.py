@@ -1,16 +1,34 @@
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
 from src.core.config import CONFIG
+from src.core.metrics import register_metrics_provider
 from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.image_input import ImageInput
 from src.domain.models.input.question_input import QuestionInput
 from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
 from src.domain.ports.vqa_port import VqaPort
 from src.infrastructure.adapters.vqa.registry import register_adapter
 from src.infrastructure.adapters.vqa.vlm.config import vlm_settings
 from src.infrastructure.adapters.vqa.vlm.enums import PromptNames
-from src.infrastructure.adapters.vqa.vlm.initialization_helpers import load_prompt
-from src.infrastructure.adapters.vqa.vlm.processing_helpers import build_payload, call_model_api, parse_model_response
+from src.infrastructure.adapters.vqa.vlm.http_client import close_async_client
+from src.infrastructure.adapters.vqa.vlm.image_preprocessing import ImagePreprocessor, PreparedImage
+from src.infrastructure.adapters.vqa.vlm.initialization_helpers import get_generation_params, load_prompt
+from src.infrastructure.adapters.vqa.vlm.processing_helpers import (
+    build_payload,
+    call_model_api,
+    call_model_api_async,
+    call_model_api_stream,
+    call_model_api_stream_async,
+    parse_model_response,
+    strip_json_markers_stream,
+    strip_json_markers_stream_async,
+)
 
-@register_adapter("vlm")
-class VlmVqaAdapter(VqaPort):
+class _VlmAdapterBase:
     def __init__(self):
         # Build base API URL
         self.api_url = vlm_settings.get_full_api_url(CONFIG.lms_api)
@@ -18,37 +36,104 @@ class VlmVqaAdapter(VqaPort):
         self._prompts_texts = {}
         self._prompts_texts[PromptNames.QUESTION] = load_prompt(PromptNames.QUESTION)
         self._prompts_texts[PromptNames.CAPTIONING] = load_prompt(PromptNames.CAPTIONING)
+        # Downscale / re-encode before upload
+        self._image_preprocessor = ImagePreprocessor(vlm_settings.image_preprocessing)
+        register_metrics_provider("vlm_image_preprocessing", self._image_preprocessor.stats)
 
-    def process_captioning(self, captioning_input: CaptioningInput) -> Response:
-        image_bytes = captioning_input.image.bytes
-        overrides = captioning_input.options
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return get_generation_params(options or {})
 
-        payload = build_payload(
-            image_bytes=image_bytes,
+    def _build_captioning_payload(self, captioning_input: CaptioningInput, image: PreparedImage) -> Dict[str, Any]:
+        return build_payload(
+            image_bytes=image.data,
+            mime_type=image.mime_type,
             system_prompt=self._prompts_texts[PromptNames.CAPTIONING],
-            overrides=overrides,
+            overrides=captioning_input.options,
             history=captioning_input.history
         )
 
+    def _build_question_payload(self, question_input: QuestionInput, image: PreparedImage) -> Dict[str, Any]:
+        return build_payload(
+            image_bytes=image.data,
+            mime_type=image.mime_type,
+            system_prompt=self._prompts_texts[PromptNames.QUESTION],
+            overrides=question_input.options,
+            text=question_input.question,
+            history=question_input.history
+        )
+
+@register_adapter("vlm_sync")
+class VlmVqaAdapter(_VlmAdapterBase, VqaPort):
+    """
+    Blocking VLM adapter, kept for callers outside the event loop.
+    """
+
+    def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        image = self._image_preprocessor.prepare(captioning_input.image)
+        payload = self._build_captioning_payload(captioning_input, image)
         raw_response = call_model_api(self.api_url, payload)
         parsed_output = parse_model_response(raw_response)
-        
+
         return Response(output=parsed_output)
-    
+
     def process_question(self, question_input: QuestionInput) -> Response:
-        image_bytes = question_input.image.bytes
-        question = question_input.question
-        overrides = question_input.options
+        image = self._image_preprocessor.prepare(question_input.image)
+        payload = self._build_question_payload(question_input, image)
+        raw_response = call_model_api(self.api_url, payload)
+        parsed_output = parse_model_response(raw_response)
+        return Response(output=parsed_output)
 
-        payload = build_payload(
-            image_bytes=image_bytes,
-            system_prompt=self._prompts_texts[PromptNames.QUESTION],
-            overrides=overrides,
-            text=question,
-            history=question_input.history
-        )
+    def stream_captioning(self, captioning_input: CaptioningInput) -> Iterator[ResponseChunk]:
+        image = self._image_preprocessor.prepare(captioning_input.image)
+        deltas = call_model_api_stream(self.api_url, self._build_captioning_payload(captioning_input, image))
+        for delta in strip_json_markers_stream(deltas):
+            yield ResponseChunk(delta=delta)
 
-        raw_response = call_model_api(self.api_url, payload)
+    def stream_question(self, question_input: QuestionInput) -> Iterator[ResponseChunk]:
+        image = self._image_preprocessor.prepare(question_input.image)
+        deltas = call_model_api_stream(self.api_url, self._build_question_payload(question_input, image))
+        for delta in strip_json_markers_stream(deltas):
+            yield ResponseChunk(delta=delta)
+
+@register_adapter("vlm")
+class AsyncVlmVqaAdapter(_VlmAdapterBase, AsyncVqaPort):
+    """
+    Non-blocking VLM adapter on a shared, pooled httpx client: waiting on
+    the LMS server does not hold a threadpool thread.
+    """
+
+    async def _prepare(self, image: ImageInput) -> PreparedImage:
+        # Decoding and re-encoding are CPU bound: keep them off the event loop
+        return await run_in_threadpool(self._image_preprocessor.prepare, image)
+
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        image = await self._prepare(captioning_input.image)
+        payload = self._build_captioning_payload(captioning_input, image)
+        raw_response = await call_model_api_async(self.api_url, payload)
         parsed_output = parse_model_response(raw_response)
-        # print(payload)
-        return Response(output=parsed_output)
\ No newline at end of file
+
+        return Response(output=parsed_output)
+
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        image = await self._prepare(question_input.image)
+        payload = self._build_question_payload(question_input, image)
+        raw_response = await call_model_api_async(self.api_url, payload)
+        parsed_output = parse_model_response(raw_response)
+        return Response(output=parsed_output)
+
+    async def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        image = await self._prepare(captioning_input.image)
+        # Deltas are forwarded as the LMS server sends them (`stream: true`),
+        # minus the JSON markers `parse_model_response` strips
+        deltas = call_model_api_stream_async(self.api_url, self._build_captioning_payload(captioning_input, image))
+        async for delta in strip_json_markers_stream_async(deltas):
+            yield ResponseChunk(delta=delta)
+
+    async def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        image = await self._prepare(question_input.image)
+        deltas = call_model_api_stream_async(self.api_url, self._build_question_payload(question_input, image))
+        async for delta in strip_json_markers_stream_async(deltas):
+            yield ResponseChunk(delta=delta)
+
+    async def aclose(self) -> None:
+        await close_async_client()
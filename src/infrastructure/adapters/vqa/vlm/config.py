@@ -1,7 +1,27 @@
 import os
 import yaml
-from typing import Dict
-from pydantic import BaseModel
+from typing import Dict, Literal
+from pydantic import BaseModel, Field
+
+class HttpClientSettings(BaseModel):
+    # Connection pool limits
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+    # Timeouts (seconds)
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+    total_timeout: float = 180.0 # Whole request, end to end
+
+class ImagePreprocessingSettings(BaseModel):
+    # Shrink images before sending them to the LMS server
+    enabled: bool = True
+    max_edge: int = Field(default=1024, gt=0) # pixels, longest side
+    format: Literal["jpeg", "webp"] = "jpeg"
+    quality: int = Field(default=85, ge=1, le=100)
 
 class VlmSettings(BaseModel):
     # API Configuration
@@ -15,6 +35,8 @@ class VlmSettings(BaseModel):
 
     # Request Configuration
     headers: Dict[str, str]
+    http_client: HttpClientSettings = HttpClientSettings()
+    image_preprocessing: ImagePreprocessingSettings = ImagePreprocessingSettings()
 
     # Generation Parameters
     temperature: float
@@ -0,0 +1,66 @@
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.infrastructure.adapters.vqa.vlm.config import HttpClientSettings, vlm_settings
+
+_async_client: httpx.AsyncClient | None = None
+_sync_session: requests.Session | None = None
+_sync_session_lock = threading.Lock()
+
+
+def _get_timeout(settings: HttpClientSettings) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=settings.connect_timeout,
+        read=settings.read_timeout,
+        write=settings.write_timeout,
+        pool=settings.pool_timeout,
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Shared, connection-pooled async client for the LMS server (one per process).
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        settings = vlm_settings.http_client
+        _async_client = httpx.AsyncClient(
+            headers=vlm_settings.headers,
+            timeout=_get_timeout(settings),
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def get_sync_session() -> requests.Session:
+    """
+    Shared keep-alive session for the synchronous adapter.
+    """
+    global _sync_session
+    if _sync_session is None:
+        with _sync_session_lock:
+            if _sync_session is None:
+                settings = vlm_settings.http_client
+                session = requests.Session()
+                session.headers.update(vlm_settings.headers)
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.max_connections,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sync_session = session
+    return _sync_session
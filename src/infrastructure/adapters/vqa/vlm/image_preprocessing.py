@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict
+
+from src.domain.models.input.image_input import ImageInput
+from src.infrastructure.adapters.vqa.vlm.config import ImagePreprocessingSettings
+
+# Leading bytes of the formats an LMS server is expected to accept
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+_EXIF_ORIENTATION = 0x0112
+
+
+def detect_mime_type(image_bytes: bytes) -> str:
+    """
+    MIME type of an encoded image, from its signature (PNG if unknown).
+    """
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime_type in _SIGNATURES:
+        if image_bytes.startswith(signature):
+            return mime_type
+    return "image/png"
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    reencoded: bool = False
+
+    @property
+    def nbytes(self) -> int:
+        # Memory held besides the original bytes (see `ImageInput.derived`)
+        return len(self.data) if self.reencoded else 0
+
+
+class ImagePreprocessor:
+    """
+    Shrinks images before they are sent to the LMS server: applies the EXIF
+    orientation, downscales so the longest edge is at most `max_edge` and
+    re-encodes as JPEG/WebP at `quality`. The original bytes are kept when
+    they need no transform and are already smaller than the re-encoding.
+
+    The result is memoised on the `ImageInput` (keyed by the settings), so
+    an uploaded image (`image.id`) is prepared once for all its turns. The
+    decode itself is not kept, and large JPEGs are decoded at reduced scale.
+    """
+
+    def __init__(self, settings: ImagePreprocessingSettings) -> None:
+        self._settings = settings
+        self._key = ("vlm_image_preprocessing", settings.max_edge, settings.format, settings.quality)
+        self._lock = threading.Lock()
+        self._stats = {"images": 0, "reused": 0, "reencoded": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+    def prepare(self, image: ImageInput) -> PreparedImage:
+        if not self._settings.enabled:
+            return PreparedImage(data=image.bytes, mime_type=detect_mime_type(image.bytes))
+        computed = False
+
+        def compute(image: ImageInput) -> PreparedImage:
+            nonlocal computed
+            computed = True
+            return self._reencode(image)
+
+        started = time.perf_counter()
+        prepared = image.derived(self._key, compute)
+        with self._lock:
+            self._stats["images"] += 1
+            self._stats["reused"] += not computed
+            self._stats["reencoded"] += prepared.reencoded
+            self._stats["bytes_in"] += len(image.bytes)
+            self._stats["bytes_out"] += len(prepared.data)
+            self._stats["seconds"] += time.perf_counter() - started
+        return prepared
+
+    def _reencode(self, image: ImageInput) -> PreparedImage:
+        from PIL import Image, ImageOps
+        settings = self._settings
+        original = PreparedImage(data=image.bytes, mime_type=detect_mime_type(image.bytes))
+        try:
+            # Opened lazily: size and EXIF are read from the header
+            decoded = Image.open(BytesIO(image.bytes))
+            rotated = decoded.getexif().get(_EXIF_ORIENTATION, 1) != 1
+            oversized = max(decoded.size) > settings.max_edge
+            if oversized:
+                # JPEG: decode at the smallest 1/2, 1/4 or 1/8 scale still above `max_edge`
+                scale = settings.max_edge / max(decoded.size)
+                decoded.draft(None, (math.ceil(decoded.width * scale), math.ceil(decoded.height * scale)))
+            decoded.load()
+        except OSError:
+            # Let the LMS server report what it cannot read
+            return original
+
+        processed = ImageOps.exif_transpose(decoded) if rotated else decoded
+        if oversized:
+            scale = settings.max_edge / max(processed.size)
+            size = (max(1, round(processed.width * scale)), max(1, round(processed.height * scale)))
+            processed = processed.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+        output_format = settings.format.upper()
+        if output_format == "JPEG" and processed.mode not in ("RGB", "L"):
+            # JPEG has no alpha: flatten on white, as viewers would show it
+            rgba = processed.convert("RGBA")
+            processed = Image.new("RGB", rgba.size, (255, 255, 255))
+            processed.paste(rgba, mask=rgba.getchannel("A"))
+        elif output_format == "WEBP" and processed.mode not in ("RGB", "RGBA"):
+            processed = processed.convert("RGBA" if "transparency" in processed.info else "RGB")
+
+        buffer = BytesIO()
+        processed.save(buffer, format=output_format, quality=settings.quality)
+        data = buffer.getvalue()
+        if not (rotated or oversized) and len(data) >= len(image.bytes):
+            return original
+        return PreparedImage(data=data, mime_type=f"image/{settings.format.lower()}", reencoded=True)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+        stats["saved_ratio"] = stats["bytes_saved"] / stats["bytes_in"] if stats["bytes_in"] else 0.0
+        stats.update(max_edge=self._settings.max_edge, format=self._settings.format, quality=self._settings.quality)
+        return stats
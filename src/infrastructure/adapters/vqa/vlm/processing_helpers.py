@@ -1,20 +1,27 @@
 import base64
+import json
+import anyio
+import httpx
 import requests
-from typing import Any, Dict, List, Optional
+import string
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 from src.infrastructure.adapters.vqa.vlm.config import vlm_settings
+from src.infrastructure.adapters.vqa.vlm.http_client import get_async_client, get_sync_session
+from src.infrastructure.adapters.vqa.vlm.image_preprocessing import detect_mime_type
 from src.infrastructure.adapters.vqa.vlm.initialization_helpers import get_generation_params
 
 
 def build_payload(
-    image_bytes: List[int],
+    image_bytes: bytes,
     system_prompt: str,
     overrides: Optional[Dict[str, Any]] = None,
     text: Optional[str] = None,
     history: Optional[List[Any]] = None,  # List[HistoryItemInput]
+    mime_type: Optional[str] = None,
 ) -> Dict[str, Any]:
-    # Encode the image as a data URI
-    img_b64 = base64.b64encode(bytes(image_bytes)).decode("ascii")
-    data_uri = f"data:image/png;base64,{img_b64}"
+    # Encode the image as a data URI, labelled with its real format
+    img_b64 = base64.b64encode(image_bytes).decode("ascii")
+    data_uri = f"data:{mime_type or detect_mime_type(image_bytes)};base64,{img_b64}"
 
     #building the 'messages' list
     messages: List[Dict[str, Any]] = [
@@ -61,19 +68,83 @@ def build_payload(
         **generation_params
     }
 
+def _extract_content(data: Dict[str, Any]) -> str:
+    return data["choices"][0]["message"]["content"]
+
 def call_model_api(api_url: str, payload: Dict[str, Any]) -> str:
+    http_settings = vlm_settings.http_client
     try:
-        response = requests.post(
+        response = get_sync_session().post(
             api_url,
-            headers=vlm_settings.headers,
-            json=payload
+            json=payload,
+            timeout=(http_settings.connect_timeout, http_settings.read_timeout)
         )
         response.raise_for_status()
     except requests.RequestException as e:
         raise RuntimeError(f"API request failed: {str(e)}")
 
-    data = response.json()
-    return data["choices"][0]["message"]["content"]
+    return _extract_content(response.json())
+
+async def call_model_api_async(api_url: str, payload: Dict[str, Any]) -> str:
+    try:
+        with anyio.fail_after(vlm_settings.http_client.total_timeout):
+            response = await get_async_client().post(api_url, json=payload)
+        response.raise_for_status()
+    except TimeoutError:
+        raise RuntimeError(
+            f"API request timed out after {vlm_settings.http_client.total_timeout}s")
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"API request failed: {str(e)}")
+
+    return _extract_content(response.json())
+
+_STREAM_DONE = "[DONE]"
+
+def _parse_stream_line(line: str) -> Optional[str]:
+    """
+    Text delta of one OpenAI-compatible SSE line (`data: {...}`), if any.
+    """
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == _STREAM_DONE:
+        return None
+    choices = json.loads(data).get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+def call_model_api_stream(api_url: str, payload: Dict[str, Any]) -> Iterator[str]:
+    http_settings = vlm_settings.http_client
+    try:
+        with get_sync_session().post(
+            api_url,
+            json={**payload, "stream": True},
+            timeout=(http_settings.connect_timeout, http_settings.read_timeout),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.strip() == f"data: {_STREAM_DONE}":
+                    return
+                delta = _parse_stream_line(line or "")
+                if delta:
+                    yield delta
+    except requests.RequestException as e:
+        raise RuntimeError(f"API request failed: {str(e)}")
+
+async def call_model_api_stream_async(api_url: str, payload: Dict[str, Any]) -> AsyncIterator[str]:
+    # No total timeout: a stream may legitimately outlive it; the client's
+    # read timeout still bounds the wait for each chunk
+    try:
+        async with get_async_client().stream("POST", api_url, json={**payload, "stream": True}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip() == f"data: {_STREAM_DONE}":
+                    return
+                delta = _parse_stream_line(line)
+                if delta:
+                    yield delta
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"API request failed: {str(e)}")
 
 
 def parse_model_response(response_text: str) -> str:
@@ -84,3 +155,72 @@ def parse_model_response(response_text: str) -> str:
             response_text = response_text[:-3].strip()
 
     return response_text
+
+_JSON_OPENING_MARKER = "```json"
+_CLOSING_MARKER_CHARS = "`" + string.whitespace
+
+class _JsonMarkerStripper:
+    """
+    `parse_model_response` for a stream: drops a leading "```json" line
+    and a trailing "```" while deltas arrive, holding back only text that
+    may still be part of a marker (the start of the response, and trailing
+    whitespace / backticks).
+    """
+
+    def __init__(self) -> None:
+        self._head: Optional[str] = ""
+        self._tail = ""
+
+    def _start(self) -> str:
+        head, self._head = self._head, None
+        if head.startswith(_JSON_OPENING_MARKER):
+            head = head[len(_JSON_OPENING_MARKER):]
+            if head.startswith("\n"):
+                head = head[1:]
+        return head
+
+    def feed(self, delta: str) -> str:
+        if self._head is not None:
+            self._head += delta
+            # Wait for the character after the marker, to drop its newline too
+            if len(self._head) <= len(_JSON_OPENING_MARKER) and _JSON_OPENING_MARKER.startswith(self._head):
+                return ""
+            delta = self._start()
+        text = self._tail + delta
+        end = len(text.rstrip(_CLOSING_MARKER_CHARS))
+        self._tail = text[end:]
+        return text[:end]
+
+    def flush(self) -> str:
+        text = self._start() if self._head is not None else ""
+        text, self._tail = self._tail + text, ""
+        if text.endswith("```"):
+            return text[:-3].rstrip()
+        return text
+
+def strip_json_markers_stream(deltas: Iterator[str]) -> Iterator[str]:
+    if not vlm_settings.strip_json_markers:
+        yield from deltas
+        return
+    stripper = _JsonMarkerStripper()
+    for delta in deltas:
+        text = stripper.feed(delta)
+        if text:
+            yield text
+    text = stripper.flush()
+    if text:
+        yield text
+
+async def strip_json_markers_stream_async(deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    if not vlm_settings.strip_json_markers:
+        async for delta in deltas:
+            yield delta
+        return
+    stripper = _JsonMarkerStripper()
+    async for delta in deltas:
+        text = stripper.feed(delta)
+        if text:
+            yield text
+    text = stripper.flush()
+    if text:
+        yield text
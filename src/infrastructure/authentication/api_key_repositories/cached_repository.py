@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional
+
+from src.domain.authentication.api_key import ApiKey
+from src.domain.authentication.api_key_repository import ApiKeyRepository
+from src.infrastructure.authentication.utils.verified_key_cache import VerifiedApiKeyCache
+
+
+class CachedApiKeyRepository(ApiKeyRepository):
+    """
+    Decorates any ApiKeyRepository with a verified-key cache, so repeated
+    requests with the same key skip both the lookup and the slow hash check.
+    """
+
+    def __init__(self, repository: ApiKeyRepository, cache: VerifiedApiKeyCache):
+        self._repository = repository
+        self._cache = cache
+
+    @property
+    def cache(self) -> VerifiedApiKeyCache:
+        return self._cache
+
+    async def initialize(self) -> None:
+        await self._repository.initialize()
+
+    async def get_by_key(self, key: str) -> Optional[ApiKey]:
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        generation = self._cache.generation
+        entity = await self._repository.get_by_key(key)
+        if entity is not None:
+            self._cache.put(key, entity, generation)
+        return entity
+
+    async def create(
+        self,
+        key: Optional[str] = None
+    ) -> ApiKey:
+        return await self._repository.create(key)
+
+    async def update_usage(
+        self,
+        entity: ApiKey,
+        last_use_in: Optional[datetime] = None,
+        increment: int = 1
+    ) -> ApiKey:
+        return await self._repository.update_usage(entity, last_use_in, increment)
+
+    async def revoke(self, entity: ApiKey) -> bool:
+        # Evict before the write so the key stops authenticating from the
+        # cache right away, and again after it: that bumps the cache
+        # generation, so a lookup that read the key before the write
+        # completed cannot cache it (see `VerifiedApiKeyCache.put`)
+        self._cache.invalidate(entity.id)
+        revoked = await self._repository.revoke(entity)
+        self._cache.invalidate(entity.id)
+        return revoked
+
+    async def aclose(self) -> None:
+        await self._repository.aclose()
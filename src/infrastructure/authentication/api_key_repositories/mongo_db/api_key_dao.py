@@ -23,11 +23,16 @@ class ApiKeyDAO(BaseModel):
     JSON encoding, and ID validation.
     """
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
-    hashed_key: str
-    key_prefix: str
+    key_digest: Optional[str] = None
+    hashed_key: Optional[str] = None
+    key_prefix: Optional[str] = None
     initialized_in: datetime
     last_use_in: Optional[datetime] = None
     number_of_requests: int = 0
+    scheduling_weight: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    rate_limit_per_second: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
 
     class Config:
         validate_by_name = True
@@ -37,11 +42,16 @@ class ApiKeyDAO(BaseModel):
         """Convert DAO → pure domain model (ID becomes string)."""
         return ApiKey(
             id=str(self.id),
+            key_digest=self.key_digest,
             hashed_key=self.hashed_key,
             key_prefix=self.key_prefix,
             initialized_in=self.initialized_in,
             last_use_in=self.last_use_in,
             number_of_requests=self.number_of_requests,
+            scheduling_weight=self.scheduling_weight,
+            max_concurrency=self.max_concurrency,
+            rate_limit_per_second=self.rate_limit_per_second,
+            rate_limit_burst=self.rate_limit_burst,
         )
 
     @classmethod
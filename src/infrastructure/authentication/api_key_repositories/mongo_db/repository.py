@@ -5,11 +5,14 @@ from typing import Optional
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import pymongo
+from bson import ObjectId
 
 from src.core.config import CONFIG
 from src.domain.authentication.api_key import ApiKey
 from src.domain.authentication.api_key_repository import ApiKeyRepository
+from src.core.metrics import register_metrics_provider
 from src.infrastructure.authentication.api_key_repositories.mongo_db.api_key_dao import ApiKeyDAO
+from src.infrastructure.authentication.api_key_repositories.mongo_db.usage_writer import BatchedUsageWriter
 from src.infrastructure.authentication.api_key_repositories.registry import register_api_key_repository
 from src.infrastructure.authentication.utils.hash_provider import HashProvider
 
@@ -24,21 +27,62 @@ class MongoDbApiKeyRepository(ApiKeyRepository):
         self._db = self._client[CONFIG.mongodb_database]
         self._collection = self._db[API_KEYS_COLLECTION]
         self._hash_provider = HashProvider()
+        self._usage_writer = BatchedUsageWriter(
+            self._collection,
+            flush_interval_seconds=CONFIG.usage_flush_interval_seconds,
+            batch_size=CONFIG.usage_flush_batch_size,
+        )
+        register_metrics_provider("api_key_usage_writer", self._usage_writer.stats)
+
+    async def initialize(self) -> None:
+        """
+        Create the lookup indexes (idempotent).
+        """
+        try:
+            await self._collection.create_index(
+                "key_digest",
+                unique=True,
+                partialFilterExpression={"key_digest": {"$type": "string"}},
+            )
+            if CONFIG.api_key_legacy_lookup:
+                await self._collection.create_index("key_prefix")
+        except pymongo.errors.PyMongoError as e:
+            print(f"Warning: Could not create API key indexes: {e}")
 
     async def get_by_key(self, key: str) -> Optional[ApiKey]:
         """
         Retrieve an ApiKey by its plain-text key. Return None if not found.
+        One indexed point read on the keyed digest, no slow hash.
+        """
+        key_digest = self._hash_provider.digest_api_key(key)
+        doc = await self._collection.find_one({"key_digest": key_digest})
+        if doc is not None:
+            return ApiKeyDAO(**doc).to_domain()
+        if CONFIG.api_key_legacy_lookup:
+            return await self._get_by_legacy_key(key, key_digest)
+        return None
+
+    async def _get_by_legacy_key(self, key: str, key_digest: str) -> Optional[ApiKey]:
+        """
+        Prefix + bcrypt lookup for keys stored before digests existed.
+        A match is migrated in place, so its next lookup is a point read.
         """
         key_prefix = key[:KEY_PREFIX_SIZE]
-        cursor = self._collection.find({"key_prefix": key_prefix}) # This will be indexed search
+        cursor = self._collection.find({"key_prefix": key_prefix, "key_digest": None})
         matching = None
         async for doc in cursor:
-            if self._hash_provider.verify_api_key(key, doc["hashed_key"]):
+            if doc.get("hashed_key") and \
+                await self._hash_provider.verify_api_key_async(key, doc["hashed_key"]):
                 matching = doc
                 break
-        if matching is not None:
-            return ApiKeyDAO(**matching).to_domain()
-        return None
+        if matching is None:
+            return None
+        await self._collection.update_one(
+            {"_id": matching["_id"], "key_digest": None},
+            {"$set": {"key_digest": key_digest}},
+        )
+        matching["key_digest"] = key_digest
+        return ApiKeyDAO(**matching).to_domain()
 
     async def create(
         self,
@@ -52,14 +96,12 @@ class MongoDbApiKeyRepository(ApiKeyRepository):
             characters = string.ascii_letters + string.digits
             random_part = ''.join(secrets.choice(characters) for _ in range(KEY_SIZE))
             key = f"sk-{random_part}"            
-        key_prefix = key[:KEY_PREFIX_SIZE]
         dao = ApiKeyDAO.from_domain(
             ApiKey(
-                hashed_key=self._hash_provider.hash_api_key(key),
-                key_prefix=key_prefix
+                key_digest=self._hash_provider.digest_api_key(key)
             )
         )
-        result = await self._collection.insert_one(dao.model_dump(by_alias=True))
+        result = await self._collection.insert_one(dao.model_dump(by_alias=True, exclude_none=True))
         # Inject generated ObjectId back into DAO → domain
         dao.id = str(result.inserted_id)
         return dao.to_domain()
@@ -74,16 +116,22 @@ class MongoDbApiKeyRepository(ApiKeyRepository):
         Update the last_use timestamp and increment number_of_requests.
         """
         entity.update_usage(last_use_in, increment)
-        dao = ApiKeyDAO.from_domain(entity)
-        print(dao.last_use_in)
-        await self._collection.update_one(
-            {"_id": dao.id},
-            {
-                "$set": {
-                    "last_use_in": dao.last_use_in,
-                    "number_of_requests": dao.number_of_requests,
-                }
-            },
-        )
+        # Buffered and written in bulk by the usage writer ($inc/$max),
+        # so no Mongo round trip on the request path
+        self._usage_writer.record(ObjectId(entity.id), entity.last_use_in, increment)
         return entity
-        
\ No newline at end of file
+
+    async def revoke(self, entity: ApiKey) -> bool:
+        """
+        Permanently invalidate an ApiKey. Return False if it did not exist.
+        """
+        dao = ApiKeyDAO.from_domain(entity)
+        self._usage_writer.discard(ObjectId(entity.id))
+        result = await self._collection.delete_one({"_id": dao.id})
+        return result.deleted_count == 1
+
+    async def aclose(self) -> None:
+        """
+        Flush buffered usage before shutdown.
+        """
+        await self._usage_writer.close()
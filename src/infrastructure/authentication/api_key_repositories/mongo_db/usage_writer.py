@@ -0,0 +1,163 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# Ids of the last flushes applied to an API key document
+USAGE_FLUSH_IDS_FIELD = "usage_flush_ids"
+# A failed flush is always retried before the next one, so only the latest ids matter
+_KEPT_FLUSH_IDS = 8
+
+class BatchedUsageWriter:
+    """
+    Write-behind buffer for API key usage.
+
+    Increments are aggregated in memory per key and flushed periodically
+    (or once `batch_size` keys are pending) as a single unordered
+    `bulk_write` of `$inc`/`$max` updates. `record` never awaits, so
+    concurrent requests on the event loop cannot lose increments.
+
+    Each flush has an id, pushed onto the documents it updates (the last
+    few are kept); a failed flush is retried with the same id, so counts
+    stay exact even when a write was applied but not acknowledged.
+    """
+
+    def __init__(self, collection, flush_interval_seconds: float, batch_size: int) -> None:
+        self._collection = collection
+        self._flush_interval_seconds = flush_interval_seconds
+        self._batch_size = max(1, batch_size)
+        # key id -> [pending increment, latest use]
+        self._pending: Dict[ObjectId, List] = {}
+        # (flush id, items) of a flush that failed, retried first
+        self._retry: Optional[Tuple[ObjectId, List[Tuple[ObjectId, List]]]] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flushes = 0
+        self._flushed_requests = 0
+        self._failed_flushes = 0
+        self._last_flush_seconds = 0.0
+
+    def record(self, key_id: ObjectId, last_use_in: datetime, increment: int = 1) -> None:
+        entry = self._pending.get(key_id)
+        if entry is None:
+            self._pending[key_id] = [increment, last_use_in]
+        else:
+            entry[0] += increment
+            if last_use_in > entry[1]:
+                entry[1] = last_use_in
+        self._ensure_started()
+        if len(self._pending) >= self._batch_size:
+            self._wake.set()
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._flush_lock = asyncio.Lock()
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Warning: API key usage flush failed: {e}")
+
+    async def flush(self) -> None:
+        """
+        Write every pending increment. A batch that failed is retried first,
+        with its original flush id, before the increments recorded since.
+        """
+        if not self._pending and self._retry is None:
+            return
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            started_at = time.perf_counter()
+            if self._retry is not None:
+                flush_id, items = self._retry
+                self._retry = None
+                await self._write(flush_id, items)
+            if self._pending:
+                pending, self._pending = self._pending, {}
+                await self._write(ObjectId(), list(pending.items()))
+            self._flushes += 1
+            self._last_flush_seconds = time.perf_counter() - started_at
+
+    async def _write(self, flush_id: ObjectId, items: List[Tuple[ObjectId, List]]) -> None:
+        """
+        Apply `items` under `flush_id`. Each update also records the flush id
+        on the document and skips documents that already carry it, so
+        retrying a batch whose outcome is unknown (timeout, failover) never
+        counts twice.
+        """
+        for start in range(0, len(items), self._batch_size):
+            chunk = items[start:start + self._batch_size]
+            operations = [
+                UpdateOne(
+                    {"_id": key_id, USAGE_FLUSH_IDS_FIELD: {"$ne": flush_id}},
+                    {
+                        "$inc": {"number_of_requests": increment},
+                        "$max": {"last_use_in": last_use_in},
+                        "$push": {USAGE_FLUSH_IDS_FIELD: {"$each": [flush_id], "$slice": -_KEPT_FLUSH_IDS}},
+                    },
+                )
+                for key_id, (increment, last_use_in) in chunk
+            ]
+            try:
+                await self._collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Only the reported operations failed, the rest are applied
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                self._retry = (flush_id, [chunk[i] for i in sorted(failed)] + items[start + len(chunk):])
+                self._failed_flushes += 1
+                raise
+            except PyMongoError:
+                # Some of the chunk may be applied: the flush id makes the retry safe
+                self._retry = (flush_id, items[start:])
+                self._failed_flushes += 1
+                raise
+            self._flushed_requests += sum(increment for _, (increment, _) in chunk)
+
+    def discard(self, key_id: ObjectId) -> None:
+        self._pending.pop(key_id, None)
+        if self._retry is not None:
+            flush_id, items = self._retry
+            self._retry = (flush_id, [item for item in items if item[0] != key_id])
+
+    async def close(self) -> None:
+        """
+        Stop the periodic flusher and write whatever is still pending.
+        """
+        if self._task is not None:
+            # Stop the loop instead of cancelling it: a bulk_write interrupted
+            # half-way could not be requeued safely
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._closing = False
+        await self.flush()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "pending_keys": len(self._pending),
+            "pending_requests": sum(entry[0] for entry in self._pending.values()),
+            "retry_requests": sum(entry[0] for _, entry in self._retry[1]) if self._retry is not None else 0,
+            "flush_interval_seconds": self._flush_interval_seconds,
+            "batch_size": self._batch_size,
+            "flushes": self._flushes,
+            "flushed_requests": self._flushed_requests,
+            "failed_flushes": self._failed_flushes,
+            "last_flush_seconds": self._last_flush_seconds,
+        }
@@ -1,20 +1,38 @@
+import pkgutil
+from pathlib import Path
 from typing import Type
 
+from src.core.plugins import import_plugin
 from src.domain.authentication.api_key_repository import ApiKeyRepository
 
 _API_KEY_REPOSITORIES: dict[str, Type[ApiKeyRepository]] = {}
 
+# Name -> module registering it, imported only when the name is requested.
+# Unlisted names are looked up in `<name>/repository.py` of this package.
+_API_KEY_REPOSITORY_MODULES: dict[str, str] = {
+    "mongo_db": "src.infrastructure.authentication.api_key_repositories.mongo_db.repository",
+}
+
 def register_api_key_repository(name: str):
     def decorator(cls: Type[ApiKeyRepository]):
         _API_KEY_REPOSITORIES[name] = cls
         return cls
     return decorator
 
+def register_api_key_repository_module(name: str, module: str) -> None:
+    _API_KEY_REPOSITORY_MODULES[name] = module
+
 def get_api_key_repository(name: str) -> Type[ApiKeyRepository]:
+    if name not in _API_KEY_REPOSITORIES:
+        module = _API_KEY_REPOSITORY_MODULES.get(name, f"{__package__}.{name}.repository")
+        import_plugin(module, phase=f"import API key repository {name!r}")
     try:
         return _API_KEY_REPOSITORIES[name]
     except KeyError:
         raise ValueError(f"No API key repository registered under name {name!r}")
 
 def list_available_repositories() -> list[str]:
-    return list(_API_KEY_REPOSITORIES.keys()) 
\ No newline at end of file
+    package_dir = Path(__file__).parent
+    packages = {name for _, name, is_pkg in pkgutil.iter_modules([str(package_dir)])
+                if is_pkg and (package_dir / name / "repository.py").exists()}
+    return sorted(set(_API_KEY_REPOSITORIES) | set(_API_KEY_REPOSITORY_MODULES) | packages)
@@ -1,6 +1,16 @@
+import asyncio
+import hashlib
+import hmac
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
-from typing import Any
+from typing import Any, Callable, Dict, TypeVar
+
+from src.core.config import CONFIG
+from src.core.metrics import register_metrics_provider
+
+_T = TypeVar("_T")
 
 
 class _HashProviderMeta(type):
@@ -21,12 +31,38 @@ class HashProvider(metaclass=_HashProviderMeta):
     """
     Singleton class providing API key hashing and verification,
     with a single CryptContext created on first instantiation.
+
+    The `*_async` variants run bcrypt on a dedicated, size-bounded thread
+    pool so the event loop is never blocked by a hash.
+    `digest_api_key` is the fast, deterministic lookup digest used instead
+    of bcrypt for keys with enough entropy to not need a slow hash.
     """
 
     def __init__(self) -> None:
         # Initialize CryptContext only once per singleton instance
         if not hasattr(self, "_pwd_context"):
             self._pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+            self._pepper = CONFIG.api_key_pepper.encode("utf-8")
+            if not self._pepper:
+                # Setting a pepper later would invalidate every key digested without it
+                if not CONFIG.api_key_allow_unpeppered:
+                    raise RuntimeError(
+                        "API_KEY_PEPPER is not set. Set it to a long random secret, "
+                        "or set API_KEY_ALLOW_UNPEPPERED=true to keep unpeppered digests")
+                print("Warning: API_KEY_PEPPER is not set, API key digests are unpeppered")
+            self._max_workers = max(1, CONFIG.hash_executor_workers)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="hash-provider",
+            )
+            self._stats_lock = threading.Lock()
+            self._queued = 0
+            self._running = 0
+            self._started = 0
+            self._completed = 0
+            self._max_queue_depth = 0
+            self._total_wait_seconds = 0.0
+            register_metrics_provider("hash_executor", self.stats)
 
     def hash_api_key(self, plain_key: str) -> str:
         """
@@ -39,3 +75,61 @@ class HashProvider(metaclass=_HashProviderMeta):
         Verifies a plain API key against the stored bcrypt hash.
         """
         return self._pwd_context.verify(plain_key, hashed_key)
+
+    def digest_api_key(self, plain_key: str) -> str:
+        """
+        HMAC-SHA256 of an API key with the server-side pepper (hex).
+        """
+        return hmac.new(self._pepper, plain_key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    async def hash_api_key_async(self, plain_key: str) -> str:
+        """
+        Awaitable `hash_api_key`, run on the hashing executor.
+        """
+        return await self._run(self.hash_api_key, plain_key)
+
+    async def verify_api_key_async(self, plain_key: str, hashed_key: str) -> bool:
+        """
+        Awaitable `verify_api_key`, run on the hashing executor.
+        """
+        return await self._run(self.verify_api_key, plain_key, hashed_key)
+
+    async def _run(self, fn: Callable[..., _T], *args: Any) -> _T:
+        submitted_at = time.perf_counter()
+        with self._stats_lock:
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+
+        def task() -> _T:
+            with self._stats_lock:
+                self._queued -= 1
+                self._running += 1
+                self._started += 1
+                self._total_wait_seconds += time.perf_counter() - submitted_at
+            try:
+                return fn(*args)
+            finally:
+                with self._stats_lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        future = self._executor.submit(task)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A task cancelled before it started never leaves the queue itself
+            if future.cancelled():
+                with self._stats_lock:
+                    self._queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            return {
+                "max_workers": self._max_workers,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "max_queue_depth": self._max_queue_depth,
+                "avg_wait_seconds": self._total_wait_seconds / self._started if self._started else 0.0,
+            }
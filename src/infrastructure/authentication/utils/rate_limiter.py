@@ -0,0 +1,98 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int # Burst size
+    remaining: int # Whole tokens left
+    reset_seconds: float # Until the bucket is full again
+    retry_after: float # Until the next token, when rejected
+
+
+class TokenBucketRateLimiter:
+    """
+    In-process token bucket per API key: `rate` tokens per second refill a
+    bucket of `burst` tokens, and each request takes one.
+
+    A bucket is two floats (tokens, last update), kept in LRU order. A
+    bucket idle long enough to be full again is dropped, since recreating
+    it full is equivalent; `max_keys` bounds the total. Limits are per
+    worker process.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self._max_keys = max(1, max_keys)
+        # key id -> [tokens, updated_at, seconds to refill completely]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._limited = 0
+        self._evictions = 0
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            _, updated_at, refill_seconds = next(iter(self._buckets.values()))
+            if len(self._buckets) <= self._max_keys and now - updated_at < refill_seconds:
+                return
+            self._buckets.popitem(last=False)
+            self._evictions += 1
+
+    def check(self, key: str, rate: float, burst: int) -> RateLimitDecision:
+        """
+        Take a token from `key`'s bucket if there is one.
+        """
+        burst = max(1, burst)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(burst)
+                bucket = self._buckets[key] = [tokens, now, burst / rate]
+            else:
+                tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+                self._allowed += 1
+            else:
+                self._limited += 1
+            bucket[0], bucket[1], bucket[2] = tokens, now, burst / rate
+            self._evict(now)
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=burst,
+            remaining=int(tokens),
+            reset_seconds=(burst - tokens) / rate,
+            retry_after=0.0 if allowed else (1.0 - tokens) / rate,
+        )
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "max_keys": self._max_keys,
+                "allowed": self._allowed,
+                "limited": self._limited,
+                "evictions": self._evictions,
+            }
+
+
+def rate_limit_headers(decision: RateLimitDecision) -> Dict[str, str]:
+    """
+    `RateLimit-*` response headers (IETF httpapi draft), plus `Retry-After` when rejected.
+    """
+    headers = {
+        "RateLimit-Limit": str(decision.limit),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(math.ceil(decision.reset_seconds)),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+    return headers
@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from src.domain.authentication.api_key import ApiKey
+
+
+class VerifiedApiKeyCache:
+    """
+    Bounded, in-process cache of recently verified API keys (TTL + LRU).
+
+    Entries are keyed by an HMAC-SHA256 digest of the plain-text key using a
+    per-process random secret, so plain-text keys are never kept in memory
+    and the digest is useless outside this process.
+    Entries are only invalidated locally: with several workers, a revoked
+    key stays valid elsewhere for at most `ttl_seconds`.
+
+    Every invalidation bumps `generation`. A `put` carrying the generation
+    read before its repository lookup is dropped if an invalidation ran in
+    between, so a lookup racing a revocation cannot cache the revoked key.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._secret = secrets.token_bytes(32)
+        self._entries: "OrderedDict[bytes, Tuple[ApiKey, float]]" = OrderedDict()
+        self._digests_by_id: Dict[str, Set[bytes]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._generation = 0
+        self._stale_puts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size > 0 and self._ttl_seconds > 0
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def _digest(self, plain_key: str) -> bytes:
+        return hmac.new(self._secret, plain_key.encode("utf-8"), hashlib.sha256).digest()
+
+    def _remove(self, digest: bytes) -> None:
+        entity, _ = self._entries.pop(digest)
+        digests = self._digests_by_id.get(entity.id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._digests_by_id[entity.id]
+
+    def get(self, plain_key: str) -> Optional[ApiKey]:
+        if not self.enabled:
+            return None
+        digest = self._digest(plain_key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self._misses += 1
+                return None
+            entity, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(digest)
+                self._evictions += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return entity
+
+    def put(self, plain_key: str, entity: ApiKey, generation: Optional[int] = None) -> None:
+        """
+        Cache `entity`. `generation` is the value of `generation` read before
+        the entity was looked up; the put is dropped if it is stale.
+        """
+        if not self.enabled:
+            return
+        digest = self._digest(plain_key)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stale_puts += 1
+                return
+            if digest in self._entries:
+                self._remove(digest)
+            self._entries[digest] = (entity, time.monotonic() + self._ttl_seconds)
+            self._digests_by_id.setdefault(entity.id, set()).add(digest)
+            while len(self._entries) > self._max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate(self, key_id: str) -> None:
+        """
+        Drop every cached entry for the API key with the given id.
+        """
+        with self._lock:
+            self._generation += 1
+            for digest in list(self._digests_by_id.get(key_id, ())):
+                self._remove(digest)
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._digests_by_id.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl_seconds": self._ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "stale_puts": self._stale_puts,
+            }
@@ -0,0 +1,94 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.domain.models.input.image_input import ImageInput
+
+
+class ImageStore:
+    """
+    In-process store of uploaded images, addressed by random ids and owned
+    by the API key that uploaded them. Entries expire `ttl_seconds` after
+    their last use. The total size (encoded bytes plus the decoded and
+    resized forms memoised on each `ImageInput`) is kept under
+    `max_bytes` by evicting the least recently used images.
+
+    The stored `ImageInput` instance itself is handed to every request
+    that references it, so follow-up turns reuse its hash, decode and
+    resizes instead of recomputing them.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # id -> (owner, image, expires_at, accounted size)
+        self._entries: "OrderedDict[str, Tuple[str, ImageInput, float, int]]" = OrderedDict()
+        self._size = 0
+        self._uploads = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, image_id: str) -> None:
+        _, _, _, size = self._entries.pop(image_id)
+        self._size -= size
+
+    def _evict(self) -> None:
+        # Every use moves its entry to the end with a `ttl_seconds` lifetime,
+        # so entries are ordered by expiry too: expired ones are at the head
+        now = time.monotonic()
+        while self._entries and next(iter(self._entries.values()))[2] <= now:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def put(self, owner: str, image: ImageInput) -> Optional[str]:
+        """
+        Store `image` for `owner`. Returns its id, or None if it alone exceeds the budget.
+        """
+        size = image.cached_nbytes()
+        if size > self.max_bytes:
+            return None
+        image_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._entries[image_id] = (owner, image, time.monotonic() + self.ttl_seconds, size)
+            self._size += size
+            self._uploads += 1
+            self._evict()
+        return image_id
+
+    def get(self, owner: str, image_id: str) -> Optional[ImageInput]:
+        """
+        The stored image if it exists, has not expired and belongs to `owner`.
+        Each use extends its lifetime and re-measures its memoised forms.
+        """
+        with self._lock:
+            entry = self._entries.get(image_id)
+            if entry is None or entry[0] != owner or entry[2] <= time.monotonic():
+                self._misses += 1
+                return None
+            _, image, _, size = entry
+            new_size = image.cached_nbytes()
+            self._entries[image_id] = (owner, image, time.monotonic() + self.ttl_seconds, new_size)
+            self._entries.move_to_end(image_id)
+            self._size += new_size - size
+            self._hits += 1
+            self._evict()
+            return image
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "images": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "uploads": self._uploads,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,2 @@
+# Import backends so they register themselves
+from src.infrastructure.response_cache import disk_backend, memory_backend
@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+
+class ResponseCacheBackend(ABC):
+    """
+    Byte store for cached responses, bounded by total value size and TTL.
+    """
+
+    # True if calls may block on I/O and should run off the event loop
+    blocking: bool = False
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the value stored under `key`, or None if missing or expired.
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """
+        Store `value`, evicting least recently used entries to fit `max_bytes`.
+        """
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, object]:
+        pass
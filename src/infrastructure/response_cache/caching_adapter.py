@@ -0,0 +1,137 @@
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.infrastructure.adapters.vqa.request_key import build_request_key
+from src.infrastructure.response_cache.backend import ResponseCacheBackend
+
+# Responses reused from a similar (not identical) request must not be
+# stored under this request's exact key
+_APPROXIMATE_RESPONSE_MARKERS = ("perceptual_cache",)
+
+
+class CachingVqaAdapter(AsyncVqaPort):
+    """
+    Serves repeated requests (same image content, question, history,
+    adapter and effective generation params) from a response cache.
+    Each response reports the cache outcome under `details["cache"]`.
+    """
+
+    def __init__(self, wrapped: AsyncVqaPort, backend: ResponseCacheBackend, adapter_name: str):
+        self.wrapped = wrapped
+        self._backend = backend
+        self._adapter_name = adapter_name
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.wrapped.get_effective_params(options)
+
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        key = build_request_key(
+            self._adapter_name,
+            "captioning",
+            captioning_input.image,
+            self.wrapped.get_effective_params(captioning_input.options),
+            history=captioning_input.history,
+        )
+        return await self._cached(key, lambda: self.wrapped.process_captioning(captioning_input))
+
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        key = build_request_key(
+            self._adapter_name,
+            "question",
+            question_input.image,
+            self.wrapped.get_effective_params(question_input.options),
+            question=question_input.question,
+            history=question_input.history,
+        )
+        return await self._cached(key, lambda: self.wrapped.process_question(question_input))
+
+    def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        key = build_request_key(
+            self._adapter_name,
+            "captioning",
+            captioning_input.image,
+            self.wrapped.get_effective_params(captioning_input.options),
+            history=captioning_input.history,
+        )
+        return self._cached_stream(key, lambda: self.wrapped.stream_captioning(captioning_input))
+
+    def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        key = build_request_key(
+            self._adapter_name,
+            "question",
+            question_input.image,
+            self.wrapped.get_effective_params(question_input.options),
+            question=question_input.question,
+            history=question_input.history,
+        )
+        return self._cached_stream(key, lambda: self.wrapped.stream_question(question_input))
+
+    async def _cached_stream(
+        self, key: str, stream: Callable[[], AsyncIterator[ResponseChunk]]
+    ) -> AsyncIterator[ResponseChunk]:
+        # A hit is sent as a single chunk; streamed outputs are not stored,
+        # they skip the adapter's post-processing of full responses
+        value = await self._backend_call(self._backend.get, key)
+        if value is not None:
+            self._hits += 1
+            yield ResponseChunk(delta=Response.model_validate_json(value).output)
+            return
+        self._misses += 1
+        async with aclosing(stream()) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def _cached(self, key: str, compute: Callable[[], Awaitable[Response]]) -> Response:
+        value = await self._backend_call(self._backend.get, key)
+        if value is not None:
+            self._hits += 1
+            return self._with_cache_details(Response.model_validate_json(value), hit=True)
+
+        self._misses += 1
+        response = await compute()
+        if not any(marker in (response.details or {}) for marker in _APPROXIMATE_RESPONSE_MARKERS):
+            await self._backend_call(self._backend.set, key, response.model_dump_json().encode("utf-8"))
+        return self._with_cache_details(response, hit=False)
+
+    async def _backend_call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # A broken cache must never fail the request, it only costs a miss
+        try:
+            if self._backend.blocking:
+                return await run_in_threadpool(fn, *args)
+            return fn(*args)
+        except OSError as e:
+            self._errors += 1
+            print(f"Warning: Response cache error: {e}")
+            return None
+
+    def _with_cache_details(self, response: Response, hit: bool) -> Response:
+        details = dict(response.details or {})
+        details["cache"] = {"hit": hit, "hit_ratio": self.hit_ratio}
+        return response.model_copy(update={"details": details})
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self.hit_ratio,
+            "errors": self._errors,
+            **self._backend.stats(),
+        }
+
+    async def aclose(self) -> None:
+        await self.wrapped.aclose()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.core.config import CONFIG
+from src.infrastructure.response_cache.backend import ResponseCacheBackend
+from src.infrastructure.response_cache.registry import register_response_cache_backend
+
+
+@register_response_cache_backend("disk")
+class DiskResponseCacheBackend(ResponseCacheBackend):
+    """
+    One file per entry under `CONFIG.response_cache_dir`, so cached
+    responses survive restarts. An in-memory index (rebuilt from the
+    directory on startup) tracks sizes, expiry (file mtime + TTL) and
+    LRU order.
+    """
+
+    blocking = True
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        super().__init__(max_bytes, ttl_seconds)
+        self._dir = Path(CONFIG.response_cache_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        # key -> (size, expires_at as wall-clock time)
+        self._index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._size = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.bin"
+
+    def _load_index(self) -> None:
+        files = []
+        for path in self._dir.glob("*.bin"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        # Oldest first, so the most recent writes are the last to be evicted
+        for mtime, key, size in sorted(files):
+            self._index[key] = (size, mtime + self.ttl_seconds)
+            self._size += size
+        self._evict_to_fit()
+
+    def _remove(self, key: str) -> None:
+        size, _ = self._index.pop(key)
+        self._size -= size
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict_to_fit(self) -> None:
+        while self._size > self.max_bytes:
+            self._remove(next(iter(self._index)))
+            self._evictions += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                self._remove(key)
+                self._evictions += 1
+                return None
+            self._index.move_to_end(key)
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                if key in self._index:
+                    self._remove(key)
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        # Write to a temp file then rename, so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            if key in self._index:
+                size, _ = self._index.pop(key)
+                self._size -= size
+            self._index[key] = (len(value), time.time() + self.ttl_seconds)
+            self._size += len(value)
+            self._evict_to_fit()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "directory": str(self._dir),
+            }
@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.infrastructure.response_cache.backend import ResponseCacheBackend
+from src.infrastructure.response_cache.registry import register_response_cache_backend
+
+
+@register_response_cache_backend("memory")
+class MemoryResponseCacheBackend(ResponseCacheBackend):
+    """
+    In-process LRU, bounded by the total size of stored values.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        super().__init__(max_bytes, ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+from src.domain.models.input.image_input import ImageInput
+from src.domain.models.output.response import Response
+
+# Same size SMSA feeds its model, so the memoised resize is shared with it
+# (with SMSA's default preprocessing settings)
+HASH_SOURCE_SIZE = (512, 512)
+_HASH_GRID = (9, 8)
+
+
+def dhash(image: ImageInput) -> int:
+    """
+    64-bit difference hash: each bit tells whether a pixel of the 9x8
+    grayscale thumbnail is brighter than its right neighbour.
+    Robust to small exposure, compression and crop changes.
+    """
+    from PIL import Image
+    thumbnail = image.resized(HASH_SOURCE_SIZE).convert("L").resize(_HASH_GRID, Image.Resampling.BOX)
+    pixels = thumbnail.tobytes()
+    width, height = _HASH_GRID
+    value = 0
+    for row in range(height):
+        offset = row * width
+        for col in range(width - 1):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class PerceptualIndex:
+    """
+    Bounded, per-API-key index of recent (dHash, params, response) entries.
+    Only the last `entries_per_key` images of each key are kept, for the
+    `max_keys` most recently active keys.
+    """
+
+    def __init__(self, max_distance: int, ttl_seconds: float, entries_per_key: int, max_keys: int) -> None:
+        self._max_distance = max_distance
+        self._ttl_seconds = ttl_seconds
+        self._entries_per_key = entries_per_key
+        self._max_keys = max_keys
+        # scope -> recent (hash, params key, response, expires_at)
+        self._scopes: "OrderedDict[str, Deque[Tuple[int, str, Response, float]]]" = OrderedDict()
+
+    def find(self, scope: str, image_hash: int, params_key: str) -> Optional[Tuple[Response, int]]:
+        """
+        Closest unexpired response within `max_distance`, with its distance.
+        """
+        entries = self._scopes.get(scope)
+        if not entries:
+            return None
+        self._scopes.move_to_end(scope)
+        now = time.monotonic()
+        best: Optional[Tuple[Response, int]] = None
+        for entry_hash, entry_params, response, expires_at in entries:
+            if expires_at <= now or entry_params != params_key:
+                continue
+            distance = (entry_hash ^ image_hash).bit_count()
+            if distance <= self._max_distance and (best is None or distance < best[1]):
+                best = (response, distance)
+        return best
+
+    def add(self, scope: str, image_hash: int, params_key: str, response: Response) -> None:
+        entries = self._scopes.get(scope)
+        if entries is None:
+            entries = deque(maxlen=self._entries_per_key)
+            self._scopes[scope] = entries
+            while len(self._scopes) > self._max_keys:
+                self._scopes.popitem(last=False)
+        else:
+            self._scopes.move_to_end(scope)
+        entries.append((image_hash, params_key, response, time.monotonic() + self._ttl_seconds))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "keys": len(self._scopes),
+            "entries": sum(len(entries) for entries in self._scopes.values()),
+            "max_distance": self._max_distance,
+        }
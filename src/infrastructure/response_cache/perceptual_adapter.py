@@ -0,0 +1,99 @@
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from src.core.request_context import current_api_key
+from src.domain.models.input.captioning_input import CaptioningInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.infrastructure.response_cache.perceptual import PerceptualIndex, dhash
+
+
+class PerceptualCaptionCacheAdapter(AsyncVqaPort):
+    """
+    Reuses a recent caption for a visually equivalent image (dHash within
+    a Hamming distance) sent by the same API key. Only captioning requests
+    without history are eligible; questions always reach the model.
+    """
+
+    def __init__(self, wrapped: AsyncVqaPort, index: PerceptualIndex):
+        self.wrapped = wrapped
+        self._index = index
+        self._lookups = 0
+        self._hits = 0
+        self._hit_distance_total = 0
+
+    def get_effective_params(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.wrapped.get_effective_params(options)
+
+    async def process_captioning(self, captioning_input: CaptioningInput) -> Response:
+        lookup = await self._lookup(captioning_input)
+        if lookup is None:
+            return await self.wrapped.process_captioning(captioning_input)
+        scope, image_hash, params_key, match = lookup
+        if match is not None:
+            response, distance = match
+            details = dict(response.details or {})
+            details["perceptual_cache"] = {"hit": True, "distance": distance}
+            return response.model_copy(update={"details": details})
+
+        response = await self.wrapped.process_captioning(captioning_input)
+        self._index.add(scope, image_hash, params_key, response)
+        return response
+
+    async def stream_captioning(self, captioning_input: CaptioningInput) -> AsyncIterator[ResponseChunk]:
+        lookup = await self._lookup(captioning_input)
+        if lookup is not None and lookup[3] is not None:
+            response, _ = lookup[3]
+            yield ResponseChunk(delta=response.output)
+            return
+        # Closing this stream early must reach the adapter
+        async with aclosing(self.wrapped.stream_captioning(captioning_input)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def _lookup(
+        self, captioning_input: CaptioningInput
+    ) -> Optional[Tuple[str, int, str, Optional[Tuple[Response, int]]]]:
+        """
+        (scope, dHash, params key, match) for an eligible request, None otherwise.
+        """
+        api_key = current_api_key.get()
+        if api_key is None or captioning_input.history:
+            return None
+
+        params_key = json.dumps(
+            self.wrapped.get_effective_params(captioning_input.options),
+            sort_keys=True,
+            default=str,
+        )
+        # Decoding may take a while on large photos, keep it off the event loop
+        image_hash = await run_in_threadpool(dhash, captioning_input.image)
+        self._lookups += 1
+        match = self._index.find(api_key.id, image_hash, params_key)
+        if match is not None:
+            self._hits += 1
+            self._hit_distance_total += match[1]
+        return api_key.id, image_hash, params_key, match
+
+    async def process_question(self, question_input: QuestionInput) -> Response:
+        return await self.wrapped.process_question(question_input)
+
+    def stream_question(self, question_input: QuestionInput) -> AsyncIterator[ResponseChunk]:
+        return self.wrapped.stream_question(question_input)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "lookups": self._lookups,
+            "model_calls_saved": self._hits,
+            "hit_ratio": self._hits / self._lookups if self._lookups else 0.0,
+            "avg_hit_distance": self._hit_distance_total / self._hits if self._hits else 0.0,
+            **self._index.stats(),
+        }
+
+    async def aclose(self) -> None:
+        await self.wrapped.aclose()
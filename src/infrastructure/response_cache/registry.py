@@ -0,0 +1,20 @@
+from typing import Type
+
+from src.infrastructure.response_cache.backend import ResponseCacheBackend
+
+_BACKENDS: dict[str, Type[ResponseCacheBackend]] = {}
+
+def register_response_cache_backend(name: str):
+    def decorator(cls: Type[ResponseCacheBackend]):
+        _BACKENDS[name] = cls
+        return cls
+    return decorator
+
+def get_response_cache_backend(name: str) -> Type[ResponseCacheBackend]:
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"No response cache backend registered under name {name!r}")
+
+def list_available_backends() -> list[str]:
+    return list(_BACKENDS.keys())
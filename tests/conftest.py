@@ -0,0 +1,8 @@
+import os
+
+# Importing `src` builds the HashProvider, which needs a pepper
+os.environ.setdefault("API_KEY_PEPPER", "tests")
+# The API dependencies build the repository on import; the client only connects on use
+os.environ.setdefault("API_KEY_REPOSITORY", "mongo_db")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DATABASE", "tests")
@@ -0,0 +1,112 @@
+"""
+Tiny, randomly initialised stand-in for the SMSA model, runnable on CPU.
+
+It has the surface SMSA uses: a processor with a chat template that
+takes `images=` and `text=` (images are ignored), and a causal LM whose
+decoder ends with a `norm` module. One character is one token, so token
+budgets can be checked on the decoded text. `stand_in_vl_model` is a
+Qwen2-VL variant, with the 3D rotary positions the prefix cache needs.
+"""
+import string
+from typing import List, Optional
+
+import torch
+from PIL import Image
+from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+from transformers import (
+    PreTrainedTokenizerFast,
+    Qwen2Config,
+    Qwen2ForCausalLM,
+    Qwen2VLConfig,
+    Qwen2VLForConditionalGeneration,
+)
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib import SMSA
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import IMAGE_SIZE
+
+_CHAT_TEMPLATE = (
+    "{% for message in messages %}{{ message['role'] }}: "
+    "{% for part in message['content'] %}{% if part['type'] == 'text' %}{{ part['text'] }}{% endif %}{% endfor %}"
+    "<eos>\n{% endfor %}"
+    "{% if add_generation_prompt %}assistant: {% endif %}")
+
+
+class StandInProcessor:
+    def __init__(self, tokenizer: PreTrainedTokenizerFast) -> None:
+        self.tokenizer = tokenizer
+
+    def apply_chat_template(self, messages, add_generation_prompt: bool = False, tokenize: bool = False):
+        return self.tokenizer.apply_chat_template(
+            messages, add_generation_prompt=add_generation_prompt, tokenize=tokenize)
+
+    def __call__(self, images=None, text=None, **kwargs):
+        return self.tokenizer(text, **kwargs)
+
+    def decode(self, *args, **kwargs) -> str:
+        return self.tokenizer.decode(*args, **kwargs)
+
+    def batch_decode(self, *args, **kwargs) -> List[str]:
+        return self.tokenizer.batch_decode(*args, **kwargs)
+
+
+class StandInSelector(torch.nn.Module):
+    def __init__(self, hidden_size: int) -> None:
+        super().__init__()
+        self.linear = torch.nn.Linear(hidden_size, 1)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return torch.sigmoid(self.linear(x)).squeeze(-1)
+
+
+def stand_in_processor() -> StandInProcessor:
+    tokens = ["<pad>", "<eos>", "<unk>"] + sorted(set(string.printable))
+    backend = Tokenizer(models.WordLevel({token: i for i, token in enumerate(tokens)}, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex(r"[\s\S]"), behavior="isolated")
+    backend.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, pad_token="<pad>", eos_token="<eos>", unk_token="<unk>",
+        clean_up_tokenization_spaces=False, model_input_names=["input_ids", "attention_mask"])
+    tokenizer.chat_template = _CHAT_TEMPLATE
+    return StandInProcessor(tokenizer)
+
+
+def stand_in_model(vocab_size: int, seed: int = 0) -> Qwen2ForCausalLM:
+    torch.manual_seed(seed)
+    config = Qwen2Config(
+        vocab_size=vocab_size, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=4096,
+        pad_token_id=0, eos_token_id=1, bos_token_id=None, tie_word_embeddings=False)
+    # Eager attention keeps fully masked (left padding) rows finite
+    return Qwen2ForCausalLM._from_config(config, attn_implementation="eager").eval()
+
+
+def stand_in_vl_model(vocab_size: int, seed: int = 0) -> Qwen2VLForConditionalGeneration:
+    torch.manual_seed(seed)
+    text_config = dict(
+        vocab_size=vocab_size, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=4096,
+        rope_scaling={"type": "mrope", "mrope_section": [1, 1, 2]},
+        pad_token_id=0, eos_token_id=1, bos_token_id=None, tie_word_embeddings=False)
+    # The processor sends no images: vision token ids are outside the vocabulary
+    config = Qwen2VLConfig(
+        text_config=text_config, vision_config=dict(depth=1, embed_dim=16, hidden_size=32, num_heads=2),
+        image_token_id=vocab_size, video_token_id=vocab_size + 1, vision_start_token_id=vocab_size + 2,
+        vocab_size=vocab_size, pad_token_id=0, eos_token_id=1, tie_word_embeddings=False)
+    return Qwen2VLForConditionalGeneration._from_config(config, attn_implementation="eager").eval()
+
+
+def stand_in_smsa(vision_language: bool = False, **options) -> SMSA:
+    """
+    An initialised `SMSA` on the stand-in model (`stand_in_vl_model` with
+    `vision_language`), `options` as for `SMSA`.
+    """
+    processor = stand_in_processor()
+    model = (stand_in_vl_model if vision_language else stand_in_model)(len(processor.tokenizer))
+    torch.manual_seed(1)
+    smsa = SMSA(model_path="", selector_path="", **options)
+    smsa.initialize_with(model, processor, StandInSelector(model.config.get_text_config().hidden_size).eval())
+    return smsa
+
+
+def image(seed: Optional[int] = None) -> Image.Image:
+    return Image.new("RGB", IMAGE_SIZE, (seed or 0) % 256)
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.batching import MicroBatcher
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_output_embeddings_batch
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import generate_vqa_sample
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.stopping import SentenceEndStoppingCriteria
+from tests.smsa.stand_in import image, stand_in_model, stand_in_processor, stand_in_smsa
+
+QUESTIONS = ["What is this?", "Is the door open or closed?", "Which color is the cup on the left?", "Any text?"]
+BUDGETS = {"captioning": 6, "question": 5, "instructions": 9}
+
+
+@pytest.fixture(scope="module")
+def model_and_processor():
+    processor = stand_in_processor()
+    return stand_in_model(len(processor.tokenizer)), processor
+
+
+def _embed(model, processor, questions, budgets):
+    samples = [generate_vqa_sample(image=image(i), question=q) for i, q in enumerate(questions)]
+    return generate_output_embeddings_batch(
+        model, processor, samples, stopping_criteria=SentenceEndStoppingCriteria(budgets=budgets))
+
+
+def test_padded_batch_matches_single_samples(model_and_processor):
+    model, processor = model_and_processor
+    answer_vecs, question_vecs, texts = _embed(model, processor, QUESTIONS, [8] * len(QUESTIONS))
+    for i, question in enumerate(QUESTIONS):
+        single_answer, single_question, single_texts = _embed(model, processor, [question], [8])
+        assert texts[i] == single_texts[0]
+        torch.testing.assert_close(answer_vecs[i:i + 1], single_answer, atol=1e-4, rtol=1e-4)
+        torch.testing.assert_close(question_vecs[i:i + 1], single_question, atol=1e-4, rtol=1e-4)
+
+
+def test_each_row_keeps_its_own_budget(model_and_processor):
+    model, processor = model_and_processor
+    budgets = [2, 7, 4]
+    _, _, texts = _embed(model, processor, QUESTIONS[:3], budgets)
+    for question, budget, text in zip(QUESTIONS, budgets, texts):
+        # One character per token
+        assert len(text) <= budget
+        assert text == _embed(model, processor, [question], [budget])[2][0]
+
+
+@pytest.mark.parametrize("speculative_fallback", ["disabled", "always", "adaptive"])
+def test_smsa_batches_match_single_requests(speculative_fallback):
+    smsa = stand_in_smsa(max_new_tokens=BUDGETS, speculative_fallback=speculative_fallback)
+    images = [image(i) for i in range(len(QUESTIONS))]
+    assert smsa.process_vqa_batch(images, QUESTIONS) == [
+        smsa.process_vqa(img, question) for img, question in zip(images, QUESTIONS)]
+    assert smsa.process_ic_batch(images[:2]) == [smsa.process_ic(img) for img in images[:2]]
+
+
+def test_micro_batcher_routes_results_to_their_callers():
+    smsa = stand_in_smsa(max_new_tokens=BUDGETS)
+    expected = {question: smsa.process_vqa(image(i), question) for i, question in enumerate(QUESTIONS)}
+    batcher = MicroBatcher(
+        lambda items: smsa.process_vqa_batch([img for img, _ in items], [q for _, q in items]),
+        max_batch_size=len(QUESTIONS), max_wait_seconds=0.2)
+    try:
+        with ThreadPoolExecutor(len(QUESTIONS)) as pool:
+            results = list(pool.map(lambda iq: batcher.submit((image(iq[0]), iq[1])), enumerate(QUESTIONS)))
+    finally:
+        batcher.close()
+    assert dict(zip(QUESTIONS, results)) == expected
+    assert batcher.stats()["batches"] < len(QUESTIONS)
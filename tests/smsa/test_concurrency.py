@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_output_embeddings_batch
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import generate_vqa_sample
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.stopping import SentenceEndStoppingCriteria
+from tests.smsa.stand_in import image, stand_in_model, stand_in_processor, stand_in_smsa
+
+QUESTIONS = ["What is this?", "Is the door open or closed?", "Which color is the cup on the left?", "Any text?"] * 2
+
+
+def test_concurrent_calls_capture_only_their_own_hidden_states():
+    processor = stand_in_processor()
+    model = stand_in_model(len(processor.tokenizer))
+
+    def embed(question):
+        return generate_output_embeddings_batch(
+            model, processor, [generate_vqa_sample(image=image(), question=question)],
+            last_layer_only=True, stopping_criteria=SentenceEndStoppingCriteria(budgets=[12]))
+
+    expected = [embed(question) for question in QUESTIONS]
+    with ThreadPoolExecutor(len(QUESTIONS)) as pool:
+        results = list(pool.map(embed, QUESTIONS))
+    for (answer, question, texts), (ref_answer, ref_question, ref_texts) in zip(results, expected):
+        assert texts == ref_texts
+        torch.testing.assert_close(answer, ref_answer)
+        torch.testing.assert_close(question, ref_question)
+
+
+def test_concurrent_smsa_requests_match_sequential_ones():
+    smsa = stand_in_smsa(max_new_tokens={"captioning": 8, "question": 8, "instructions": 8})
+    expected = [smsa.process_vqa(image(i), question) for i, question in enumerate(QUESTIONS)]
+    with ThreadPoolExecutor(len(QUESTIONS)) as pool:
+        results = list(pool.map(lambda iq: smsa.process_vqa(image(iq[0]), iq[1]), enumerate(QUESTIONS)))
+        captions = list(pool.map(lambda i: smsa.process_ic(image(i)), range(4)))
+    assert results == expected
+    assert captions == [smsa.process_ic(image(i)) for i in range(4)]
+
+
+def test_closing_a_stream_stops_generation_before_returning():
+    smsa = stand_in_smsa(max_new_tokens={"captioning": 256, "question": 8, "instructions": 8},
+                         stop_at_sentence_end=False)
+    stream = smsa.stream_ic(image())
+    next(stream, None)
+    stream.close()
+    assert not any(thread.name == "smsa_stream" for thread in threading.enumerate())
@@ -0,0 +1,42 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from torch.nn.functional import cosine_similarity
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import (
+    generate_output_embedding,
+    generate_output_embedding_three_pass,
+)
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import (
+    generate_captioning_sample,
+    generate_instructions_sample,
+    generate_vqa_sample,
+)
+from tests.smsa.stand_in import image, stand_in_model, stand_in_processor
+
+MIN_COSINE = 0.999
+SAMPLES = {
+    "question": lambda: generate_vqa_sample(image=image(1), question="What is this?"),
+    "captioning": lambda: generate_captioning_sample(image=image(2)),
+    "instructions": lambda: generate_instructions_sample(image=image(3), question="Is the door open?"),
+}
+
+
+@pytest.fixture(scope="module")
+def model_and_processor():
+    processor = stand_in_processor()
+    return stand_in_model(len(processor.tokenizer)), processor
+
+
+@pytest.mark.parametrize("task", SAMPLES)
+@pytest.mark.parametrize("last_layer_only", [True, False])
+def test_single_prefill_matches_the_three_pass_reference(model_and_processor, task, last_layer_only):
+    model, processor = model_and_processor
+    sample = SAMPLES[task]()
+    ref_answer, ref_question, ref_text = generate_output_embedding_three_pass(model, processor, sample)
+    answer, question, text = generate_output_embedding(model, processor, sample, last_layer_only=last_layer_only)
+    assert text == ref_text
+    assert cosine_similarity(answer, ref_answer).item() >= MIN_COSINE
+    assert cosine_similarity(question, ref_question).item() >= MIN_COSINE
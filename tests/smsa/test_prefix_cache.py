@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.embeddings import generate_output_embeddings_batch, model_lock
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.prefix_cache import PrefixKVCache
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.samples_generator import generate_vqa_sample
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.stopping import SentenceEndStoppingCriteria
+from tests.smsa.stand_in import image, stand_in_processor, stand_in_smsa, stand_in_vl_model
+
+QUESTIONS = ["What is this?", "Is the door open or closed?", "Any text?"]
+BUDGETS = {"captioning": 6, "question": 5, "instructions": 9}
+
+
+@pytest.fixture(scope="module")
+def model_and_processor():
+    processor = stand_in_processor()
+    return stand_in_vl_model(len(processor.tokenizer)), processor
+
+
+@pytest.mark.parametrize("last_layer_only", [True, False])
+def test_prefixed_batch_matches_the_full_prompt(model_and_processor, last_layer_only):
+    model, processor = model_and_processor
+    samples = [generate_vqa_sample(image=image(i), question=q) for i, q in enumerate(QUESTIONS)]
+    cache = PrefixKVCache(model, processor)
+
+    def embed(prefix_cache):
+        return generate_output_embeddings_batch(
+            model, processor, samples, last_layer_only=last_layer_only,
+            stopping_criteria=SentenceEndStoppingCriteria(budgets=[4, 12, 8]), prefix_cache=prefix_cache)
+
+    answer_vecs, question_vecs, texts = embed(None)
+    prefixed_answer_vecs, prefixed_question_vecs, prefixed_texts = embed(cache)
+    assert cache.stats()["prefixes"] == 1
+    assert prefixed_texts == texts
+    torch.testing.assert_close(prefixed_answer_vecs, answer_vecs, atol=1e-4, rtol=1e-4)
+    torch.testing.assert_close(prefixed_question_vecs, question_vecs, atol=1e-4, rtol=1e-4)
+
+
+def test_smsa_with_prefix_cache_matches_without():
+    options = dict(max_new_tokens=BUDGETS, speculative_fallback="always", vision_language=True)
+    images = [image(i) for i in range(len(QUESTIONS))]
+    prefixed = stand_in_smsa(prefix_cache=True, **options)
+    plain = stand_in_smsa(prefix_cache=False, **options)
+    assert prefixed.process_vqa_batch(images, QUESTIONS) == plain.process_vqa_batch(images, QUESTIONS)
+    assert prefixed.process_ic_batch(images[:2]) == plain.process_ic_batch(images[:2])
+
+
+def test_new_prefix_while_the_model_is_busy_does_not_deadlock(model_and_processor):
+    model, processor = model_and_processor
+    cache = PrefixKVCache(model, processor)
+    busy = threading.Event()
+    waiting = threading.Event()
+
+    def generation():
+        # Holds the model, then looks up its prefix, as a generation does
+        with model_lock(model):
+            busy.set()
+            waiting.wait(timeout=5)
+            cache.get("system: first<eos>\n")
+
+    def other_request():
+        busy.wait(timeout=5)
+        waiting.set()
+        cache.get("system: second<eos>\n")
+
+    threads = [threading.Thread(target=generation, daemon=True), threading.Thread(target=other_request, daemon=True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not any(thread.is_alive() for thread in threads)
+    assert cache.stats()["prefixes"] == 2
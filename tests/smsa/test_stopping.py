@@ -0,0 +1,98 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib.helpers.stopping import (
+    SentenceEndStoppingCriteria,
+    SentenceEndTextStreamer,
+    sentence_end_tokens,
+)
+from tests.smsa.stand_in import stand_in_processor
+
+PROMPT = "assistant: "
+
+
+def _run(processor, text, budget=64):
+    """
+    Feed `text` to the criteria one token at a time, as `generate` does.
+    Returns the generated text up to the stop and the criteria.
+    """
+    tokenizer = processor.tokenizer
+    criteria = SentenceEndStoppingCriteria(budgets=[budget], sentence_end=sentence_end_tokens(processor))
+    ids = tokenizer(PROMPT + text, add_special_tokens=False).input_ids
+    prompt_len = len(tokenizer(PROMPT, add_special_tokens=False).input_ids)
+    for end in range(prompt_len + 1, len(ids) + 1):
+        if criteria(torch.tensor([ids[:end]]), None)[0]:
+            return tokenizer.decode(ids[prompt_len:end]), criteria
+    return tokenizer.decode(ids[prompt_len:]), criteria
+
+
+def test_terminators_inside_a_sentence_do_not_stop():
+    processor = stand_in_processor()
+    for text in ["The bill is $3.50 in total", "See example.com/menu for more", "It is 2.5 m tall"]:
+        generated, criteria = _run(processor, text)
+        assert generated == text
+        assert criteria.sentence_end_stops == 0
+
+
+def test_sentence_end_stops_on_the_following_whitespace_and_trims_it():
+    processor = stand_in_processor()
+    generated, criteria = _run(processor, "The bill is $3.50. Pay at the counter.")
+    assert generated == "The bill is $3.50. "
+    assert criteria.sentence_end_stops == 1
+    assert criteria.trimmed.tolist() == [True]
+
+
+@pytest.mark.parametrize("text, generated", [
+    ("Dr. Smith is in. Next", "Dr. Smith is in. "),
+    ("It is in St. Louis. Next", "It is in St. Louis. "),
+    ("A U.S. Army truck. Next", "A U.S. Army truck. "),
+    ("Fruit, e.g. The apple. Next", "Fruit, e.g. The apple. "),
+    ("Ask Mr. J. Doe.\nNext", "Ask Mr. J. Doe.\n"),
+])
+def test_titles_and_initials_do_not_end_a_sentence(text, generated):
+    generated_text, criteria = _run(stand_in_processor(), text)
+    assert generated_text == generated
+    assert criteria.sentence_end_stops == 1
+
+
+@pytest.mark.parametrize("text, generated", [
+    ("No. The door is closed.", "No. "),
+    ("It is a cat. Next", "It is a cat. "),
+    ("Done! Next", "Done! "),
+])
+def test_other_words_still_end_a_sentence(text, generated):
+    assert _run(stand_in_processor(), text)[0] == generated
+
+
+def test_budget_still_applies():
+    generated, criteria = _run(stand_in_processor(), "A long sentence without an end", budget=6)
+    assert generated == "A long"
+    assert criteria.trimmed.tolist() == [False]
+
+
+def test_cancel_stops_every_row_at_the_next_step():
+    criteria = SentenceEndStoppingCriteria(budgets=[8, 8])
+    ids = torch.zeros((2, 4), dtype=torch.long)
+    assert criteria(ids, None).tolist() == [False, False]
+    criteria.cancel()
+    assert criteria.cancelled
+    assert criteria(torch.zeros((2, 5), dtype=torch.long), None).tolist() == [True, True]
+
+
+@pytest.mark.parametrize("text, generated", [
+    ("It costs $3.50. Next", "It costs $3.50. "),
+    ("It costs $3.50.\nNext", "It costs $3.50.\n"),
+])
+def test_streamer_does_not_emit_past_the_sentence_end(text, generated):
+    processor = stand_in_processor()
+    tokenizer = processor.tokenizer
+    stopped_at, criteria = _run(processor, text)
+    assert stopped_at == generated
+    streamer = SentenceEndTextStreamer(tokenizer, criteria, skip_prompt=True)
+    streamer.put(torch.tensor([tokenizer(PROMPT, add_special_tokens=False).input_ids]))
+    for token in tokenizer(generated, add_special_tokens=False).input_ids:
+        streamer.put(torch.tensor([token]))
+    streamer.end()
+    assert "".join(streamer).strip() == "It costs $3.50."
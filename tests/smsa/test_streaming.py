@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.infrastructure.adapters.vqa.smsa.SMSA_lib import STREAM_RESET, _strip_quotes
+from tests.smsa.stand_in import image, stand_in_smsa
+
+QUESTIONS = ["What is this?", "Is the door open or closed?", "Any text?"]
+
+
+def _joined(stream) -> str:
+    text = ""
+    for delta in stream:
+        text = "" if delta is STREAM_RESET else text + delta
+    return text
+
+
+@pytest.mark.parametrize("chunks", [
+    ['"', "'Yes", ", it", " is.", '"'],
+    ['"Open', '"', " door", "'", "'"],
+    ["'", '"', "'"],
+    ["plain", " text"],
+])
+def test_stripped_stream_joins_to_the_stripped_text(chunks):
+    streamed = list(_strip_quotes(chunks))
+    assert "".join(streamed) == "".join(chunks).strip('\'"')
+    assert "" not in streamed
+
+
+@pytest.fixture(scope="module")
+def smsa():
+    return stand_in_smsa(max_new_tokens={"captioning": 8, "question": 8, "instructions": 10})
+
+
+# A threshold above 1 rejects every answer, below 0 accepts it
+@pytest.mark.parametrize("threshold", [-1.0, 2.0])
+@pytest.mark.parametrize("verify_answer", [True, False])
+def test_stream_joins_to_the_batch_answer(smsa, threshold, verify_answer):
+    for i, question in enumerate(QUESTIONS):
+        expected = smsa.process_vqa(image(i), question, threshold=threshold)
+        stream = smsa.stream_vqa(image(i), question, threshold=threshold, verify_answer=verify_answer)
+        assert _joined(stream) == expected
+
+
+def test_caption_stream_joins_to_the_batch_caption(smsa):
+    assert _joined(smsa.stream_ic(image(1))) == smsa.process_ic(image(1))
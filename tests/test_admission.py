@@ -0,0 +1,149 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+
+from src.core.request_context import current_api_key
+from src.domain.authentication.api_key import ApiKey
+from src.domain.errors import TooManyRequestsError
+from src.domain.models.input.image_input import ImageInput
+from src.domain.models.input.question_input import QuestionInput
+from src.domain.models.output.response import Response
+from src.domain.models.output.response_chunk import ResponseChunk
+from src.domain.ports.async_vqa_port import AsyncVqaPort
+from src.infrastructure.adapters.vqa.admission import LANES, AdmissionControlVqaAdapter
+from src.infrastructure.adapters.vqa.scheduling import FairScheduler, KeyPolicy
+from src.infrastructure.adapters.vqa.singleflight import CoalescingVqaAdapter
+
+
+class BlockingAdapter(AsyncVqaPort):
+    """
+    Answers once `release` is set, recording which API key each call ran under.
+    """
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.calls = []
+
+    async def process_captioning(self, captioning_input):
+        return await self.process_question(captioning_input)
+
+    async def process_question(self, question_input):
+        self.calls.append(current_api_key.get().id)
+        await self.release.wait()
+        return Response(output="answer")
+
+    async def stream_question(self, question_input) -> AsyncIterator[ResponseChunk]:
+        self.calls.append(current_api_key.get().id)
+        for delta in ("an", "swer"):
+            await self.release.wait()
+            yield ResponseChunk(delta=delta)
+
+
+def _question(image: bytes = b"image") -> QuestionInput:
+    return QuestionInput(image=ImageInput(bytes=image), question="What is this?")
+
+
+def _admission(wrapped, max_concurrency=4, max_queue=16, default_policy=KeyPolicy()):
+    scheduler = FairScheduler(max_concurrency=max_concurrency, max_queue=max_queue, max_queue_wait=5.0, lanes=LANES)
+    return AdmissionControlVqaAdapter(wrapped, scheduler, default_policy=default_policy)
+
+
+def _as(key_id: str, coroutine, **key_fields) -> asyncio.Task:
+    # Tasks copy the context they are created in
+    token = current_api_key.set(ApiKey(id=key_id, **key_fields))
+    try:
+        return asyncio.ensure_future(coroutine)
+    finally:
+        current_api_key.reset(token)
+
+
+def test_slot_is_held_for_the_call_and_charged_to_its_key():
+    async def scenario():
+        inner = BlockingAdapter()
+        adapter = _admission(inner)
+        task = _as("a", adapter.process_question(_question()))
+        await asyncio.sleep(0)
+        assert adapter.stats()["running"] == 1
+        inner.release.set()
+        assert (await task).output == "answer"
+        stats = adapter.stats()
+        assert stats["running"] == 0
+        assert stats["keys"]["a"]["admitted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_key_record_caps_its_concurrency():
+    async def scenario():
+        inner = BlockingAdapter()
+        adapter = _admission(inner)
+        first = _as("a", adapter.process_question(_question()), max_concurrency=1)
+        second = _as("a", adapter.process_question(_question()), max_concurrency=1)
+        other = _as("b", adapter.process_question(_question()))
+        await asyncio.sleep(0)
+        assert inner.calls == ["a", "b"]
+        inner.release.set()
+        await asyncio.gather(first, second, other)
+        assert inner.calls == ["a", "b", "a"]
+
+    asyncio.run(scenario())
+
+
+def test_stream_holds_its_slot_until_closed():
+    async def scenario():
+        inner = BlockingAdapter()
+        inner.release.set()
+        adapter = _admission(inner)
+        token = current_api_key.set(ApiKey(id="a"))
+        try:
+            stream = adapter.stream_question(_question())
+            assert (await stream.__anext__()).delta == "an"
+            assert adapter.stats()["running"] == 1
+            await stream.aclose()
+        finally:
+            current_api_key.reset(token)
+        assert adapter.stats()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_identical_requests_are_coalesced_per_api_key():
+    async def scenario():
+        inner = BlockingAdapter()
+        admission = _admission(inner)
+        adapter = CoalescingVqaAdapter(admission, adapter_name="test")
+        tasks = [_as(key_id, adapter.process_question(_question())) for key_id in ("a", "a", "b")]
+        await asyncio.sleep(0)
+        inner.release.set()
+        first, second, other = await asyncio.gather(*tasks)
+        assert second.details == {"coalesced": True}
+        assert other.details is None
+        # Each key went through admission control under its own identity
+        assert sorted(inner.calls) == ["a", "b"]
+        keys = admission.stats()["keys"]
+        assert keys["a"]["admitted"] == 1
+        assert keys["b"]["admitted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_coalescing_does_not_share_another_keys_shedding():
+    async def scenario():
+        inner = BlockingAdapter()
+        admission = _admission(inner, max_concurrency=1, default_policy=KeyPolicy(max_queue=1))
+        adapter = CoalescingVqaAdapter(admission, adapter_name="test")
+        running = _as("a", adapter.process_question(_question(b"first")))
+        queued = _as("a", adapter.process_question(_question(b"second")))
+        await asyncio.sleep(0)
+        # "a" is at its queue limit, "b" asks the same as its queued request
+        shed = _as("a", adapter.process_question(_question(b"third")))
+        other = _as("b", adapter.process_question(_question(b"second")))
+        await asyncio.sleep(0)
+        with pytest.raises(TooManyRequestsError):
+            await shed
+        inner.release.set()
+        await asyncio.gather(running, queued)
+        assert (await other).details is None
+
+    asyncio.run(scenario())
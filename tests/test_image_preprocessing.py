@@ -0,0 +1,67 @@
+from io import BytesIO
+
+from PIL import Image
+
+from src.domain.models.input.image_input import ImageInput
+from src.infrastructure.adapters.vqa.vlm.config import ImagePreprocessingSettings
+from src.infrastructure.adapters.vqa.vlm.image_preprocessing import ImagePreprocessor
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def _photo(size=(4000, 3000), orientation=None) -> bytes:
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[_EXIF_ORIENTATION] = orientation
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=90, exif=exif)
+    return buffer.getvalue()
+
+
+def _size(data: bytes):
+    return Image.open(BytesIO(data)).size
+
+
+def test_large_photo_is_shrunk_without_pinning_a_full_decode():
+    preprocessor = ImagePreprocessor(ImagePreprocessingSettings(max_edge=1024))
+    image = ImageInput(bytes=_photo())
+    prepared = preprocessor.prepare(image)
+    assert prepared.reencoded
+    assert prepared.mime_type == "image/jpeg"
+    assert _size(prepared.data) == (1024, 768)
+    # Only the re-encoding is kept, not a 12 MP decode
+    assert image.cached_nbytes() == len(image.bytes) + len(prepared.data)
+
+
+def test_exif_orientation_is_applied():
+    preprocessor = ImagePreprocessor(ImagePreprocessingSettings(max_edge=1024))
+    prepared = preprocessor.prepare(ImageInput(bytes=_photo(orientation=6)))
+    assert _size(prepared.data) == (768, 1024)
+
+
+def test_prepared_image_is_reused_per_settings():
+    image = ImageInput(bytes=_photo())
+    preprocessor = ImagePreprocessor(ImagePreprocessingSettings(max_edge=1024))
+    first = preprocessor.prepare(image)
+    assert preprocessor.prepare(image) is first
+    assert preprocessor.stats()["reused"] == 1
+    other = ImagePreprocessor(ImagePreprocessingSettings(max_edge=512)).prepare(image)
+    assert _size(other.data) == (512, 384)
+
+
+def test_small_image_keeps_its_original_bytes():
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48), (10, 20, 30)).save(buffer, format="JPEG", quality=30)
+    image = ImageInput(bytes=buffer.getvalue())
+    prepared = ImagePreprocessor(ImagePreprocessingSettings(quality=95)).prepare(image)
+    assert not prepared.reencoded
+    assert prepared.data is image.bytes
+    assert image.cached_nbytes() == len(image.bytes)
+
+
+def test_unreadable_image_is_sent_as_is():
+    image = ImageInput(bytes=b"not an image")
+    prepared = ImagePreprocessor(ImagePreprocessingSettings()).prepare(image)
+    assert prepared.data is image.bytes
+    assert not prepared.reencoded
@@ -0,0 +1,113 @@
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from src.api.dependencies.image_store import get_image_store, resolve_image_handle
+from src.domain.authentication.api_key import ApiKey
+from src.domain.models.input.image_input import ImageInput
+from src.domain.models.input.question_input import QuestionInput
+from src.infrastructure import image_store
+from src.infrastructure.image_store import ImageStore
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(image_store, "time", clock)
+    return clock
+
+
+def _image(size=(64, 48)) -> ImageInput:
+    buffer = BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buffer, format="PNG")
+    return ImageInput(bytes=buffer.getvalue())
+
+
+def test_images_are_private_to_their_owner(clock):
+    store = ImageStore(max_bytes=1 << 20, ttl_seconds=60)
+    image = _image()
+    image_id = store.put("a", image)
+    assert store.get("a", image_id) is image
+    assert store.get("b", image_id) is None
+    assert store.get("a", "unknown") is None
+    assert store.stats()["misses"] == 2
+
+
+def test_use_extends_the_lifetime(clock):
+    store = ImageStore(max_bytes=1 << 20, ttl_seconds=60)
+    kept, expired = store.put("a", _image()), store.put("a", _image())
+    clock.now += 40
+    assert store.get("a", kept) is not None
+    clock.now += 40
+    assert store.get("a", kept) is not None
+    assert store.get("a", expired) is None
+    assert store.stats()["images"] == 1
+
+
+def test_expired_images_are_dropped_on_put(clock):
+    store = ImageStore(max_bytes=1 << 20, ttl_seconds=60)
+    for _ in range(3):
+        store.put("a", _image())
+    clock.now += 61
+    store.put("a", _image())
+    stats = store.stats()
+    assert stats["images"] == 1
+    assert stats["evictions"] == 3
+
+
+def test_least_recently_used_images_are_evicted_over_budget(clock):
+    size = _image().cached_nbytes()
+    store = ImageStore(max_bytes=2 * size, ttl_seconds=60)
+    first, second = store.put("a", _image()), store.put("a", _image())
+    store.get("a", first)
+    store.put("a", _image())
+    assert store.get("a", first) is not None
+    assert store.get("a", second) is None
+
+
+def test_memoised_forms_count_towards_the_budget(clock):
+    store = ImageStore(max_bytes=1 << 20, ttl_seconds=60)
+    image = _image()
+    image_id = store.put("a", image)
+    image.resized((32, 24))
+    store.get("a", image_id)
+    assert store.stats()["bytes"] == len(image.bytes) + 32 * 24 * 3
+
+
+def test_image_over_budget_is_refused(clock):
+    store = ImageStore(max_bytes=10, ttl_seconds=60)
+    assert store.put("a", _image()) is None
+    assert store.stats()["images"] == 0
+
+
+def _reference(image_id: str, metadata=None) -> QuestionInput:
+    return QuestionInput(image=ImageInput(id=image_id, metadata=metadata), question="What is this?")
+
+
+def test_handle_keeps_the_request_metadata():
+    stored = _image()
+    stored.metadata = {"source": "upload", "camera": "back"}
+    image_id = get_image_store().put("a", stored)
+    resolved = resolve_image_handle(_reference(image_id, {"camera": "front"}), ApiKey(id="a"))
+    assert resolved.image.bytes is stored.bytes
+    assert resolved.image.metadata == {"source": "upload", "camera": "front"}
+    # The stored image, shared with later requests, is left as it was
+    assert stored.metadata == {"source": "upload", "camera": "back"}
+    assert resolve_image_handle(_reference(image_id), ApiKey(id="a")).image is stored
+
+
+def test_handle_of_another_key_is_not_found():
+    image_id = get_image_store().put("a", _image())
+    with pytest.raises(HTTPException) as error:
+        resolve_image_handle(_reference(image_id), ApiKey(id="b"))
+    assert error.value.status_code == 404
@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.api.dependencies.authentication import enforce_rate_limit
+from src.api.rate_limit import RateLimitHeadersMiddleware
+from src.domain.authentication.api_key import ApiKey
+from src.infrastructure.authentication.utils import rate_limiter
+from src.infrastructure.authentication.utils.rate_limiter import TokenBucketRateLimiter, rate_limit_headers
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def test_burst_then_refill(clock):
+    limiter = TokenBucketRateLimiter(max_keys=10)
+    decisions = [limiter.check("a", rate=2.0, burst=3) for _ in range(4)]
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert [decision.remaining for decision in decisions] == [2, 1, 0, 0]
+    assert decisions[-1].retry_after == pytest.approx(0.5)
+    assert decisions[-1].reset_seconds == pytest.approx(1.5)
+    clock.now += 0.5
+    assert limiter.check("a", rate=2.0, burst=3).allowed
+    assert not limiter.check("a", rate=2.0, burst=3).allowed
+    assert limiter.stats()["limited"] == 2
+
+
+def test_refill_is_capped_at_burst(clock):
+    limiter = TokenBucketRateLimiter(max_keys=10)
+    limiter.check("a", rate=1.0, burst=2)
+    clock.now += 3600
+    decisions = [limiter.check("a", rate=1.0, burst=2) for _ in range(3)]
+    assert [decision.allowed for decision in decisions] == [True, True, False]
+
+
+def test_keys_have_their_own_buckets(clock):
+    limiter = TokenBucketRateLimiter(max_keys=10)
+    assert limiter.check("a", rate=1.0, burst=1).allowed
+    assert not limiter.check("a", rate=1.0, burst=1).allowed
+    assert limiter.check("b", rate=1.0, burst=1).allowed
+
+
+def test_idle_buckets_are_dropped(clock):
+    limiter = TokenBucketRateLimiter(max_keys=10)
+    limiter.check("a", rate=1.0, burst=2)
+    clock.now += 2.5
+    limiter.check("b", rate=1.0, burst=2)
+    stats = limiter.stats()
+    assert stats["keys"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_least_recently_used_bucket_is_evicted_at_max_keys(clock):
+    limiter = TokenBucketRateLimiter(max_keys=2)
+    limiter.check("a", rate=1.0, burst=1)
+    limiter.check("b", rate=1.0, burst=1)
+    limiter.check("a", rate=1.0, burst=1)
+    limiter.check("c", rate=1.0, burst=1)
+    assert limiter.stats()["keys"] == 2
+    # "a" was used more recently than "b": its empty bucket is kept
+    assert not limiter.check("a", rate=1.0, burst=1).allowed
+    # "b" was dropped, it starts again with a full bucket
+    assert limiter.check("b", rate=1.0, burst=1).allowed
+
+
+def test_headers(clock):
+    limiter = TokenBucketRateLimiter(max_keys=10)
+    allowed = limiter.check("a", rate=0.5, burst=1)
+    assert rate_limit_headers(allowed) == {"RateLimit-Limit": "1", "RateLimit-Remaining": "0", "RateLimit-Reset": "2"}
+    assert rate_limit_headers(limiter.check("a", rate=0.5, burst=1))["Retry-After"] == "2"
+
+
+def _app() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+    def authenticate(request: Request, key: str, rate: float) -> None:
+        enforce_rate_limit(request, ApiKey(id=key, rate_limit_per_second=rate, rate_limit_burst=2))
+
+    @app.get("/ping")
+    def ping(request: Request, key: str, rate: float):
+        authenticate(request, key, rate)
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream(request: Request, key: str, rate: float):
+        authenticate(request, key, rate)
+        return StreamingResponse(iter(["data: {}\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_middleware_adds_headers_to_responses_and_rejections():
+    client = _app()
+    params = {"key": "middleware", "rate": 0.001}
+    first = client.get("/ping", params=params)
+    assert first.status_code == 200
+    assert first.headers["RateLimit-Limit"] == "2"
+    assert first.headers["RateLimit-Remaining"] == "1"
+    assert client.get("/stream", params=params).headers["RateLimit-Remaining"] == "0"
+    rejected = client.get("/ping", params=params)
+    assert rejected.status_code == 429
+    assert rejected.headers["RateLimit-Remaining"] == "0"
+    assert int(rejected.headers["Retry-After"]) >= 1
+    # Set once, by the exception's own headers
+    assert len(rejected.headers.get_list("RateLimit-Limit")) == 1
+
+
+def test_streamed_response_gets_headers():
+    response = _app().get("/stream", params={"key": "stream", "rate": 1.0})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["RateLimit-Limit"] == "2"
+
+
+def test_rate_zero_is_unlimited():
+    client = _app()
+    responses = [client.get("/ping", params={"key": "unlimited", "rate": 0}) for _ in range(5)]
+    assert all(response.status_code == 200 for response in responses)
+    assert "RateLimit-Limit" not in responses[-1].headers
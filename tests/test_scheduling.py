@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from src.domain.errors import OverloadedError, TooManyRequestsError
+from src.infrastructure.adapters.vqa.scheduling import FairScheduler, KeyPolicy
+
+LANES = ("interactive", "bulk")
+
+
+def _scheduler(max_concurrency=1, max_queue=16, max_queue_wait=5.0) -> FairScheduler:
+    return FairScheduler(max_concurrency=max_concurrency, max_queue=max_queue,
+                         max_queue_wait=max_queue_wait, lanes=LANES)
+
+
+async def _served_in_order(scheduler, requests):
+    """
+    Queue `requests` ((key, lane, policy)) behind a running call, then
+    release it and let each request release its slot as soon as it gets
+    it. Returns the keys in the order they were served.
+    """
+    order = []
+
+    async def call(key, lane, policy):
+        await scheduler.acquire(key, lane, policy)
+        order.append(key)
+        scheduler.release(key, 0.01)
+
+    await scheduler.acquire("blocker", "bulk")
+    tasks = [asyncio.ensure_future(call(*request)) for request in requests]
+    await asyncio.sleep(0)
+    scheduler.release("blocker", 0.01)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_slots_are_shared_by_weight():
+    heavy, light = KeyPolicy(weight=2.0), KeyPolicy(weight=1.0)
+    requests = [("a", "bulk", light)] * 6 + [("b", "bulk", heavy)] * 6
+    order = asyncio.run(_served_in_order(_scheduler(), requests))
+    # While both keys wait, "b" gets two slots for each of "a"'s
+    assert order[:6].count("b") == 4
+    assert sorted(order) == sorted(key for key, _, _ in requests)
+
+
+def test_a_flooding_key_only_delays_itself():
+    requests = [("flood", "bulk", KeyPolicy())] * 8 + [("other", "bulk", KeyPolicy())]
+    order = asyncio.run(_served_in_order(_scheduler(), requests))
+    assert order.index("other") <= 1
+
+
+def test_priority_lane_is_served_first():
+    requests = [("a", "bulk", KeyPolicy())] * 3 + [("b", "interactive", KeyPolicy())]
+    order = asyncio.run(_served_in_order(_scheduler(), requests))
+    assert order[0] == "b"
+
+
+def test_key_concurrency_cap_lets_other_keys_through():
+    async def scenario():
+        scheduler = _scheduler(max_concurrency=2)
+        capped = KeyPolicy(max_concurrency=1)
+        await scheduler.acquire("a", "bulk", capped)
+        second = asyncio.ensure_future(scheduler.acquire("a", "bulk", capped))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(scheduler.acquire("b", "bulk"), timeout=1)
+        assert not second.done()
+        scheduler.release("a")
+        await asyncio.wait_for(second, timeout=1)
+        assert scheduler.stats()["running"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_pushes_out_the_heaviest_key():
+    async def scenario():
+        scheduler = _scheduler(max_queue=3)
+        await scheduler.acquire("blocker", "bulk")
+        flood = [asyncio.ensure_future(scheduler.acquire("a", "bulk")) for _ in range(3)]
+        await asyncio.sleep(0)
+        newcomer = asyncio.ensure_future(scheduler.acquire("b", "bulk"))
+        await asyncio.sleep(0)
+        # The newest waiter of "a" is shed, "b" keeps its place
+        with pytest.raises(TooManyRequestsError):
+            await flood[-1]
+        assert not newcomer.done()
+        assert scheduler.stats()["shed_pushed_out"] == 1
+        for task in flood[:-1] + [newcomer]:
+            task.cancel()
+        await asyncio.gather(*flood[:-1], newcomer, return_exceptions=True)
+        assert scheduler.stats()["queue_depth"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_key_queue_limit():
+    async def scenario():
+        scheduler = _scheduler()
+        policy = KeyPolicy(max_queue=1)
+        await scheduler.acquire("blocker", "bulk")
+        first = asyncio.ensure_future(scheduler.acquire("a", "bulk", policy))
+        await asyncio.sleep(0)
+        with pytest.raises(TooManyRequestsError):
+            await scheduler.acquire("a", "bulk", policy)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_queue_wait_timeout_sheds_with_retry_after():
+    async def scenario():
+        scheduler = _scheduler(max_queue_wait=0.01)
+        await scheduler.acquire("blocker", "bulk")
+        with pytest.raises(OverloadedError) as error:
+            await scheduler.acquire("a", "bulk")
+        assert error.value.retry_after >= 1
+        stats = scheduler.stats()
+        assert stats["shed_timeout"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["keys"]["a"]["shed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.acquire("blocker", "bulk")
+        waiter = asyncio.ensure_future(scheduler.acquire("a", "bulk"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release("blocker")
+        stats = scheduler.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["running"] == 0
+
+    asyncio.run(scenario())
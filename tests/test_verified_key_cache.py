@@ -0,0 +1,77 @@
+import pytest
+
+from src.domain.authentication.api_key import ApiKey
+from src.infrastructure.authentication.utils import verified_key_cache
+from src.infrastructure.authentication.utils.verified_key_cache import VerifiedApiKeyCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(verified_key_cache, "time", clock)
+    return clock
+
+
+def test_hit_until_the_ttl(clock):
+    cache = VerifiedApiKeyCache(max_size=10, ttl_seconds=30)
+    key = ApiKey(id="1")
+    cache.put("plain", key)
+    assert cache.get("plain") is key
+    assert cache.get("other") is None
+    clock.now += 30
+    assert cache.get("plain") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = VerifiedApiKeyCache(max_size=2, ttl_seconds=30)
+    cache.put("a", ApiKey(id="a"))
+    cache.put("b", ApiKey(id="b"))
+    cache.get("a")
+    cache.put("c", ApiKey(id="c"))
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+
+
+def test_invalidate_drops_every_entry_of_the_key(clock):
+    cache = VerifiedApiKeyCache(max_size=10, ttl_seconds=30)
+    cache.put("first", ApiKey(id="1"))
+    cache.put("second", ApiKey(id="1"))
+    cache.put("other", ApiKey(id="2"))
+    cache.invalidate("1")
+    assert cache.get("first") is None
+    assert cache.get("second") is None
+    assert cache.get("other") is not None
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_put_racing_an_invalidation_is_dropped(clock):
+    cache = VerifiedApiKeyCache(max_size=10, ttl_seconds=30)
+    # Read before the repository lookup, which overlaps the revocation
+    generation = cache.generation
+    cache.invalidate("1")
+    cache.put("plain", ApiKey(id="1"), generation)
+    assert cache.get("plain") is None
+    assert cache.stats()["stale_puts"] == 1
+    cache.put("plain", ApiKey(id="1"), cache.generation)
+    assert cache.get("plain") is not None
+
+
+def test_plain_keys_are_not_stored(clock):
+    cache = VerifiedApiKeyCache(max_size=10, ttl_seconds=30)
+    cache.put("secret-plain-key", ApiKey(id="1"))
+    assert all(b"secret-plain-key" not in digest for digest in cache._entries)
+
+
+def test_disabled_cache(clock):
+    cache = VerifiedApiKeyCache(max_size=0, ttl_seconds=30)
+    cache.put("plain", ApiKey(id="1"))
+    assert cache.get("plain") is None